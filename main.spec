@@ -1,4 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Сборка в режиме one-dir: ресурсы и Qt лежат рядом с exe и читаются
+# напрямую с диска, без распаковки во временный каталог при каждом запуске.
+# Прежняя one-file сборка — main_onefile.spec (для сравнения времени старта).
 
 
 a = Analysis(
@@ -19,16 +22,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,  # UPX-сжатые Qt-библиотеки пришлось бы распаковывать в память при каждом старте
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -37,3 +37,13 @@ exe = EXE(
     entitlements_file=None,
     icon=['src\\resources\\icons\\app_icon.ico'],
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
@@ -0,0 +1,41 @@
+# -*- mode: python ; coding: utf-8 -*-
+# One-file сборка: при каждом запуске распаковывает Qt и ресурсы во временный каталог.
+# Основная сборка — main.spec (one-dir); этот файл оставлен для сравнения времени старта.
+
+
+a = Analysis(
+    ['src\\main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('src\\resources\\style.qss', 'resources'), ('src\\resources\\ding.wav', 'resources'), ('src\\resources\\fonts\\Roboto.ttf', 'resources/fonts'), ('src\\resources\\icons', 'resources/icons'), ('src\\sql', 'src/sql')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.datas,
+    [],
+    name='main_onefile',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['src\\resources\\icons\\app_icon.ico'],
+)
@@ -0,0 +1,77 @@
+"""Общий сервис звуковых уведомлений (один декодированный звук на всё приложение)."""
+from __future__ import annotations
+
+import time
+
+from PyQt6.QtCore import QCoreApplication, QObject, QTimer, QUrl
+
+from src.config import SOUND_PATH
+
+# Не чаще одного звука за этот интервал; запросы внутри него сливаются в один
+MIN_INTERVAL_MS = 2000
+
+
+class NotificationSound(QObject):
+    """
+    Ленивый звук уведомления.
+
+    QtMultimedia импортируется, а QSoundEffect создаётся и начинает фоновую
+    загрузку ding.wav только при первом воспроизведении, уже из цикла событий —
+    старт приложения не ждёт аудиостека. Если аудиоустройств нет или
+    QtMultimedia недоступен, сервис молча отключается. Серия вызовов play()
+    проигрывается одним звуком не чаще раза в min_interval_ms.
+    """
+    def __init__(self, source: str = SOUND_PATH, min_interval_ms: int = MIN_INTERVAL_MS, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self._source = source
+        self._min_interval_ms = min_interval_ms
+        self._effect = None
+        self._disabled = False
+        self._pending = False
+        self._last_played: float | None = None
+
+    def _ensure_effect(self):  # type: ignore
+        """Создаёт QSoundEffect при первом использовании (None — звук недоступен)."""
+        if self._effect is None and not self._disabled:
+            try:
+                from PyQt6.QtMultimedia import QMediaDevices, QSoundEffect
+            except ImportError:
+                self._disabled = True
+                return None
+            if not QMediaDevices.audioOutputs():
+                self._disabled = True
+                return None
+            self._effect = QSoundEffect(self)
+            self._effect.setSource(QUrl.fromLocalFile(self._source))  # загрузка идёт в фоне
+            self._effect.setVolume(0.5)
+        return self._effect
+
+    def play(self) -> None:
+        """Запрашивает звук; повторные запросы до воспроизведения сливаются в один."""
+        if self._disabled or self._pending:
+            return
+        self._pending = True
+        wait = 0
+        if self._last_played is not None:
+            elapsed = (time.monotonic() - self._last_played) * 1000
+            wait = max(int(self._min_interval_ms - elapsed), 0)
+        QTimer.singleShot(wait, self._fire)
+
+    def _fire(self) -> None:
+        self._pending = False
+        effect = self._ensure_effect()
+        if effect is None:
+            return
+        self._last_played = time.monotonic()
+        effect.play()  # type: ignore
+
+
+_service: NotificationSound | None = None
+
+
+def sound_service() -> NotificationSound:
+    """Единственный экземпляр сервиса звука (живёт вместе с QApplication)."""
+    global _service
+    if _service is None:
+        _service = NotificationSound(parent=QCoreApplication.instance())
+    return _service
@@ -0,0 +1,153 @@
+"""Онлайн-резервное копирование базы через SQLite backup API."""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+
+from src.db import Database
+
+log = logging.getLogger(__name__)
+
+# Каталог с копиями по умолчанию — рядом с файлом базы
+BACKUP_DIR_NAME = "backups"
+# Формат отметки времени в имени копии: <имя базы>-20250131-235959.db
+STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class BackupManager:
+    """
+    Снимки базы через sqlite3.Connection.backup.
+
+    Копирование идёт порциями по pages_per_step страниц с паузой step_sleep
+    между порциями через отдельное соединение только для чтения, поэтому
+    запись из GUI не ждёт окончания копии. На всё время копирования это
+    соединение держит одну транзакцию чтения: копируется согласованный
+    снимок WAL, и запись из других соединений не перезапускает копию с начала. Хранятся keep_last последних снимков
+    и по одному (последнему) снимку за каждый из keep_daily последних дней.
+    """
+    def __init__(
+        self,
+        db_path: str | pathlib.Path,
+        backup_dir: str | pathlib.Path | None = None,
+        pages_per_step: int = 256,
+        step_sleep: float = 0.005,
+        keep_last: int = 5,
+        keep_daily: int = 14,
+    ) -> None:
+        self.db_path = pathlib.Path(db_path)
+        self.backup_dir = (
+            pathlib.Path(backup_dir) if backup_dir else self.db_path.parent / BACKUP_DIR_NAME
+        )
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+
+    def _pause(self, status: int, remaining: int, total: int) -> None:
+        """Колбэк progress: пауза между порциями, чтобы не занимать диск и блокировки."""
+        if remaining:
+            time.sleep(self.step_sleep)
+
+    def backup(self, now: dt.datetime | None = None) -> pathlib.Path:
+        """
+        Делает снимок базы и применяет правила хранения.
+        Снимок сначала пишется во временный файл и переименовывается
+        только после успешного завершения, так что «рваных» копий не бывает.
+        """
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        stamp = (now or dt.datetime.now()).strftime(STAMP_FORMAT)
+        final = self.backup_dir / f"{self.db_path.stem}-{stamp}.db"
+        partial = final.with_suffix(".partial")
+
+        src = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True)
+        dst = sqlite3.connect(partial)
+        try:
+            # Без открытой транзакции backup API отпускает блокировку между шагами
+            # и после каждой чужой записи начинает копию заново (может не закончить никогда)
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+            src.backup(dst, pages=self.pages_per_step, progress=self._pause)
+        finally:
+            dst.close()
+            src.close()
+        partial.replace(final)
+        self.prune()
+        return final
+
+    def snapshots(self) -> list[pathlib.Path]:
+        """Снимки этой базы, от старых к новым."""
+        if not self.backup_dir.exists():
+            return []
+        return sorted(self.backup_dir.glob(f"{self.db_path.stem}-*-*.db"))
+
+    def _stamp(self, path: pathlib.Path) -> dt.datetime | None:
+        tail = path.stem[len(self.db_path.stem) + 1:]
+        try:
+            return dt.datetime.strptime(tail, STAMP_FORMAT)
+        except ValueError:
+            return None
+
+    def prune(self) -> list[pathlib.Path]:
+        """Удаляет снимки, не попадающие под правила хранения. Возвращает удалённые."""
+        dated = [(p, ts) for p in self.snapshots() if (ts := self._stamp(p))]
+        keep = {p for p, _ in dated[-self.keep_last:]} if self.keep_last else set()
+        days_seen: set[dt.date] = set()
+        for p, ts in reversed(dated):
+            if len(days_seen) >= self.keep_daily:
+                break
+            if ts.date() not in days_seen:
+                days_seen.add(ts.date())
+                keep.add(p)
+        removed = [p for p, _ in dated if p not in keep]
+        for p in removed:
+            p.unlink(missing_ok=True)
+        return removed
+
+    def restore(self, snapshot: str | pathlib.Path, db: Database) -> None:
+        """
+        Восстанавливает содержимое открытой базы из снимка тем же backup API
+        (в рабочее соединение, без закрытия приложения).
+        """
+        src = sqlite3.connect(f"{pathlib.Path(snapshot).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            src.backup(db.connection(), pages=self.pages_per_step)
+        finally:
+            src.close()
+        db.invalidate_caches()
+
+
+class BackupScheduler(threading.Thread):
+    """
+    Фоновый поток, делающий снимок каждые interval секунд
+    (первый — через first_delay секунд после запуска).
+    """
+    def __init__(
+        self,
+        manager: BackupManager,
+        interval: float = 6 * 3600,
+        first_delay: float = 60,
+    ) -> None:
+        super().__init__(name="backup-scheduler", daemon=True)
+        self.manager = manager
+        self.interval = interval
+        self.first_delay = first_delay
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        delay = self.first_delay
+        while not self._stop_event.wait(delay):
+            try:
+                self.manager.backup()
+            except Exception:
+                log.exception("Не удалось создать резервную копию %s", self.manager.db_path)
+            delay = self.interval
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Останавливает планировщик (текущая копия, если идёт, доводится до конца)."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -2,9 +2,11 @@ import sys
 import os
 
 # Определяем базовый каталог для ресурсов и приложения
-# При запуске из exe (PyInstaller) sys.frozen и sys._MEIPASS укажут на временную папку
+# При запуске из exe (PyInstaller) sys._MEIPASS указывает на каталог с ресурсами:
+# в one-dir сборке (main.spec) это папка _internal рядом с exe — файлы читаются
+# прямо оттуда; в one-file сборке — временная папка, куда exe распаковывается при старте
 if getattr(sys, "frozen", False):
-    BASE_DIR = sys._MEIPASS # type: ignore
+    BASE_DIR = getattr(sys, "_MEIPASS", os.path.dirname(sys.executable)) # type: ignore
 else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__)) # type: ignore
 
@@ -1,30 +1,270 @@
 from __future__ import annotations
 
+import calendar
 import datetime as dt
+import json
 import pathlib
 import sqlite3
+import sys
+from array import array
 from contextlib import contextmanager
-from typing import Optional # type: ignore
+from dataclasses import dataclass
+from typing import Iterable, Optional # type: ignore
 from importlib import resources
 
 import src.sql
 
+# Разница между юлианским днём SQLite и порядковым номером даты Python
+# (date.toordinal): julianday('0001-01-01') = 1721425.5, toordinal() = 1
+_JULIAN_TO_ORDINAL = 1721424.5
+
+# Колонки подписки, которые читают таблицы и напоминания: вместо полного
+# текста notes — его начало notes_preview (все они есть в ix_subscription_list)
+SUBSCRIPTION_COLUMNS = ("id", "name", "cost", "period", "next_due", "is_active", "notes_preview")
+_SUBSCRIPTION_ALL = frozenset(SUBSCRIPTION_COLUMNS) | {"notes"}
+
+# Горизонт прогноза платежей в статистике, дней
+FORECAST_DAYS = 30
+
+# Колонки таблицы payment (одинаковы в основном и архивном файлах)
+PAYMENT_COLUMNS = "id, subscription_id, date_paid, amount, comment, uuid"
+
+# Выражения, приводящие date_paid к началу временной корзины ряда трат
+SERIES_BUCKETS = {
+    "day": "date_paid",
+    "week": "DATE(date_paid, '-6 days', 'weekday 1')",   # понедельник недели
+    "month": "DATE(date_paid, 'start of month')",
+    "year": "DATE(date_paid, 'start of year')",
+}
+
+
+def add_period(day: dt.date, period: str, n: int = 1) -> dt.date:
+    """
+    Дата через n периодов после day. Для месяцев и лет день обрезается
+    до последнего дня месяца (31.01 + месяц = 28/29.02).
+    """
+    if period == "daily":
+        return day + dt.timedelta(days=n)
+    if period == "weekly":
+        return day + dt.timedelta(weeks=n)
+    months = {"monthly": n, "yearly": 12 * n}.get(period)
+    if months is None:
+        return day
+    y, m = divmod(day.month - 1 + months, 12)
+    year, month = day.year + y, m + 1
+    return dt.date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def costs_as_of(
+    cx: sqlite3.Connection,
+    pairs: Iterable[tuple[int, dt.date]],
+) -> list[float | None]:
+    """
+    Цена подписки на дату для каждой пары (id подписки, дата) одним запросом.
+
+    Пары передаются JSON-массивом и разворачиваются json_each; для каждой
+    пары версия цены ищется по индексу R*Tree price_range (точка внутри
+    прямоугольника «подписка × интервал действия»), без коррелированных
+    подзапросов и сканирования истории. CROSS JOIN закрепляет порядок:
+    внешний цикл — по парам, поиск в индексе — внутренний.
+    None — для подписки нет версии на эту дату.
+    """
+    pairs = list(pairs)
+    out: list[float | None] = [None] * len(pairs)
+    if not pairs:
+        return out
+    rows = cx.execute(
+        """
+        WITH q(k, sid, day) AS (
+            SELECT key, value ->> 0, value ->> 1 FROM json_each(?)
+        )
+        SELECT q.k, r.cost
+        FROM q CROSS JOIN price_range AS r
+          ON r.sub_lo <= q.sid AND r.sub_hi >= q.sid
+         AND r.day_lo <= q.day AND r.day_hi >= q.day
+        """,
+        (json.dumps([[sid, day.toordinal()] for sid, day in pairs]),),
+    )
+    for k, cost in rows:
+        out[k] = cost
+    return out
+
+
+class SubscriptionSnapshot:
+    """
+    Компактный колоночный снимок таблицы subscription.
+
+    Вместо списка sqlite3.Row каждая колонка хранится отдельно:
+    числа — в array (id, стоимость, дата как порядковый номер дня, флаг активности),
+    строки названий и периодов — интернированы, превью заметок (notes_preview) —
+    разреженный словарь только для непустых значений; полный текст заметок
+    в снимок не входит (Database.get_notes). Сводка оплат (последняя оплата,
+    сумма и число оплат) берётся из payment_summary тем же запросом.
+    Строка i снимка — это i-й элемент каждой колонки.
+    """
+    __slots__ = (
+        "ids", "names", "costs", "periods", "due", "active", "notes",
+        "last_paid", "paid_total", "paid_count",
+    )
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.names: list[str] = []
+        self.costs = array("d")
+        self.periods: list[str] = []
+        self.due = array("i")        # date.toordinal(); 0 — дата не распознана
+        self.active = array("b")
+        self.notes: dict[int, str] = {}
+        self.last_paid = array("i")  # date.toordinal(); 0 — оплат не было
+        self.paid_total = array("d")
+        self.paid_count = array("i")
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> SubscriptionSnapshot:  # type: ignore
+        """
+        Строит снимок из кортежей (id, name, cost, period, due_ordinal, is_active,
+        notes_preview, last_paid_ordinal, paid_total, paid_count).
+        """
+        snap = cls()
+        intern = sys.intern
+        for i, (sid, name, cost, period, due, active, notes, last, total, count) in enumerate(rows):  # type: ignore
+            snap.ids.append(sid)
+            snap.names.append(intern(name))
+            snap.costs.append(cost)
+            snap.periods.append(intern(period))
+            snap.due.append(due or 0)
+            snap.active.append(1 if active else 0)
+            if notes:
+                snap.notes[i] = notes
+            snap.last_paid.append(last or 0)
+            snap.paid_total.append(total or 0.0)
+            snap.paid_count.append(count or 0)
+        return snap
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def next_due(self, i: int) -> dt.date | None:
+        """Дата следующего платежа строки i (None, если дата в БД некорректна)."""
+        return dt.date.fromordinal(self.due[i]) if self.due[i] > 0 else None
+
+    def last_paid_date(self, i: int) -> dt.date | None:
+        """Дата последней оплаты строки i (None, если оплат не было)."""
+        return dt.date.fromordinal(self.last_paid[i]) if self.last_paid[i] > 0 else None
+
+    def indices(self, active: bool = True) -> list[int]:
+        """Номера строк активных (или архивных) подписок в порядке снимка."""
+        flag = 1 if active else 0
+        return [i for i, a in enumerate(self.active) if a == flag]
+
+    def count(self, active: bool = True) -> int:
+        """Число активных (или архивных) подписок."""
+        n = sum(self.active)
+        return n if active else len(self.active) - n
+
+    def due_within(self, days_ahead: int = 3, today: dt.date | None = None) -> list[int]:
+        """Номера строк активных подписок со сроком оплаты не позже today + days_ahead."""
+        limit = (today or dt.date.today()).toordinal() + days_ahead
+        return [
+            i for i, (a, d) in enumerate(zip(self.active, self.due))
+            if a and 0 < d <= limit
+        ]
+
+    @classmethod
+    def concat(cls, parts: Iterable[tuple[str, SubscriptionSnapshot]]) -> SubscriptionSnapshot:  # type: ignore
+        """
+        Объединяет снимки нескольких баз (профилей) в один.
+        К названию подписки добавляется метка профиля: «метка: название».
+        """
+        out = cls()
+        intern = sys.intern
+        for label, snap in parts:  # type: ignore
+            offset = len(out)
+            out.ids.extend(snap.ids)
+            out.names.extend(intern(f"{label}: {name}") for name in snap.names)
+            out.costs.extend(snap.costs)
+            out.periods.extend(snap.periods)
+            out.due.extend(snap.due)
+            out.active.extend(snap.active)
+            out.notes.update({offset + i: n for i, n in snap.notes.items()})
+            out.last_paid.extend(snap.last_paid)
+            out.paid_total.extend(snap.paid_total)
+            out.paid_count.extend(snap.paid_count)
+        return out
+
+    def positions(self, sub_ids: Iterable[int]) -> dict[int, int]:
+        """Отображение id подписки -> номер строки для запрошенных id (один проход)."""
+        wanted = set(sub_ids)
+        return {sid: i for i, sid in enumerate(self.ids) if sid in wanted}
+
+
+@dataclass
+class StatsSummary:
+    """Сводные показатели окна статистики; частичные сводки складываются через +."""
+    active: int = 0
+    archived: int = 0
+    total: float = 0.0
+    year: float = 0.0
+    month: float = 0.0
+    forecast: float = 0.0   # ожидаемые платежи на FORECAST_DAYS вперёд
+
+    def __add__(self, other: StatsSummary) -> StatsSummary:
+        return StatsSummary(
+            self.active + other.active,
+            self.archived + other.archived,
+            self.total + other.total,
+            self.year + other.year,
+            self.month + other.month,
+            self.forecast + other.forecast,
+        )
+
+
 class Database:
     def __init__(self, db_path: str | pathlib.Path = "subscriptions.db") -> None:
         self.db_path = pathlib.Path(db_path)
         self._conn: Optional[sqlite3.Connection] = None # type: ignore
+        # Кэш снимка и «версия» данных, для которой он построен
+        self._snapshot: Optional[SubscriptionSnapshot] = None # type: ignore
+        self._snapshot_version: tuple[int, int] | None = None
+        # Снимок подписок одной категории: (id тега, версия данных, снимок)
+        self._tag_snapshot: tuple[int, tuple[int, int], SubscriptionSnapshot] | None = None
+        # Кэш агрегированных рядов трат по (гранулярность, id подписки)
+        self._series_cache: dict[tuple[str, int | None], tuple[array, array]] = {}  # type: ignore
+        self._series_version: tuple[int, int] | None = None
+        # Подключён ли архивный файл старых оплат (ATTACH ... AS cold)
+        self._archive_attached = False
+        self._read_only = False
 
-    def connect(self) -> None:
-        """Открывает соединение и применяет схему (если нужно)."""
-        self._conn = sqlite3.connect(self.db_path)
+    def connect(self, check_same_thread: bool = True) -> None:
+        """
+        Открывает соединение и применяет схему (если нужно).
+        check_same_thread=False позволяет открыть базу в рабочем потоке
+        и затем пользоваться ею из GUI-потока.
+        """
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
         self._conn.row_factory = sqlite3.Row
         self._conn.execute("PRAGMA foreign_keys = ON;")
+        # Действует только для новой (пустой) базы: свободные страницы после удалений
+        # возвращаются файлу по частям в простое (src/maintenance.py)
+        self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        # WAL: чтение (фоновые выборки, резервное копирование) не блокирует запись из GUI
+        self._conn.execute("PRAGMA journal_mode = WAL;")
         self._apply_schema()
 
     def close(self) -> None:
         if self._conn:
             self._conn.close()
             self._conn = None
+        self.invalidate_caches()
+        self._archive_attached = False
+
+    def invalidate_caches(self) -> None:
+        """Сбрасывает кэш снимка и рядов (например, после восстановления из копии)."""
+        self._snapshot = None
+        self._snapshot_version = None
+        self._tag_snapshot = None
+        self._series_cache.clear()
+        self._series_version = None
 
     def _cx(self) -> sqlite3.Connection:
         assert self._conn, "connect() not called"
@@ -33,14 +273,371 @@ class Database:
     def _apply_schema(self) -> None:
         """Считывает schema.sql из пакета src.sql и выполняет скрипт."""
         assert self._conn, "connect() not called"
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(subscription)")}
+        # База старой версии: колонки превью ещё нет, а индекс из схемы на неё ссылается
+        migrate_preview = bool(columns) and "notes_preview" not in columns
+        if migrate_preview:
+            self._conn.execute("ALTER TABLE subscription ADD COLUMN notes_preview TEXT")
+        # То же для ключей синхронизации (uuid строк и row_uuid журнала)
+        migrate_uuid = [
+            (table, column)
+            for table, column in (
+                ("subscription", "uuid"), ("payment", "uuid"), ("change_log", "row_uuid")
+            )
+            if (cols := {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")})
+            and column not in cols
+        ]
+        for table, column in migrate_uuid:
+            self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
         schema_text = resources.files(src.sql).joinpath("schema.sql").read_text(encoding="utf-8")
         self._conn.executescript(schema_text)
+        if migrate_uuid:
+            # Ключ существующих строк выводится из id: копии, снятые с одного файла
+            # до обновления, получают одинаковые ключи и продолжают синхронизироваться
+            with self._conn:
+                for table, column in migrate_uuid:
+                    key = "row_id" if table == "change_log" else "id"
+                    self._conn.execute(
+                        f"UPDATE {table} SET {column} = 'id-' || {key} WHERE {column} IS NULL"
+                    )
+        if migrate_preview:
+            # Запись в notes_preview запускает триггер превью, но не журнал изменений
+            self._conn.execute(
+                "UPDATE subscription SET notes_preview = NULL WHERE notes IS NOT NULL"
+            )
         self._conn.commit()
+        if self.get_meta("price_history_built") is None:
+            # Базы прежних версий: для подписок без истории — версия с текущей ценой
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO price_history (subscription_id, valid_from, cost)
+                    SELECT id, '0001-01-01', cost FROM subscription AS s
+                    WHERE NOT EXISTS (SELECT 1 FROM price_history WHERE subscription_id = s.id)
+                    """
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO app_meta (key, value) VALUES ('price_history_built', '1')"
+                )
+        if self.get_meta("payment_summary_built") is None:
+            self.rebuild_payment_summary()
+        if self.get_meta("archive_uuid_built") is None:
+            # Архивный файл прежней версии получает колонку uuid при подключении
+            # на запись; подключаем его сразу, чтобы читатели (mode=ro) видели колонку
+            self.payments_source()
+            self.set_meta("archive_uuid_built", "1")
+
+    def rebuild_payment_summary(self) -> None:
+        """
+        Пересчитывает payment_summary по всем оплатам, включая архивный файл.
+        Дальше сводку поддерживают триггеры; пересчёт нужен для баз, созданных
+        до её появления (выполняется при подключении один раз).
+        """
+        cx = self._cx()
+        source = self.payments_source()
+        archived = "NULL"
+        if source == "payment_all":
+            archived = "(SELECT MAX(c.date_paid) FROM cold.payment AS c WHERE c.subscription_id = s.id)"
+        with cx:
+            cx.execute("DELETE FROM payment_summary")
+            cx.execute(
+                f"""
+                INSERT INTO payment_summary
+                    (subscription_id, last_paid, paid_total, paid_count, archived_last)
+                SELECT s.id, MAX(p.date_paid), COALESCE(SUM(p.amount), 0), COUNT(p.id), {archived}
+                FROM subscription AS s LEFT JOIN {source} AS p ON p.subscription_id = s.id
+                GROUP BY s.id
+                """
+            )
+            cx.execute(
+                "INSERT OR REPLACE INTO app_meta (key, value) VALUES ('payment_summary_built', '1')"
+            )
+
+    def open_reader(self) -> Database:
+        """
+        Открывает отдельное соединение только для чтения к тому же файлу
+        (схему не применяет). Предназначено для фоновых потоков, поэтому
+        допускает использование не из создавшего его потока.
+        """
+        reader = Database(self.db_path)
+        reader._conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        reader._conn.row_factory = sqlite3.Row
+        reader._read_only = True
+        return reader
+
+    def open_writer(self) -> Database:
+        """
+        Открывает отдельное соединение для записи к тому же файлу (схему не применяет,
+        она уже создана основным соединением). Для длительной записи в фоновом потоке:
+        запись идёт короткими транзакциями, между ними пишет и GUI.
+        """
+        writer = Database(self.db_path)
+        writer._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        writer._conn.row_factory = sqlite3.Row
+        writer._conn.execute("PRAGMA foreign_keys = ON;")
+        return writer
 
     def connection(self) -> sqlite3.Connection:
         """Возвращает активное соединение SQLite."""
         return self._cx()
 
+    def get_meta(self, key: str, default: str | None = None) -> str | None:
+        """Читает служебное значение из app_meta."""
+        row = self._cx().execute("SELECT value FROM app_meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Сохраняет служебное значение в app_meta."""
+        self._cx().execute(
+            "INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)", (key, value)
+        )
+        self._cx().commit()
+
+    def archive_path(self) -> pathlib.Path:
+        """Путь к архивному файлу оплат: сохранённый в app_meta или рядом с основной БД."""
+        stored = self.get_meta("archive_path")
+        if stored:
+            return pathlib.Path(stored)
+        return self.db_path.with_name(f"{self.db_path.stem}-archive{self.db_path.suffix or '.db'}")
+
+    def archive_payments(
+        self,
+        cutoff: dt.date,
+        archive_path: str | pathlib.Path | None = None,
+        batch_size: int = 5000,
+    ) -> int:
+        """
+        Переносит оплаты с date_paid < cutoff в архивный файл пакетами
+        по batch_size строк. Каждый пакет — две короткие транзакции:
+        сначала копия в архив фиксируется отдельно, затем строки удаляются
+        из основного файла (фиксация через ATTACH не атомарна в режиме WAL).
+        Если между ними произойдёт сбой, строка останется в обоих файлах:
+        payment_all показывает её один раз, а повторный запуск безопасен —
+        в архив строки пишутся INSERT OR REPLACE по id.
+        Возвращает число перенесённых оплат.
+        """
+        cx = self._cx()
+        target = pathlib.Path(archive_path) if archive_path else self.archive_path()
+        if self._archive_attached and target != self.archive_path():
+            self._detach_archive()
+        self.set_meta("archive_path", str(target))
+        self._attach_archive()
+        border = cutoff.isoformat()
+        moved = 0
+        while True:
+            hi = cx.execute(
+                """
+                SELECT MAX(id) FROM (
+                    SELECT id FROM main.payment WHERE date_paid < ? ORDER BY id LIMIT ?
+                )
+                """,
+                (border, batch_size),
+            ).fetchone()[0]
+            if hi is None:
+                break
+            with cx:
+                cx.execute(
+                    f"""
+                    INSERT OR REPLACE INTO cold.payment ({PAYMENT_COLUMNS})
+                    SELECT {PAYMENT_COLUMNS} FROM main.payment
+                    WHERE date_paid < ? AND id <= ?
+                    """,
+                    (border, hi),
+                )
+            with cx:
+                # Перенос в архив — не изменение данных: журнал синхронизации
+                # и сводку оплат (payment_summary) не трогаем
+                cx.executemany(
+                    "INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, '1')",
+                    [("sync_apply",), ("archive_move",)],
+                )
+                cur = cx.execute(
+                    """
+                    DELETE FROM main.payment
+                    WHERE date_paid < ? AND id <= ?
+                      AND id IN (SELECT id FROM cold.payment)
+                    """,
+                    (border, hi),
+                )
+                moved += cur.rowcount
+                cx.execute("DELETE FROM app_meta WHERE key IN ('sync_apply', 'archive_move')")
+        if moved:
+            with cx:
+                # Последняя архивная оплата — для пересчёта сводки триггерами (им cold не виден)
+                cx.execute(
+                    """
+                    UPDATE payment_summary
+                    SET archived_last = (SELECT MAX(c.date_paid) FROM cold.payment AS c
+                                         WHERE c.subscription_id = payment_summary.subscription_id)
+                    WHERE subscription_id IN (SELECT subscription_id FROM cold.payment)
+                    """
+                )
+        # Граница архива только растёт: более свежие оплаты всегда в основном файле
+        previous = self.get_meta("archive_cutoff")
+        if previous is None or previous < border:
+            self.set_meta("archive_cutoff", border)
+        return moved
+
+    def _attach_archive(self) -> None:
+        """Подключает архивный файл как схему cold и создаёт представление payment_all."""
+        if self._archive_attached:
+            return
+        cx = self._cx()
+        path = self.archive_path()
+        if self._read_only:
+            cx.execute("ATTACH DATABASE ? AS cold", (f"{path.resolve().as_uri()}?mode=ro",))
+        else:
+            cx.execute("ATTACH DATABASE ? AS cold", (str(path),))
+            cx.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS cold.payment (
+                    id              INTEGER PRIMARY KEY,
+                    subscription_id INTEGER NOT NULL,
+                    date_paid       DATE    NOT NULL,
+                    amount          REAL    NOT NULL,
+                    comment         TEXT,
+                    uuid            TEXT                -- ключ синхронизации (src/sync.py)
+                );
+                CREATE INDEX IF NOT EXISTS cold.ix_payment_sub_date
+                    ON payment(subscription_id, date_paid, id);
+                """
+            )
+            cold_cols = {row[1] for row in cx.execute("PRAGMA cold.table_info(payment)")}
+            if "uuid" not in cold_cols:
+                # Архив прежней версии: ключи как у старых строк основного файла
+                with cx:
+                    cx.execute("ALTER TABLE cold.payment ADD COLUMN uuid TEXT")
+                    cx.execute("UPDATE cold.payment SET uuid = 'id-' || id")
+            cx.execute("CREATE UNIQUE INDEX IF NOT EXISTS cold.ux_payment_uuid ON payment(uuid)")
+        cx.execute(
+            f"""
+            CREATE TEMP VIEW IF NOT EXISTS payment_all AS
+            SELECT {PAYMENT_COLUMNS} FROM main.payment
+            UNION ALL
+            -- Строка, скопированная в архив, но ещё не удалённая из основного файла
+            -- (между двумя транзакциями переноса), учитывается один раз
+            SELECT {PAYMENT_COLUMNS} FROM cold.payment AS c
+            WHERE NOT EXISTS (SELECT 1 FROM main.payment AS m WHERE m.id = c.id)
+            """
+        )
+        self._archive_attached = True
+
+    def _detach_archive(self) -> None:
+        cx = self._cx()
+        cx.execute("DROP VIEW IF EXISTS temp.payment_all")
+        cx.execute("DETACH DATABASE cold")
+        self._archive_attached = False
+
+    def payments_source(self, since: dt.date | None = None) -> str:
+        """
+        Имя таблицы оплат для запроса, которому нужны оплаты начиная с since
+        (None — за всё время). Архивный файл подключается только если запрос
+        затрагивает даты старше границы архива.
+        """
+        cutoff = self.get_meta("archive_cutoff")
+        if cutoff is None or (since is not None and since.isoformat() >= cutoff):
+            return "payment"
+        if not self.archive_path().exists():
+            return "payment"
+        self._attach_archive()
+        return "payment_all"
+
+    def spent_since(self, start: dt.date | None = None) -> float:
+        """Сумма оплат начиная с даты start (None — за всё время, включая архив)."""
+        source = self.payments_source(start)
+        if start is None:
+            row = self._cx().execute(f"SELECT SUM(amount) FROM {source}").fetchone()
+        else:
+            row = self._cx().execute(
+                f"SELECT SUM(amount) FROM {source} WHERE date_paid >= ?", (start.isoformat(),)
+            ).fetchone()
+        return row[0] or 0.0
+
+    def stats_summary(self, today: dt.date | None = None) -> StatsSummary:
+        """Число активных/архивных подписок и траты за всё время, год и текущий месяц."""
+        today = today or dt.date.today()
+        snap = self.snapshot()
+        return StatsSummary(
+            active=snap.count(active=True),
+            archived=snap.count(active=False),
+            total=self.spent_since(None),
+            year=self.spent_since(today - dt.timedelta(days=365)),
+            month=self.spent_since(today.replace(day=1)),
+            forecast=self.forecast(today + dt.timedelta(days=FORECAST_DAYS), today),
+        )
+
+    def forecast(self, until: dt.date, today: dt.date | None = None) -> float:
+        """
+        Сумма ожидаемых платежей активных подписок до даты until включительно:
+        все даты от next_due (в том числе просроченные) с шагом периода,
+        каждая — по цене, действовавшей на эту дату.
+        """
+        today = today or dt.date.today()
+        snap = self.snapshot()
+        pairs = []
+        for i in snap.indices(active=True):
+            due = snap.next_due(i)
+            if due is None:
+                continue
+            sid, period, n = snap.ids[i], snap.periods[i], 0
+            day = due
+            while day <= until:
+                pairs.append((sid, day))
+                n += 1
+                day = add_period(due, period, n)
+        return sum(cost or 0.0 for cost in costs_as_of(self._cx(), pairs))
+
+    def costs_as_of(self, pairs: Iterable[tuple[int, dt.date]]) -> list[float | None]:
+        """Цены подписок на даты (см. модульную costs_as_of)."""
+        return costs_as_of(self._cx(), pairs)
+
+    def price_history(self, sub_id: int) -> list[sqlite3.Row]:
+        """Версии цены подписки по возрастанию даты начала."""
+        return self._cx().execute(
+            """
+            SELECT valid_from, valid_to, cost FROM price_history
+            WHERE subscription_id=? ORDER BY valid_from
+            """,
+            (sub_id,),
+        ).fetchall()
+
+    def set_cost(self, sub_id: int, cost: float, effective: dt.date | None = None) -> None:
+        """
+        Новая цена подписки, действующая с даты effective (по умолчанию — сегодня).
+        Версии, начинавшиеся с effective и позже, заменяются новой; версия,
+        действовавшая на effective, закрывается этой датой. Будущие даты
+        не поддерживаются: subscription.cost всегда равна сегодняшней цене.
+        """
+        today = dt.date.today()
+        effective = effective or today
+        if effective > today:
+            raise ValueError("дата начала действия цены не может быть в будущем")
+        day = effective.isoformat()
+        cx = self._cx()
+        with cx:
+            cx.execute(
+                "DELETE FROM price_history WHERE subscription_id=? AND valid_from>=?",
+                (sub_id, day),
+            )
+            cx.execute(
+                """
+                UPDATE price_history SET valid_to=?
+                WHERE subscription_id=? AND (valid_to IS NULL OR valid_to>?)
+                """,
+                (day, sub_id, day),
+            )
+            cx.execute(
+                "INSERT INTO price_history (subscription_id, valid_from, cost) VALUES (?, ?, ?)",
+                (sub_id, day, cost),
+            )
+            # Открытая версия с новой ценой уже записана, поэтому trg_price_history_upd
+            # ничего не добавит (его условие не зависит от даты)
+            cx.execute("UPDATE subscription SET cost=? WHERE id=?", (cost, sub_id))
+
     def add_subscription(
         self,
         name: str,
@@ -48,37 +645,243 @@ class Database:
         period: str,
         next_due: dt.date,
         notes: str = "",
+        tags: Iterable[str] = (),
     ) -> int:
-        cur = self._cx().execute(
+        cx = self._cx()
+        with cx:
+            cur = cx.execute(
+                """
+                INSERT INTO subscription (name, cost, period, next_due, notes)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (name, cost, period, next_due.isoformat(), notes),
+            )
+            self._link_tags(cx, [cur.lastrowid], tags)  # type: ignore
+        return cur.lastrowid  # type: ignore
+
+    @staticmethod
+    def _link_tags(cx: sqlite3.Connection, sub_ids: list[int], tags: Iterable[str]) -> None:
+        """Привязывает теги к подпискам, создавая недостающие (внутри транзакции вызывающего)."""
+        # Ключ без учёта регистра -> название в том виде, как его ввели впервые
+        names: dict[str, str] = {}
+        for tag in tags:
+            if tag := tag.strip():
+                names.setdefault(tag.casefold(), tag)
+        if not names:
+            return
+        cx.executemany(
+            "INSERT OR IGNORE INTO tag (name, key) VALUES (?, ?)",
+            ((name, key) for key, name in names.items()),
+        )
+        cx.executemany(
             """
-            INSERT INTO subscription (name, cost, period, next_due, notes)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT OR IGNORE INTO subscription_tag (subscription_id, tag_id)
+            SELECT ?, id FROM tag WHERE key = ?
             """,
-            (name, cost, period, next_due.isoformat(), notes),
+            ((sid, key) for sid in sub_ids for key in names),
         )
-        self._cx().commit()
-        return cur.lastrowid  # type: ignore
 
-    def get_subscription(self, sub_id: int) -> sqlite3.Row | None:
+    def set_tags(self, sub_ids: Iterable[int], tags: Iterable[str]) -> None:
+        """Заменяет теги у подписок одной транзакцией; теги без подписок удаляются."""
+        sub_ids = list(sub_ids)
+        cx = self._cx()
+        with cx:
+            cx.executemany(
+                "DELETE FROM subscription_tag WHERE subscription_id=?",
+                ((sid,) for sid in sub_ids),
+            )
+            self._link_tags(cx, sub_ids, tags)
+            cx.execute(
+                """
+                DELETE FROM tag
+                WHERE NOT EXISTS (SELECT 1 FROM subscription_tag WHERE tag_id = tag.id)
+                """
+            )
+
+    def tags(self) -> list[sqlite3.Row]:
+        """Все категории (id, name) по алфавиту."""
+        return self._cx().execute("SELECT id, name FROM tag ORDER BY key").fetchall()
+
+    def tags_of(self, sub_id: int) -> list[str]:
+        """Названия категорий подписки."""
+        rows = self._cx().execute(
+            """
+            SELECT t.name FROM subscription_tag AS st JOIN tag AS t ON t.id = st.tag_id
+            WHERE st.subscription_id=? ORDER BY t.key
+            """,
+            (sub_id,),
+        )
+        return [row[0] for row in rows]
+
+    def category_spend(self, start: dt.date, end: dt.date) -> list[tuple[str | None, float]]:
+        """
+        Траты по категориям за [start, end) одним GROUP BY: оплаты берутся
+        диапазоном по ix_payment_date, категории — по первичному ключу
+        subscription_tag. Оплата подписки с несколькими тегами входит в каждую
+        из её категорий; None — подписки без категории. По убыванию суммы.
+        """
+        source = self.payments_source(start)
+        rows = self._cx().execute(
+            f"""
+            SELECT t.name, SUM(p.amount) AS spent
+            FROM {source} AS p
+            LEFT JOIN subscription_tag AS st ON st.subscription_id = p.subscription_id
+            LEFT JOIN tag AS t ON t.id = st.tag_id
+            WHERE p.date_paid >= ? AND p.date_paid < ?
+            GROUP BY st.tag_id
+            ORDER BY spent DESC, t.key
+            """,
+            (start.isoformat(), end.isoformat()),
+        )
+        return [(name, spent) for name, spent in rows]
+
+    @staticmethod
+    def _projection(columns: Iterable[str]) -> str:
+        """Список колонок для SELECT; имена проверяются, т.к. подставляются в SQL."""
+        columns = tuple(columns)
+        unknown = set(columns) - _SUBSCRIPTION_ALL
+        if unknown:
+            raise ValueError(f"неизвестные колонки subscription: {sorted(unknown)}")
+        return ", ".join(columns)
+
+    def get_subscription(
+        self,
+        sub_id: int,
+        columns: Iterable[str] = SUBSCRIPTION_COLUMNS,
+    ) -> sqlite3.Row | None:
+        """Одна подписка; полный текст заметок — только если "notes" есть в columns."""
         return self._cx().execute(
-            "SELECT * FROM subscription WHERE id=?", (sub_id,)
+            f"SELECT {self._projection(columns)} FROM subscription WHERE id=?", (sub_id,)
         ).fetchone()
 
-    def list_subscriptions(self, active_only: bool = True) -> list[sqlite3.Row]:
+    def get_notes(self, sub_id: int) -> str:
+        """Полный текст заметок подписки (читается по запросу, а не вместе с таблицей)."""
+        row = self._cx().execute("SELECT notes FROM subscription WHERE id=?", (sub_id,)).fetchone()
+        return (row[0] or "") if row else ""
+
+    def list_subscriptions(
+        self,
+        active_only: bool = True,
+        columns: Iterable[str] = SUBSCRIPTION_COLUMNS,
+    ) -> list[sqlite3.Row]:
         """
         Возвращает все подписки.
         Если active_only=True, только is_active=1, иначе все.
         """
+        cols = self._projection(columns)
         if active_only:
             rows = self._cx().execute(
-                "SELECT * FROM subscription WHERE is_active=1 ORDER BY next_due"
+                f"SELECT {cols} FROM subscription WHERE is_active=1 ORDER BY next_due"
             ).fetchall()
         else:
             rows = self._cx().execute(
-                "SELECT * FROM subscription ORDER BY is_active DESC, next_due"
+                f"SELECT {cols} FROM subscription ORDER BY is_active DESC, next_due"
             ).fetchall()
         return rows
 
+    def data_version(self) -> tuple[int, int]:
+        """
+        Версия данных: число изменений через это соединение
+        и PRAGMA data_version (меняется при коммитах других соединений).
+        """
+        cx = self._cx()
+        return cx.total_changes, cx.execute("PRAGMA data_version").fetchone()[0]
+
+    def snapshot(self, tag_id: int | None = None) -> SubscriptionSnapshot:
+        """
+        Возвращает колоночный снимок всех подписок (активные, затем архивные, по next_due).
+        Загружается одним запросом и переиспользуется, пока данные в БД не изменились.
+        С tag_id — только подписки этой категории (выборка по ix_subscription_tag_tag).
+        """
+        version = self.data_version()
+        if tag_id is not None:
+            return self._category_snapshot(tag_id, version)
+        if self._snapshot is not None and self._snapshot_version == version:
+            return self._snapshot
+        cur = self._cx().cursor()
+        cur.row_factory = None  # обычные кортежи дешевле sqlite3.Row
+        cur.execute(
+            """
+            SELECT s.id, s.name, s.cost, s.period,
+                   CAST(julianday(s.next_due) - ? AS INTEGER),
+                   s.is_active, s.notes_preview,
+                   CAST(julianday(ps.last_paid) - ? AS INTEGER), ps.paid_total, ps.paid_count
+            FROM subscription AS s
+            LEFT JOIN payment_summary AS ps ON ps.subscription_id = s.id
+            ORDER BY s.is_active DESC, s.next_due
+            """,
+            (_JULIAN_TO_ORDINAL, _JULIAN_TO_ORDINAL),
+        )
+        self._snapshot = SubscriptionSnapshot.from_rows(cur)
+        self._snapshot_version = version
+        return self._snapshot
+
+    def _category_snapshot(self, tag_id: int, version: tuple[int, int]) -> SubscriptionSnapshot:
+        """Снимок подписок одной категории (кэшируется последний запрошенный)."""
+        if self._tag_snapshot is not None and self._tag_snapshot[:2] == (tag_id, version):
+            return self._tag_snapshot[2]
+        cur = self._cx().cursor()
+        cur.row_factory = None
+        cur.execute(
+            """
+            SELECT s.id, s.name, s.cost, s.period,
+                   CAST(julianday(s.next_due) - ? AS INTEGER),
+                   s.is_active, s.notes_preview,
+                   CAST(julianday(ps.last_paid) - ? AS INTEGER), ps.paid_total, ps.paid_count
+            FROM subscription_tag AS st
+            JOIN subscription AS s ON s.id = st.subscription_id
+            LEFT JOIN payment_summary AS ps ON ps.subscription_id = s.id
+            WHERE st.tag_id = ?
+            ORDER BY s.is_active DESC, s.next_due
+            """,
+            (_JULIAN_TO_ORDINAL, _JULIAN_TO_ORDINAL, tag_id),
+        )
+        snap = SubscriptionSnapshot.from_rows(cur)
+        self._tag_snapshot = (tag_id, version, snap)
+        return snap
+
+    def spend_series(
+        self,
+        granularity: str = "month",
+        subscription_id: int | None = None,
+    ) -> tuple[array, array]:  # type: ignore
+        """
+        Ряд трат, сгруппированный в SQL по корзинам day/week/month/year.
+        Возвращает (xs, ys): начало корзины как date.toordinal() и сумму оплат.
+        Результат кэшируется по гранулярности и подписке до изменения данных.
+        """
+        bucket = SERIES_BUCKETS[granularity]
+        version = self.data_version()
+        if self._series_version != version:
+            self._series_cache.clear()
+            self._series_version = version
+        key = (granularity, subscription_id)
+        if key in self._series_cache:
+            return self._series_cache[key]
+
+        where, params = "", [_JULIAN_TO_ORDINAL]
+        if subscription_id is not None:
+            where = "WHERE subscription_id=?"
+            params.append(subscription_id)  # type: ignore
+        cur = self._cx().cursor()
+        cur.row_factory = None
+        cur.execute(
+            f"""
+            SELECT CAST(julianday(b) - ? AS INTEGER), SUM(amount)
+            FROM (SELECT {bucket} AS b, amount FROM {self.payments_source()} {where})
+            WHERE b IS NOT NULL
+            GROUP BY b
+            ORDER BY b
+            """,
+            params,
+        )
+        xs, ys = array("i"), array("d")
+        for x, y in cur:
+            xs.append(x)
+            ys.append(y)
+        self._series_cache[key] = (xs, ys)
+        return xs, ys
+
     def add_payment(
         self,
         subscription_id: int,
@@ -96,11 +899,106 @@ class Database:
         self._cx().commit()
         return cur.lastrowid  # type: ignore
 
-    def due_soon(self, days_ahead: int = 3) -> list[sqlite3.Row]:
+    def payments_page(
+        self,
+        subscription_id: int,
+        after: tuple[str, int] | None = None,
+        limit: int = 200,
+    ) -> list[sqlite3.Row]:
+        """
+        Страница истории оплат подписки, от новых к старым.
+        after — ключ (date_paid, id) последней строки предыдущей страницы;
+        выборка идёт по индексу ix_payment_sub_date без OFFSET, поэтому
+        время загрузки страницы не зависит от её номера и длины истории.
+        """
+        source = self.payments_source()
+        if after is None:
+            return self._cx().execute(
+                f"""
+                SELECT id, date_paid, amount, comment FROM {source}
+                WHERE subscription_id=?
+                ORDER BY date_paid DESC, id DESC
+                LIMIT ?
+                """,
+                (subscription_id, limit),
+            ).fetchall()
+        return self._cx().execute(
+            f"""
+            SELECT id, date_paid, amount, comment FROM {source}
+            WHERE subscription_id=? AND (date_paid, id) < (?, ?)
+            ORDER BY date_paid DESC, id DESC
+            LIMIT ?
+            """,
+            (subscription_id, after[0], after[1], limit),
+        ).fetchall()
+
+    def set_active_many(self, sub_ids: Iterable[int], active: bool) -> int:
+        """
+        Архивирует (active=False) или восстанавливает подписки одним executemany
+        в одной транзакции. Возвращает число изменённых строк.
+        """
+        cx = self._cx()
+        with cx:
+            cur = cx.executemany(
+                "UPDATE subscription SET is_active=? WHERE id=?",
+                ((1 if active else 0, sid) for sid in sub_ids),
+            )
+        return cur.rowcount
+
+    def delete_subscriptions(self, sub_ids: Iterable[int]) -> int:
+        """
+        Удаляет подписки (и их оплаты — ON DELETE CASCADE) в одной транзакции.
+        Оплаты в архивном файле внешним ключом не связаны, их удаляем явно.
+        """
+        sub_ids = list(sub_ids)
+        if self.payments_source() == "payment_all":
+            cold = [(sid,) for sid in sub_ids]
+        else:
+            cold = []
+        cx = self._cx()
+        with cx:
+            cur = cx.executemany(
+                "DELETE FROM subscription WHERE id=?", ((sid,) for sid in sub_ids)
+            )
+            deleted = cur.rowcount
+            if cold:
+                cx.executemany("DELETE FROM cold.payment WHERE subscription_id=?", cold)
+        return deleted
+
+    def mark_paid_many(
+        self,
+        entries: Iterable[tuple[int, float, str]],
+        date_paid: dt.date,
+    ) -> None:
+        """
+        Отмечает оплату сразу нескольких подписок в одной транзакции.
+        entries — кортежи (id подписки, сумма, новая дата next_due в ISO).
+        """
+        entries = list(entries)
+        paid = date_paid.isoformat()
+        cx = self._cx()
+        with cx:
+            cx.executemany(
+                """
+                INSERT INTO payment (subscription_id, date_paid, amount, comment)
+                VALUES (?, ?, ?, '')
+                """,
+                ((sid, paid, amount) for sid, amount, _ in entries),
+            )
+            cx.executemany(
+                "UPDATE subscription SET next_due=? WHERE id=?",
+                ((new_due, sid) for sid, _, new_due in entries),
+            )
+
+    def due_soon(
+        self,
+        days_ahead: int = 3,
+        columns: Iterable[str] = SUBSCRIPTION_COLUMNS,
+    ) -> list[sqlite3.Row]:
         param = f"+{days_ahead} days"
         return self._cx().execute(
-            """
-            SELECT * FROM subscription
+            f"""
+            SELECT {self._projection(columns)} FROM subscription
             WHERE next_due <= DATE('now', ?)
               AND is_active=1
             ORDER BY next_due
@@ -0,0 +1,401 @@
+"""
+Поиск похожих названий подписок по триграммам.
+
+    python -m src.duplicates subscriptions.db --threshold 0.5
+
+Название нормализуется (регистр, знаки, лишние пробелы) и раскладывается
+на триграммы слов, как в pg_trgm: «  net», « ne», «net», ..., «ix ».
+Триграмма кодируется одним целым (три кода символа по 21 бит), индекс
+name_trigram хранит пары (триграмма, подписка). Триггеры схемы кладут id
+новых и переименованных подписок в очередь name_index_dirty, а индекс
+дообновляется перед каждым поиском — так учитываются и импорт, и дельты
+синхронизации, и правки в обход приложения. Большую очередь (первое
+построение на старой базе) разбирает фоновый поток главного окна.
+
+Сходство — коэффициент Жаккара по множествам триграмм. Работают префиксные
+фильтры: если J(x, y) >= t, то y содержит хотя бы одну из |x| - ceil(t*|x|) + 1
+самых редких триграмм x, поэтому кандидатов ищем только по ним.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Callable
+
+from src.db import Database, connect
+
+log = logging.getLogger(__name__)
+
+# Порог сходства для подсказок в диалоге и для поиска кластеров
+SUGGEST_THRESHOLD = 0.4
+CLUSTER_THRESHOLD = 0.5
+# Размер пачки при обновлении индекса: короткие транзакции,
+# пока индекс строится в фоне, GUI тоже пишет в базу
+REFRESH_BATCH = 5_000
+# Сколько подписок из очереди индекса подсказки в диалоге дообновляют сами
+SUGGEST_MAX_PENDING = 1_000
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    """«  NETFLIX  Premium! » -> «netflix premium»."""
+    return " ".join(_NON_WORD.sub(" ", name.casefold()).split())
+
+
+def trigrams(norm: str) -> set[int]:
+    """Триграммы нормализованного названия, закодированные целыми."""
+    grams = set()
+    for word in norm.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            a, b, c = padded[i:i + 3]
+            grams.add((ord(a) << 42) | (ord(b) << 21) | ord(c))
+    return grams
+
+
+def jaccard(a: set[int], b: set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def _prefix_len(size: int, threshold: float) -> int:
+    """Сколько самых редких триграмм достаточно проверить (префиксный фильтр)."""
+    return size - math.ceil(threshold * size) + 1
+
+
+def pending_names(db: Database, limit: int) -> int:
+    """
+    Сколько подписок ждёт индексации (не больше limit + 1): очередь
+    name_index_dirty, а если индекс ещё ни разу не строился — все подписки.
+    """
+    table = "name_index_dirty" if db.get_meta("name_index_built") is not None else "subscription"
+    return db.connection().execute(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} LIMIT ?)", (limit + 1,)
+    ).fetchone()[0]
+
+
+def refresh_name_index(
+    db: Database,
+    max_pending: int | None = None,
+    batches: int | None = None,
+) -> int:
+    """
+    Перестраивает записи индекса для подписок из очереди name_index_dirty.
+    При первом запуске на старой базе ставит в очередь все подписки.
+    Если ждут индексации больше max_pending подписок, ничего не делает:
+    большую очередь разбирает фоновое построение (MainWindow), а не GUI-поток.
+    batches ограничивает число пачек за вызов, чтобы фоновое построение
+    можно было прервать между ними. Возвращает число обработанных подписок.
+    """
+    if max_pending is not None and pending_names(db, max_pending) > max_pending:
+        return 0
+    cx = db.connection()
+    if db.get_meta("name_index_built") is None:
+        with cx:
+            cx.execute("INSERT OR IGNORE INTO name_index_dirty SELECT id FROM subscription")
+            cx.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('name_index_built', '1')")
+    done = 0
+    while batches is None or batches > 0:
+        if batches is not None:
+            batches -= 1
+        rows = cx.execute(
+            """
+            SELECT d.subscription_id, s.name
+            FROM name_index_dirty AS d LEFT JOIN subscription AS s ON s.id = d.subscription_id
+            LIMIT ?
+            """,
+            (REFRESH_BATCH,),
+        ).fetchall()
+        if not rows:
+            return done
+        with cx:
+            ids = json.dumps([row[0] for row in rows])
+            for table in ("name_trigram", "name_index", "name_index_dirty"):
+                cx.execute(
+                    f"DELETE FROM {table} WHERE subscription_id IN (SELECT value FROM json_each(?))",
+                    (ids,),
+                )
+            entries, grams = [], []
+            for sid, name in rows:
+                if name is None:  # подписку уже удалили
+                    continue
+                norm = normalize_name(name)
+                tg = trigrams(norm)
+                entries.append((sid, norm, len(tg)))
+                grams.extend((g, sid) for g in tg)
+            cx.executemany(
+                "INSERT INTO name_index (subscription_id, norm, grams) VALUES (?, ?, ?)", entries
+            )
+            grams.sort()  # вставка по порядку ключа дешевле для B-дерева
+            cx.executemany(
+                "INSERT INTO name_trigram (trigram, subscription_id) VALUES (?, ?)", grams
+            )
+        done += len(rows)
+    return done
+
+
+class NameIndexBuilder:
+    """
+    Разбирает большую очередь индекса (первое построение на старой базе)
+    в фоновом потоке через отдельное соединение, пачками по REFRESH_BATCH.
+    stop() прерывает построение между пачками — остаток разберёт следующий запуск.
+    """
+    def __init__(self, db: Database):
+        self._db = db
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> bool:
+        """Запускает поток, если очередь больше SUGGEST_MAX_PENDING. In-memory база не видна другим соединениям."""
+        if str(self._db.db_path) == ":memory:" or pending_names(self._db, SUGGEST_MAX_PENDING) <= SUGGEST_MAX_PENDING:
+            return False
+        self._thread = threading.Thread(target=self._run, name="name-index", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        writer = self._db.open_writer()
+        try:
+            while not self._stop.is_set() and refresh_name_index(writer, batches=1):
+                pass
+        except sqlite3.Error:
+            log.exception("не удалось построить индекс названий")
+        finally:
+            writer.close()
+
+
+def find_similar(
+    db: Database,
+    name: str,
+    threshold: float = SUGGEST_THRESHOLD,
+    limit: int = 5,
+    exclude: int | None = None,
+    max_pending: int | None = None,
+) -> list[tuple[int, str, float]]:
+    """
+    Подписки с названием, похожим на name: (id, название, сходство) по убыванию сходства.
+    Кандидаты берутся из name_trigram только по самым редким триграммам запроса.
+    max_pending — как в refresh_name_index: при большой очереди ищем по тому,
+    что уже проиндексировано.
+    """
+    query = trigrams(normalize_name(name))
+    if not query:
+        return []
+    refresh_name_index(db, max_pending)
+    cx = db.connection()
+    # Частота каждой триграммы — длина её списка в индексе (диапазон по первичному ключу)
+    freq = dict(cx.execute(
+        """
+        SELECT g.value, (SELECT COUNT(*) FROM name_trigram WHERE trigram = g.value)
+        FROM json_each(?) AS g
+        """,
+        (json.dumps(sorted(query)),),
+    ).fetchall())
+    rare = sorted(query, key=lambda g: freq.get(g, 0))[:_prefix_len(len(query), threshold)]
+    rows = cx.execute(
+        """
+        SELECT s.id, s.name, n.norm, n.grams
+        FROM (SELECT DISTINCT subscription_id FROM name_trigram
+              WHERE trigram IN (SELECT value FROM json_each(?))) AS c
+        JOIN name_index AS n ON n.subscription_id = c.subscription_id
+        JOIN subscription AS s ON s.id = c.subscription_id
+        """,
+        (json.dumps(rare),),
+    ).fetchall()
+    found = []
+    for sid, sub_name, norm, size in rows:
+        # Фильтр по длине: при сильно разных размерах сходство заведомо ниже порога
+        if sid == exclude or not threshold * len(query) <= size <= len(query) / threshold:
+            continue
+        sim = jaccard(query, trigrams(norm))
+        if sim >= threshold:
+            found.append((sid, sub_name, sim))
+    found.sort(key=lambda r: (-r[2], r[1]))
+    return found[:limit]
+
+
+def _ceil(expr: str) -> str:
+    """SQL-выражение ceil(expr) для положительных значений."""
+    return f"(CAST({expr} AS INTEGER) + ({expr} > CAST({expr} AS INTEGER)))"
+
+
+# Этапов в duplicate_clusters (для индикатора прогресса)
+CLUSTER_STAGES = 4
+
+
+def duplicate_clusters(
+    db: Database,
+    threshold: float = CLUSTER_THRESHOLD,
+    progress: Callable[[int, int], None] | None = None,
+) -> list[list[tuple[int, str]]]:
+    """
+    Группы похожих подписок (в группе две и больше) для всей базы.
+
+    Одинаковые после нормализации названия сразу попадают в одну группу
+    (представитель — подписка с меньшим id), а для различных выполняется
+    соединение по сходству PPJoin прямо в SQL по таблице name_trigram:
+    триграммы представителя нумеруются от редких к частым, название ищет
+    пары по префиксу из самых редких триграмм среди ещё более короткого
+    префикса не более длинных названий. Кандидаты отсекаются фильтром длины
+    и позиционным фильтром (оценка сверху для пересечения по позициям общей
+    триграммы), сходство проверяется поиском по первичному ключу name_trigram.
+    В Python приходят только найденные пары — они объединяются в группы
+    (система непересекающихся множеств). progress(этап, этапов) вызывается
+    после каждого этапа.
+    """
+    def step(done: int) -> None:
+        if progress is not None:
+            progress(done, CLUSTER_STAGES)
+
+    refresh_name_index(db)
+    step(1)
+    cx = db.connection()
+    ratio = threshold / (1 + threshold)
+    try:
+        with cx:
+            cx.executescript(
+                """
+                CREATE TEMP TABLE dup_member (
+                    sid   INTEGER PRIMARY KEY,
+                    rep   INTEGER NOT NULL,   -- подписка с тем же названием и меньшим id
+                    same  INTEGER NOT NULL,   -- подписок с таким названием
+                    grams INTEGER NOT NULL
+                );
+                CREATE TEMP TABLE dup_df (trigram INTEGER PRIMARY KEY, n INTEGER NOT NULL);
+                -- Префикс представителя: pos с 1 по редкости, probe = 0 — в индексном префиксе
+                CREATE TEMP TABLE dup_token (
+                    trigram INTEGER NOT NULL,
+                    grams   INTEGER NOT NULL,
+                    sid     INTEGER NOT NULL,
+                    pos     INTEGER NOT NULL,
+                    probe   INTEGER NOT NULL
+                );
+                INSERT INTO dup_member (sid, rep, same, grams)
+                SELECT subscription_id,
+                       MIN(subscription_id) OVER (PARTITION BY norm),
+                       COUNT(*) OVER (PARTITION BY norm),
+                       grams
+                FROM name_index;
+                -- Частота триграммы — длина её списка (проход по первичному ключу)
+                INSERT INTO dup_df SELECT trigram, COUNT(*) FROM name_trigram GROUP BY trigram;
+                """
+            )
+            # Префикс для поиска — grams - ceil(t*grams) + 1 триграмм,
+            # индексный — grams - ceil(2t/(1+t)*grams) + 1
+            cx.execute(
+                f"""
+                INSERT INTO dup_token (trigram, grams, sid, pos, probe)
+                SELECT trigram, grams, sid, pos, pos > grams - {_ceil("?2 * grams")} + 1
+                FROM (
+                    SELECT t.trigram, m.sid, m.grams,
+                           ROW_NUMBER() OVER (PARTITION BY m.sid ORDER BY d.n, t.trigram) AS pos
+                    FROM dup_member AS m
+                    JOIN name_trigram AS t ON t.subscription_id = m.sid
+                    JOIN dup_df AS d ON d.trigram = t.trigram
+                    WHERE m.sid = m.rep AND m.grams > 0
+                )
+                WHERE pos <= grams - {_ceil("?1 * grams")} + 1
+                """,
+                (threshold, 2 * ratio),
+            )
+            cx.execute("CREATE INDEX temp.ix_dup_token ON dup_token (trigram, probe, grams, sid, pos)")
+        step(2)
+        # y не длиннее x (при равной длине — меньший id), общая триграмма
+        # в префиксе x и в индексном префиксе y. Позиционный фильтр верен для
+        # первой общей триграммы, так что хватает одной подходящей
+        cur = cx.cursor()
+        cur.row_factory = None
+        pairs = cur.execute(
+            f"""
+            SELECT x, y FROM (
+                SELECT c.x, c.y, c.gx, c.gy,
+                       (SELECT COUNT(*) FROM name_trigram AS a
+                        JOIN name_trigram AS b ON b.trigram = a.trigram AND b.subscription_id = c.y
+                        WHERE a.subscription_id = c.x) AS shared
+                FROM (
+                    SELECT DISTINCT x.sid AS x, y.sid AS y, x.grams AS gx, y.grams AS gy
+                    FROM dup_token AS x
+                    JOIN dup_token AS y
+                      ON y.trigram = x.trigram AND y.probe = 0
+                     AND y.grams BETWEEN ?1 * x.grams AND x.grams
+                     AND (y.grams < x.grams OR y.sid < x.sid)
+                    WHERE 1 + min(x.grams - x.pos, y.grams - y.pos) >= {_ceil("?2 * (x.grams + y.grams)")}
+                ) AS c
+            )
+            WHERE shared >= ?1 * (gx + gy - shared)
+            """,
+            (threshold, ratio),
+        ).fetchall()
+        step(3)
+
+        parent: dict[int, int] = {}
+
+        def find(i: int) -> int:
+            parent.setdefault(i, i)
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for x, y in pairs:
+            root_x, root_y = find(x), find(y)
+            if root_x != root_y:
+                parent[root_x] = root_y
+        groups: dict[int, list[tuple[int, str]]] = defaultdict(list)
+        for sid, rep, name in cur.execute(
+            """
+            SELECT m.sid, m.rep, s.name
+            FROM dup_member AS m JOIN subscription AS s ON s.id = m.sid
+            WHERE m.same > 1 OR m.rep IN (SELECT value FROM json_each(?))
+            ORDER BY m.sid
+            """,
+            (json.dumps(list(parent)),),
+        ):
+            groups[find(rep)].append((sid, name))
+        step(4)
+    finally:
+        cx.executescript(
+            """
+            DROP TABLE IF EXISTS temp.dup_member;
+            DROP TABLE IF EXISTS temp.dup_df;
+            DROP TABLE IF EXISTS temp.dup_token;
+            """
+        )
+    return sorted(
+        (cluster for cluster in groups.values() if len(cluster) > 1),
+        key=lambda cluster: (-len(cluster), cluster[0][1].casefold()),
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Поиск похожих подписок (возможных дубликатов)")
+    parser.add_argument("db")
+    parser.add_argument("--threshold", type=float, default=CLUSTER_THRESHOLD)
+    args = parser.parse_args(argv)
+    with connect(args.db) as db:
+        clusters = duplicate_clusters(db, args.threshold)
+        for cluster in clusters:
+            print(" | ".join(f"{name} (#{sid})" for sid, name in cluster))
+        print(f"групп: {len(clusters)}")
+
+
+if __name__ == "__main__":
+    main()
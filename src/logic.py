@@ -1,8 +1,7 @@
-from PyQt6.QtCore import QObject, QTimer, QUrl
-from PyQt6.QtMultimedia import QSoundEffect
+from PyQt6.QtCore import QObject, QTimer
 
+from src.audio import sound_service
 from src.db import Database
-from src.config import SOUND_PATH
 
 
 class Reminder(QObject):
@@ -10,10 +9,8 @@ class Reminder(QObject):
         super().__init__(parent)  # type: ignore
         self.db = db
 
-        # Настройка плеера
-        self.player = QSoundEffect()
-        self.player.setSource(QUrl.fromLocalFile(SOUND_PATH))
-        self.player.setVolume(0.5)
+        # Общий сервис звука: загружается лениво и сливает частые сигналы в один
+        self.sound = sound_service()
 
         # Таймер проверки подписок
         self.timer = QTimer(self)
@@ -26,5 +23,5 @@ class Reminder(QObject):
 
     def check(self):
         # Если есть подписки, срок которых скоро наступит — проигрываем звук
-        if self.db.due_soon():
-            self.player.play()
+        if self.db.snapshot().due_within(days_ahead=3):
+            self.sound.play()
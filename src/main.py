@@ -1,17 +1,25 @@
+import logging
+import multiprocessing
+import os
 import sys
 from pathlib import Path
 
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QFontDatabase, QFont, QIcon
-from PyQt6.QtMultimedia import QSoundEffect
-from PyQt6.QtCore import QUrl
+from PyQt6.QtCore import QTimer
 
-from src.config import STYLE_PATH, ICON_PATH, FONT_PATH, SOUND_PATH
-from src.db import Database
+from src.audio import sound_service
+from src.config import STYLE_PATH, ICON_PATH, FONT_PATH
+from src.backup import BackupManager, BackupScheduler
+from src.memory import profiling_enabled
+from src.profiles import ProfileRegistry
 from src.ui.main_window import MainWindow
 
 
 def main():
+    # В режиме профилирования памяти замеры пишутся в лог на уровне INFO
+    if profiling_enabled():
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
 
     # Применяем глобальный стиль
@@ -30,25 +38,33 @@ def main():
     if Path(ICON_PATH).exists():
         app.setWindowIcon(QIcon(ICON_PATH))
 
-    # Проигрываем стартовый звук
-    if Path(SOUND_PATH).exists():
-        sound = QSoundEffect()
-        sound.setSource(QUrl.fromLocalFile(SOUND_PATH))
-        sound.setLoopCount(1)
-        sound.play()
+    # Стартовый звук: сервис загрузит его уже после показа окна
+    sound_service().play()
 
-    # Подключаем и инициализируем базу
-    db_file = Path("subscriptions.db")
-    db = Database(db_file)
-    db.connect()
+    # Открываем базы всех профилей (параллельно); без profiles.json — только subscriptions.db
+    registry = ProfileRegistry.load()
+    registry.open_all()
+    db = registry.database(registry.names()[0])
+
+    # Резервные копии каждого профиля по расписанию в фоновых потоках
+    for profile in registry.profiles:
+        scheduler = BackupScheduler(BackupManager(profile.path))
+        scheduler.start()
+        app.aboutToQuit.connect(scheduler.stop)  # type: ignore
 
     # Создаём главное окно
-    win = MainWindow(db)
+    win = MainWindow(db, backups=BackupManager(db.db_path), registry=registry)
     win.resize(900, 600)
     win.show()
 
+    # Режим замера времени старта (tools/bench_startup.py): выходим после первого цикла событий
+    if os.environ.get("SUBTRACKER_STARTUP_BENCH"):
+        QTimer.singleShot(0, app.quit)
+
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
+    # Нужно для пула процессов отчётов в собранном PyInstaller exe
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,346 @@
+"""
+Обслуживание базы в простое приложения.
+
+Задачи (контрольная точка WAL, ANALYZE, PRAGMA optimize, incremental_vacuum,
+для старых баз — однократный перевод на auto_vacuum=INCREMENTAL через VACUUM
+в рабочем потоке)
+оформлены генераторами: каждый yield — небольшая порция работы, после которой
+задачу можно приостановить и позже продолжить с того же места. Планировщик
+запускает порции, пока пользователь ничего не делает, укладывая каждый проход
+в бюджет времени, и останавливается при первом же вводе с клавиатуры или мыши.
+Итоги запусков пишутся в таблицу maintenance_log.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Generator
+
+from PyQt6.QtCore import QEvent, QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QGuiApplication
+
+from src.db import Database
+
+log = logging.getLogger(__name__)
+
+# Сколько секунд без ввода считается простоем
+IDLE_SECONDS = 60
+# Бюджет одного прохода в цикле событий, мс
+STEP_BUDGET_MS = 30
+# Страниц, освобождаемых одним вызовом incremental_vacuum
+VACUUM_PAGES_PER_STEP = 64
+# Строк ANALYZE на индекс (PRAGMA analysis_limit): быстрая приблизительная статистика
+ANALYSIS_LIMIT = 1000
+# Сколько последних записей журнала обслуживания хранить
+LOG_KEEP = 200
+
+# События ввода, прерывающие обслуживание
+_INPUT_EVENTS = frozenset({
+    QEvent.Type.KeyPress,
+    QEvent.Type.MouseButtonPress,
+    QEvent.Type.MouseMove,
+    QEvent.Type.Wheel,
+    QEvent.Type.TouchBegin,
+})
+
+JobGen = Generator[None, None, str]
+
+
+def _checkpoint(cx: sqlite3.Connection) -> JobGen:
+    """Переносит WAL в основной файл, не дожидаясь читателей (PASSIVE)."""
+    busy, frames, done = cx.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    yield
+    if frames < 0:
+        return "не WAL"
+    return f"страниц WAL: {done} из {frames}" + (" (база занята)" if busy else "")
+
+
+def _analyze(cx: sqlite3.Connection) -> JobGen:
+    """ANALYZE по одной таблице за порцию с ограничением analysis_limit."""
+    cx.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    tables = [
+        row[0] for row in cx.execute(
+            "SELECT name FROM main.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )
+    ]
+    for name in tables:
+        cx.execute(f'ANALYZE main."{name}"')
+        yield
+    return f"таблиц: {len(tables)}"
+
+
+def _optimize(cx: sqlite3.Connection) -> JobGen:
+    """PRAGMA optimize: пересобирает статистику там, где она устарела."""
+    cx.execute("PRAGMA optimize")
+    yield
+    return ""
+
+
+def _convert_auto_vacuum(path: str, result: list) -> None:  # type: ignore
+    """
+    Однократный перевод базы, созданной до включения auto_vacuum=INCREMENTAL
+    (в том числе поставляемой subscriptions.db), на инкрементальную очистку:
+    режим меняется только полным VACUUM. Выполняется в рабочем потоке через
+    собственное соединение — VACUUM нельзя разбить на порции, и в GUI-потоке
+    он заморозил бы окно. Итог (строка или исключение) кладётся в result.
+    Факт перевода пишется в app_meta, чтобы не повторять VACUUM,
+    если режим почему-либо не сменился.
+    """
+    cx = sqlite3.connect(path)
+    try:
+        cx.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cx.execute("VACUUM")
+        with cx:
+            cx.execute(
+                "INSERT OR REPLACE INTO app_meta (key, value) VALUES ('auto_vacuum_converted', ?)",
+                (dt.datetime.now().isoformat(timespec="seconds"),),
+            )
+        result.append("база переведена на auto_vacuum=INCREMENTAL (VACUUM)")
+    except sqlite3.Error as exc:
+        result.append(exc)
+    finally:
+        cx.close()
+
+
+def _vacuum(cx: sqlite3.Connection) -> JobGen:
+    """Возвращает свободные страницы файлу порциями по VACUUM_PAGES_PER_STEP."""
+    # executescript фиксирует открытую транзакцию соединения:
+    # чужую незавершённую запись пережидаем
+    while cx.in_transaction:
+        yield
+    if cx.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        row = cx.execute("SELECT 1 FROM app_meta WHERE key = 'auto_vacuum_converted'").fetchone()
+        if row is not None:
+            return "пропущено: auto_vacuum не удалось включить"
+        path = cx.execute("PRAGMA database_list").fetchone()[2]
+        if not path:
+            return "пропущено: база в памяти"
+        result: list = []  # type: ignore
+        worker = threading.Thread(
+            target=_convert_auto_vacuum, args=(path, result), name="auto-vacuum", daemon=True
+        )
+        worker.start()
+        # Порции планировщика только проверяют, закончил ли поток
+        while worker.is_alive():
+            yield
+        if isinstance(result[0], sqlite3.Error):
+            raise result[0]
+        return result[0]
+    freed = 0
+    while True:
+        if cx.in_transaction:
+            yield
+            continue
+        free = cx.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            break
+        # executescript, а не execute: pragma освобождает по странице на каждый
+        # шаг выполнения, а execute для запросов без колонок делает лишь один шаг
+        cx.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})")
+        freed += min(free, VACUUM_PAGES_PER_STEP)
+        yield
+    return f"освобождено страниц: {freed}"
+
+
+# Задача -> (функция, минимальный интервал между запусками)
+JOBS: dict[str, tuple[Callable[[sqlite3.Connection], JobGen], dt.timedelta]] = {
+    "wal_checkpoint": (_checkpoint, dt.timedelta(hours=1)),
+    "optimize": (_optimize, dt.timedelta(days=1)),
+    "analyze": (_analyze, dt.timedelta(days=7)),
+    "incremental_vacuum": (_vacuum, dt.timedelta(days=1)),
+}
+
+
+def last_runs(db: Database) -> dict[str, sqlite3.Row]:
+    """Последний запуск каждой задачи обслуживания."""
+    rows = db.connection().execute(
+        """
+        SELECT job, MAX(finished_at) AS finished_at, duration_ms, steps, status, detail
+        FROM maintenance_log
+        GROUP BY job
+        """
+    ).fetchall()
+    return {row["job"]: row for row in rows}
+
+
+def due_jobs(db: Database, now: dt.datetime | None = None) -> list[str]:
+    """Задачи, которые пора запустить (по порядку JOBS)."""
+    now = now or dt.datetime.now()
+    runs = last_runs(db)
+    due = []
+    for name, (_, interval) in JOBS.items():
+        run = runs.get(name)
+        if run is None or dt.datetime.fromisoformat(run["finished_at"]) + interval <= now:
+            due.append(name)
+    return due
+
+
+def record_run(db: Database, job: str, duration_ms: float, steps: int, status: str, detail: str) -> None:
+    """Пишет итог запуска в maintenance_log и обрезает журнал до LOG_KEEP записей."""
+    with db.connection() as cx:
+        cx.execute(
+            """
+            INSERT INTO maintenance_log (job, finished_at, duration_ms, steps, status, detail)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (job, dt.datetime.now().isoformat(timespec="seconds"), duration_ms, steps, status, detail),
+        )
+        cx.execute(
+            "DELETE FROM maintenance_log WHERE id <= (SELECT MAX(id) FROM maintenance_log) - ?",
+            (LOG_KEEP,),
+        )
+
+
+def status_text(db: Database) -> str:
+    """Краткая строка о последнем обслуживании для строки состояния."""
+    runs = last_runs(db)
+    if not runs:
+        return "Обслуживание БД: ещё не выполнялось"
+    last = max(runs.values(), key=lambda r: r["finished_at"])
+    when = dt.datetime.fromisoformat(last["finished_at"]).strftime("%d.%m %H:%M")
+    failed = [name for name, r in runs.items() if r["status"] == "error"]
+    suffix = f", ошибки: {', '.join(failed)}" if failed else ""
+    return f"Обслуживание БД: {when}{suffix}"
+
+
+def status_details(db: Database) -> str:
+    """Последний запуск каждой задачи: когда, сколько длился и с каким итогом."""
+    runs = last_runs(db)
+    lines = []
+    for name in JOBS:
+        run = runs.get(name)
+        if run is None:
+            lines.append(f"{name}: не выполнялось")
+            continue
+        when = dt.datetime.fromisoformat(run["finished_at"]).strftime("%d.%m.%Y %H:%M")
+        text = f"{name}: {when}, {run['duration_ms']:.0f} мс"
+        if run["status"] == "error":
+            text += ", ошибка"
+        if run["detail"]:
+            text += f" — {run['detail']}"
+        lines.append(text)
+    return "\n".join(lines)
+
+
+class MaintenanceScheduler(QObject):
+    """
+    Запускает задачи обслуживания в простое.
+
+    Фильтр событий только запоминает время последнего ввода. Он ставится
+    не на всё приложение (тогда через Python шло бы каждое событие Qt —
+    отрисовка, таймеры, раскладка), а на окна верхнего уровня (QWindow):
+    ввод приходит в окно раньше, чем в виджеты, а прочих событий у окна мало.
+    Новые окна (диалоги) подхватываются по сигналу focusWindowChanged.
+    Раз в check_ms планировщик смотрит, не простаивает ли приложение
+    idle_seconds и есть ли задачи, которым пора выполняться; если да —
+    выполняет их порциями через QTimer.singleShot(0), не дольше budget_ms
+    за проход, чтобы цикл событий оставался отзывчивым. Ввод пользователя
+    приостанавливает текущую задачу до следующего простоя.
+    """
+    status_changed = pyqtSignal(str)
+
+    def __init__(
+        self,
+        db: Database,
+        parent=None,  # type: ignore
+        idle_seconds: float = IDLE_SECONDS,
+        budget_ms: float = STEP_BUDGET_MS,
+        check_ms: int = 5000,
+    ):
+        super().__init__(parent)  # type: ignore
+        self.db = db
+        self.idle_seconds = idle_seconds
+        self.budget_ms = budget_ms
+        self._last_input = time.monotonic()
+        self._running = False
+        self._queue: list[str] = []
+        # Текущая задача (имя, генератор), её чистое время работы (с) и число порций
+        self._current: tuple[str, JobGen] | None = None
+        self._elapsed = 0.0
+        self._steps = 0
+
+        app = QGuiApplication.instance()
+        if isinstance(app, QGuiApplication):
+            app.focusWindowChanged.connect(self._watch_windows)  # type: ignore
+            self._watch_windows()
+        self.timer = QTimer(self)
+        self.timer.setInterval(check_ms)
+        self.timer.timeout.connect(self._check_idle)  # type: ignore
+        self.timer.start()
+
+    def _watch_windows(self, *_) -> None:  # type: ignore
+        """Ставит фильтр ввода на все окна верхнего уровня (повторная установка не дублирует его)."""
+        for window in QGuiApplication.topLevelWindows():
+            window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):  # type: ignore
+        if event.type() in _INPUT_EVENTS:
+            self.notify_activity()
+        return False
+
+    def notify_activity(self) -> None:
+        """Отмечает ввод пользователя; выполняемая задача встанет на паузу."""
+        self._last_input = time.monotonic()
+
+    def set_database(self, db: Database) -> None:
+        """Переключает обслуживание на другую базу (смена профиля)."""
+        self._running = False
+        self._queue.clear()
+        if self._current is not None:
+            self._current[1].close()
+            self._current = None
+        self.db = db
+        self.status_changed.emit(status_text(db))
+
+    def _check_idle(self) -> None:
+        if self._running or time.monotonic() - self._last_input < self.idle_seconds:
+            return
+        if self._current is None and not self._queue:
+            self._queue = due_jobs(self.db)
+            if not self._queue:
+                return
+        self._running = True
+        self.status_changed.emit("Обслуживание БД выполняется…")
+        QTimer.singleShot(0, self._run_step)
+
+    def _run_step(self) -> None:
+        """Один проход: порции задач (хотя бы одна), пока не исчерпан бюджет или не было ввода."""
+        if not self._running:
+            return
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        while True:
+            if time.monotonic() - self._last_input < self.idle_seconds:
+                self._running = False
+                self.status_changed.emit("Обслуживание БД приостановлено")
+                return
+            if self._current is None:
+                if not self._queue:
+                    self._running = False
+                    self.status_changed.emit(status_text(self.db))
+                    return
+                name = self._queue.pop(0)
+                self._current = (name, JOBS[name][0](self.db.connection()))
+                self._elapsed, self._steps = 0.0, 0
+            name, gen = self._current
+            start = time.perf_counter()
+            try:
+                next(gen)
+            except StopIteration as stop:
+                self._finish(name, "ok", stop.value or "", start)
+            except sqlite3.Error as exc:
+                log.warning("обслуживание %s: %s", name, exc)
+                self._finish(name, "error", str(exc), start)
+            else:
+                self._elapsed += time.perf_counter() - start
+                self._steps += 1
+            if time.perf_counter() >= deadline:
+                break
+        QTimer.singleShot(0, self._run_step)
+
+    def _finish(self, name: str, status: str, detail: str, start: float) -> None:
+        self._elapsed += time.perf_counter() - start
+        self._current = None
+        record_run(self.db, name, round(self._elapsed * 1000, 1), self._steps, status, detail)
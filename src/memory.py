@@ -0,0 +1,236 @@
+"""
+Замер памяти по подсистемам (режим профилирования памяти).
+
+    SUBTRACKER_MEMORY_PROFILE=1 python -m src.main
+    SUBTRACKER_MEMORY_BUDGETS="db=32,table_items=16" python -m src.main
+
+В этом режиме с запуска окна включается tracemalloc, а после каждого
+refresh_tables и открытия любого диалога в лог пишется разбивка памяти:
+
+* db, ui, other — Python-объекты (sqlite3.Row, снимок, обёртки элементов
+  таблиц), сгруппированные по модулю, из которого они выделены;
+* table_items — ячейки QTableWidgetItem: их C++-часть tracemalloc не видит,
+  поэтому это оценка по числу ячеек (ITEM_BYTES на ячейку);
+* sqlite — куча SQLite (sqlite3_memory_used: кэш страниц всех соединений,
+  подготовленные запросы), рядом — предел кэша из PRAGMA cache_size.
+
+Если подсистема превышает бюджет (МБ), пишется предупреждение.
+Бюджеты по умолчанию — DEFAULT_BUDGETS_MB, переопределяются переменной
+SUBTRACKER_MEMORY_BUDGETS.
+"""
+from __future__ import annotations
+
+import ctypes
+import functools
+import logging
+import os
+import pathlib
+import sys
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from PyQt6.QtCore import QObject
+from PyQt6.QtWidgets import QApplication, QDialog, QTableWidget
+
+from src.db import Database
+
+log = logging.getLogger(__name__)
+
+ENV_PROFILE = "SUBTRACKER_MEMORY_PROFILE"
+ENV_BUDGETS = "SUBTRACKER_MEMORY_BUDGETS"
+# Подсистема -> бюджет, МБ
+DEFAULT_BUDGETS_MB = {
+    "db": 64.0,
+    "ui": 32.0,
+    "table_items": 64.0,
+    "sqlite": 64.0,
+    "other": 128.0,
+}
+# Оценка C++-памяти одной ячейки QTableWidgetItem (текст, данные ролей), байт
+ITEM_BYTES = 200
+# Глубина стека в трассировке: модуль определяется по ближайшему кадру
+TRACE_FRAMES = 1
+# Сколько последних замеров хранить в профилировщике
+REPORTS_KEEP = 100
+
+_SRC_DIR = pathlib.Path(__file__).resolve().parent
+_MB = 1024 * 1024
+
+
+def profiling_enabled() -> bool:
+    """Включён ли режим профилирования памяти (переменная окружения)."""
+    return os.environ.get(ENV_PROFILE, "") not in ("", "0")
+
+
+def parse_budgets(text: str) -> dict[str, float]:
+    """«db=32,sqlite=16» -> бюджеты по умолчанию с переопределёнными значениями (МБ)."""
+    budgets = dict(DEFAULT_BUDGETS_MB)
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in budgets:
+            raise ValueError(f"неизвестная подсистема памяти: {name}")
+        budgets[name] = float(value)
+    return budgets
+
+
+@functools.cache
+def _sqlite_lib():  # type: ignore
+    """
+    Библиотека SQLite, с которой связан модуль sqlite3 (None — недоступна).
+    Ищется при первом замере, а не при импорте: без профилирования старт её не ждёт.
+    """
+    import _sqlite3
+
+    names = ["sqlite3"] if sys.platform == "win32" else [_sqlite3.__file__]
+    for name in names:
+        try:
+            lib = ctypes.CDLL(name)
+            lib.sqlite3_memory_used.restype = ctypes.c_int64
+            lib.sqlite3_memory_highwater.restype = ctypes.c_int64
+            lib.sqlite3_memory_highwater.argtypes = [ctypes.c_int]
+            return lib
+        except (OSError, AttributeError):
+            continue
+    return None
+
+
+def sqlite_memory() -> tuple[int, int] | None:
+    """(текущая, пиковая) память кучи SQLite в байтах; None — счётчики недоступны."""
+    lib = _sqlite_lib()
+    if lib is None:
+        return None
+    return lib.sqlite3_memory_used(), lib.sqlite3_memory_highwater(0)
+
+
+def cache_limit(db: Database) -> int:
+    """Предел кэша страниц соединения в байтах по PRAGMA cache_size."""
+    cx = db.connection()
+    size = cx.execute("PRAGMA cache_size").fetchone()[0]
+    # Отрицательное значение — предел в КиБ, положительное — в страницах
+    if size < 0:
+        return -size * 1024
+    return size * cx.execute("PRAGMA page_size").fetchone()[0]
+
+
+@functools.lru_cache(maxsize=None)
+def _subsystem(filename: str) -> str:
+    """Подсистема по файлу, из которого выделена память."""
+    try:
+        rel = pathlib.Path(filename).resolve().relative_to(_SRC_DIR)
+    except ValueError:
+        return "other"
+    if rel.parts[0] == "ui":
+        return "ui"
+    if rel.name == "db.py":
+        return "db"
+    return "other"
+
+
+@dataclass
+class MemoryReport:
+    """Разбивка памяти по подсистемам на момент замера, байты."""
+    label: str
+    usage: dict[str, int] = field(default_factory=dict)
+    python_peak: int = 0            # пик трассируемой памяти Python с прошлого замера
+    sqlite_peak: int | None = None
+    cache_limit: int = 0
+    items: int = 0                  # ячеек в таблицах
+
+    def over_budget(self, budgets: dict[str, float]) -> list[tuple[str, int, float]]:
+        """Подсистемы сверх бюджета: (имя, байт, бюджет в МБ)."""
+        return [
+            (name, used, budgets[name])
+            for name, used in self.usage.items()
+            if name in budgets and used > budgets[name] * _MB
+        ]
+
+    def format(self) -> str:
+        parts = [f"{name} {used / _MB:.1f}" for name, used in self.usage.items()]
+        text = f"память [{self.label}], МБ: " + ", ".join(parts)
+        text += f"; пик Python {self.python_peak / _MB:.1f}, ячеек {self.items}"
+        if self.sqlite_peak is not None:
+            text += f", пик SQLite {self.sqlite_peak / _MB:.1f}"
+        return text + f", предел кэша SQLite {self.cache_limit / _MB:.1f}"
+
+
+def measure(label: str, db: Database | None = None, tables: Iterable[QTableWidget] = ()) -> MemoryReport:
+    """
+    Замер памяти по подсистемам. Python-часть есть, только пока идёт tracemalloc;
+    после замера пик трассируемой памяти сбрасывается.
+    """
+    report = MemoryReport(label, {"db": 0, "ui": 0, "other": 0})
+    if tracemalloc.is_tracing():
+        snap = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        for stat in snap.statistics("filename"):
+            name = _subsystem(stat.traceback[0].filename)
+            report.usage[name] += stat.size
+        report.python_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+    report.items = sum(t.rowCount() * t.columnCount() for t in tables)
+    report.usage["table_items"] = report.items * ITEM_BYTES
+    if (sqlite := sqlite_memory()) is not None:
+        report.usage["sqlite"], report.sqlite_peak = sqlite
+    if db is not None:
+        report.cache_limit = cache_limit(db)
+    return report
+
+
+class MemoryProfiler(QObject):
+    """
+    Замеры памяти в режиме профилирования: после refresh_tables (вызов sample)
+    и при активации окна любого диалога (сигнал focusWindowChanged, без фильтра
+    событий: через него в Python шло бы каждое событие приложения).
+    Итог пишется в лог, превышение бюджета — предупреждением.
+    """
+    def __init__(
+        self,
+        db: Database,
+        tables: Iterable[QTableWidget] = (),
+        budgets: dict[str, float] | None = None,
+        parent=None,  # type: ignore
+    ):
+        super().__init__(parent)  # type: ignore
+        self.db = db
+        self.tables = list(tables)
+        if budgets is None:
+            try:
+                budgets = parse_budgets(os.environ.get(ENV_BUDGETS, ""))
+            except ValueError as exc:
+                log.warning("%s: %s, действуют бюджеты по умолчанию", ENV_BUDGETS, exc)
+                budgets = dict(DEFAULT_BUDGETS_MB)
+        self.budgets = budgets
+        self.reports: deque[MemoryReport] = deque(maxlen=REPORTS_KEEP)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        app = QApplication.instance()
+        if isinstance(app, QApplication):
+            app.focusWindowChanged.connect(self._window_activated)  # type: ignore
+
+    def _window_activated(self, window) -> None:  # type: ignore
+        if window is None:
+            return
+        for widget in QApplication.topLevelWidgets():
+            if isinstance(widget, QDialog) and widget.windowHandle() == window:
+                self.sample(f"диалог {widget.objectName() or type(widget).__name__}")
+                return
+
+    def set_database(self, db: Database) -> None:
+        """Переключает замеры на другую базу (смена профиля)."""
+        self.db = db
+
+    def sample(self, label: str) -> MemoryReport:
+        """Замер с записью в лог и проверкой бюджетов."""
+        report = measure(label, self.db, self.tables)
+        self.reports.append(report)
+        log.info(report.format())
+        for name, used, budget in report.over_budget(self.budgets):
+            log.warning(
+                "память [%s]: %s %.1f МБ при бюджете %.1f МБ",
+                label, name, used / _MB, budget,
+            )
+        return report
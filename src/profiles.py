@@ -0,0 +1,126 @@
+"""Реестр профилей: несколько файлов базы (по одному на команду) и сводка по всем."""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import reduce
+from operator import add
+
+from src.db import Database, StatsSummary, SubscriptionSnapshot
+
+# Файл реестра: {"Название профиля": "путь/к/базе.db", ...}
+PROFILES_FILE = "profiles.json"
+DEFAULT_PROFILE = "Основной"
+DEFAULT_DB = "subscriptions.db"
+# Потоков не больше, чем профилей, и не больше этого предела
+MAX_WORKERS = 16
+
+
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    path: pathlib.Path
+
+
+def _profile_part(profile: Profile, db: Database) -> tuple[SubscriptionSnapshot, StatsSummary]:
+    """Снимок и сводка одного профиля через отдельное соединение только для чтения."""
+    reader = db.open_reader()
+    try:
+        return reader.snapshot(), reader.stats_summary()
+    finally:
+        reader.close()
+
+
+class ProfileRegistry:
+    """
+    Набор профилей с открытыми базами.
+    Открытие баз и сбор сводок по всем профилям выполняются параллельно
+    в пуле потоков (sqlite3 отпускает GIL на время запроса), поэтому время
+    определяется самым медленным файлом, а не их суммой.
+    Снимок и сводка профиля кэшируются и перечитываются, только когда
+    меняется версия данных его базы (total_changes и PRAGMA data_version).
+    """
+    def __init__(self, profiles: list[Profile]) -> None:
+        if not profiles:
+            raise ValueError("нужен хотя бы один профиль")
+        self.profiles = profiles
+        self._dbs: dict[str, Database] = {}
+        # Профиль -> ((версия данных, дата), (снимок, сводка))
+        self._parts_cache: dict[
+            str, tuple[tuple[tuple[int, int], dt.date], tuple[SubscriptionSnapshot, StatsSummary]]
+        ] = {}
+
+    @classmethod
+    def load(cls, path: str | pathlib.Path = PROFILES_FILE) -> ProfileRegistry:
+        """Читает реестр из JSON; если файла нет — единственный профиль subscriptions.db."""
+        path = pathlib.Path(path)
+        if not path.exists():
+            return cls([Profile(DEFAULT_PROFILE, pathlib.Path(DEFAULT_DB))])
+        data = json.loads(path.read_text(encoding="utf-8"))
+        base = path.parent
+        return cls([Profile(name, base / db_path) for name, db_path in data.items()])
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def names(self) -> list[str]:
+        return [p.name for p in self.profiles]
+
+    def _pool(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=min(len(self.profiles), MAX_WORKERS))
+
+    def open_all(self) -> dict[str, Database]:
+        """Открывает все базы параллельно (соединения затем используются из GUI-потока)."""
+        def open_one(profile: Profile) -> Database:
+            db = Database(profile.path)
+            db.connect(check_same_thread=False)
+            return db
+
+        pending = [p for p in self.profiles if p.name not in self._dbs]
+        with self._pool() as pool:
+            for profile, db in zip(pending, pool.map(open_one, pending)):
+                self._dbs[profile.name] = db
+        return self._dbs
+
+    def database(self, name: str) -> Database:
+        """База профиля name (открывает все, если ещё не открыты)."""
+        if name not in self._dbs:
+            self.open_all()
+        return self._dbs[name]
+
+    def _parts(self) -> list[tuple[SubscriptionSnapshot, StatsSummary]]:
+        """Части всех профилей: перечитываются параллельно только изменившиеся базы."""
+        dbs = self.open_all()
+        # Сводка зависит от даты (траты за год и месяц), поэтому она тоже в ключе
+        today = dt.date.today()
+        keys = {p.name: (dbs[p.name].data_version(), today) for p in self.profiles}
+        stale = [
+            p for p in self.profiles
+            if self._parts_cache.get(p.name, (None,))[0] != keys[p.name]
+        ]
+        if stale:
+            with self._pool() as pool:
+                parts = list(pool.map(lambda p: _profile_part(p, dbs[p.name]), stale))
+            for profile, part in zip(stale, parts):
+                self._parts_cache[profile.name] = (keys[profile.name], part)
+        return [self._parts_cache[p.name][1] for p in self.profiles]
+
+    def aggregate_stats(self) -> StatsSummary:
+        """Сводка по всем профилям: частичные сводки считаются параллельно и складываются."""
+        return reduce(add, (summary for _, summary in self._parts()), StatsSummary())
+
+    def combined_snapshot(self) -> SubscriptionSnapshot:
+        """Общий снимок подписок всех профилей (названия помечены именем профиля)."""
+        parts = self._parts()
+        return SubscriptionSnapshot.concat(
+            (p.name, snap) for p, (snap, _) in zip(self.profiles, parts)
+        )
+
+    def close(self) -> None:
+        for db in self._dbs.values():
+            db.close()
+        self._dbs.clear()
+        self._parts_cache.clear()
@@ -0,0 +1,199 @@
+"""
+Тяжёлые отчёты по истории оплат в пуле процессов.
+
+Таблица payment делится на части по диапазонам id подписки; каждая часть
+считается в отдельном процессе через своё соединение только для чтения,
+частичные результаты не пересекаются (подписка целиком в одной части)
+и сливаются простым объединением. Модуль не зависит от Qt, чтобы дочерние
+процессы (spawn) запускались быстро.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import multiprocessing
+import os
+import pathlib
+import sqlite3
+import statistics
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+from src.db import PAYMENT_COLUMNS, Database, costs_as_of
+
+# Ожидаемый интервал между оплатами, дней
+PERIOD_DAYS = {"daily": 1.0, "weekly": 7.0, "monthly": 30.44, "yearly": 365.25}
+# Частей на один процесс: мелкие части выравнивают нагрузку между процессами
+CHUNKS_PER_WORKER = 4
+
+
+class ReportCancelled(Exception):
+    """Отчёт отменён пользователем."""
+
+
+@dataclass
+class SubscriptionReport:
+    """Показатели одной подписки по всей истории оплат."""
+    name: str
+    period: str
+    spend_by_year: dict[int, float] = field(default_factory=dict)
+    # (дата, прежняя сумма, новая сумма) для каждого повышения цены
+    price_increases: list[tuple[str, float, float]] = field(default_factory=list)
+    payments: int = 0
+    missed: int = 0                  # оценка пропущенных оплат по длине интервалов
+    missed_cost: float = 0.0         # их сумма по ценам, действовавшим на те даты
+    mean_gap: float | None = None    # средний интервал между оплатами, дней
+    gap_stdev: float | None = None   # разброс интервала (регулярность), дней
+
+
+@dataclass
+class Report:
+    subscriptions: dict[int, SubscriptionReport] = field(default_factory=dict)
+
+    def spend_by_year(self) -> dict[int, float]:
+        """Траты по годам по всем подпискам."""
+        total: dict[int, float] = {}
+        for rep in self.subscriptions.values():
+            for year, amount in rep.spend_by_year.items():
+                total[year] = total.get(year, 0.0) + amount
+        return dict(sorted(total.items()))
+
+
+def _finish(rep: SubscriptionReport, dates: list[dt.date]) -> list[dt.date]:
+    """
+    Считает регулярность и пропуски по отсортированным датам оплат.
+    Возвращает ожидаемые даты пропущенных оплат (внутри длинных интервалов).
+    """
+    gaps = [(b - a).days for a, b in zip(dates, dates[1:])]
+    if not gaps:
+        return []
+    expected = PERIOD_DAYS.get(rep.period, 30.44)
+    rep.mean_gap = statistics.fmean(gaps)
+    rep.gap_stdev = statistics.pstdev(gaps)
+    missed = []
+    for start, gap in zip(dates, gaps):
+        for j in range(1, max(round(gap / expected) - 1, 0) + 1):
+            missed.append(start + dt.timedelta(days=round(j * expected)))
+    rep.missed = len(missed)
+    return missed
+
+
+def report_chunk(
+    db_path: str,
+    archive_path: str | None,
+    lo: int,
+    hi: int,
+) -> dict[int, SubscriptionReport]:
+    """Частичный отчёт по подпискам с id в [lo, hi] (выполняется в дочернем процессе)."""
+    cx = sqlite3.connect(f"{pathlib.Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        source = "payment"
+        if archive_path:
+            cx.execute(
+                "ATTACH DATABASE ? AS cold",
+                (f"{pathlib.Path(archive_path).resolve().as_uri()}?mode=ro",),
+            )
+            # Как payment_all (Database._attach_archive): строка, уже скопированная
+            # в архив, но ещё не удалённая из основного файла, учитывается один раз
+            source = f"""(
+                SELECT {PAYMENT_COLUMNS} FROM main.payment
+                UNION ALL
+                SELECT {PAYMENT_COLUMNS} FROM cold.payment AS c
+                WHERE NOT EXISTS (SELECT 1 FROM main.payment AS m WHERE m.id = c.id)
+            )"""
+        rows = cx.execute(
+            f"""
+            SELECT p.subscription_id, s.name, s.period, p.date_paid, p.amount
+            FROM {source} AS p
+            JOIN subscription AS s ON s.id = p.subscription_id
+            WHERE p.subscription_id BETWEEN ? AND ?
+            ORDER BY p.subscription_id, p.date_paid, p.id
+            """,
+            (lo, hi),
+        )
+        out: dict[int, SubscriptionReport] = {}
+        rep: SubscriptionReport | None = None
+        dates: list[dt.date] = []
+        missed: list[tuple[int, dt.date]] = []
+        current, prev_amount = None, None
+        for sid, name, period, date_paid, amount in rows:
+            if sid != current:
+                if rep is not None:
+                    missed.extend((current, day) for day in _finish(rep, dates))
+                rep = out[sid] = SubscriptionReport(name, period)
+                dates, current, prev_amount = [], sid, None
+            try:
+                day = dt.date.fromisoformat(date_paid)
+            except ValueError:
+                continue
+            rep.payments += 1  # type: ignore
+            rep.spend_by_year[day.year] = rep.spend_by_year.get(day.year, 0.0) + amount  # type: ignore
+            if prev_amount is not None and amount > prev_amount:
+                rep.price_increases.append((date_paid, prev_amount, amount))  # type: ignore
+            prev_amount = amount
+            dates.append(day)
+        if rep is not None:
+            missed.extend((current, day) for day in _finish(rep, dates))
+        # Цены пропущенных оплат — одним пакетным запросом к истории цен
+        for (sid, _), cost in zip(missed, costs_as_of(cx, missed)):
+            out[sid].missed_cost += cost or 0.0
+        return out
+    finally:
+        cx.close()
+
+
+def id_ranges(db: Database, parts: int) -> list[tuple[int, int]]:
+    """Делит подписки на parts диапазонов id примерно равного размера."""
+    rows = db.connection().execute(
+        """
+        SELECT MIN(id), MAX(id) FROM (
+            SELECT id, NTILE(?) OVER (ORDER BY id) AS part FROM subscription
+        )
+        GROUP BY part ORDER BY part
+        """,
+        (parts,),
+    ).fetchall()
+    return [(lo, hi) for lo, hi in rows]
+
+
+def run_report(
+    db: Database,
+    workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    cancel: threading.Event | None = None,
+) -> Report:
+    """
+    Строит отчёт в пуле процессов. progress(готово, всего) вызывается после
+    каждой части; если выставлен cancel, оставшиеся части отменяются
+    и выбрасывается ReportCancelled.
+    """
+    if str(db.db_path) == ":memory:":
+        raise ValueError("отчёты строятся только по файлу базы")
+    workers = workers or os.cpu_count() or 1
+    ranges = id_ranges(db, workers * CHUNKS_PER_WORKER)
+    archive = None
+    if db.get_meta("archive_cutoff") and db.archive_path().exists():
+        archive = str(db.archive_path())
+
+    report = Report()
+    total = len(ranges)
+    if progress:
+        progress(0, total)
+    ctx = multiprocessing.get_context("spawn")  # fork небезопасен в процессе с Qt и потоками
+    with ProcessPoolExecutor(max_workers=min(workers, max(total, 1)), mp_context=ctx) as pool:
+        pending = {pool.submit(report_chunk, str(db.db_path), archive, lo, hi) for lo, hi in ranges}
+        done = 0
+        while pending:
+            finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                for fut in pending:
+                    fut.cancel()
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise ReportCancelled()
+            for fut in finished:
+                report.subscriptions.update(fut.result())
+                done += 1
+            if finished and progress:
+                progress(done, total)
+    return report
@@ -0,0 +1,41 @@
+"""Вспомогательные функции для временных рядов трат (прореживание для графиков)."""
+from __future__ import annotations
+
+from typing import Sequence
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> list[int]:
+    """
+    Прореживание ряда алгоритмом Largest-Triangle-Three-Buckets.
+
+    Возвращает индексы не более чем threshold точек, сохраняющих форму ряда:
+    первая и последняя точки остаются, из каждой корзины берётся точка,
+    образующая наибольший треугольник с уже выбранной точкой
+    и средним значением следующей корзины.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    out = [0]
+    for i in range(threshold - 2):
+        # Среднее следующей корзины — третья вершина треугольника
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+
+        # Текущая корзина — ищем точку с максимальной площадью
+        ax, ay = xs[a], ys[a]
+        best, best_area = int(i * every) + 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    out.append(n - 1)
+    return out
@@ -6,7 +6,9 @@ CREATE TABLE IF NOT EXISTS subscription (
     period      TEXT    NOT NULL CHECK (period IN ('daily','weekly','monthly','yearly')),
     next_due    DATE    NOT NULL,
     notes       TEXT,
-    is_active   INTEGER NOT NULL DEFAULT 1          -- 1 = активна, 0 = архив
+    is_active   INTEGER NOT NULL DEFAULT 1,         -- 1 = активна, 0 = архив
+    notes_preview TEXT,                             -- начало notes для таблиц (триггер ниже)
+    uuid        TEXT    DEFAULT (lower(hex(randomblob(16))))  -- ключ строки для синхронизации копий
 );
 
 -- Фактические оплаты
@@ -16,15 +18,213 @@ CREATE TABLE IF NOT EXISTS payment (
         REFERENCES subscription(id) ON DELETE CASCADE,
     date_paid       DATE    NOT NULL,
     amount          REAL    NOT NULL,
-    comment         TEXT
+    comment         TEXT,
+    uuid            TEXT    DEFAULT (lower(hex(randomblob(16))))
 );
 
+-- Глобальный ключ строки (src/sync.py): AUTOINCREMENT-id в независимых копиях
+-- совпадают у разных подписок и оплат, поэтому синхронизация сопоставляет строки по uuid.
+-- В базах прежних версий колонка добавлена ALTER TABLE без значения по умолчанию:
+-- uuid новых строк там заполняют триггеры (они же дописывают его в change_log,
+-- куда триггер журнала успел записать NULL), а старые строки получили ключ 'id-<id>'
+-- (одинаковый в копиях, снятых с одного файла до обновления)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_subscription_uuid ON subscription(uuid);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_payment_uuid ON payment(uuid);
+
+CREATE TRIGGER IF NOT EXISTS trg_subscription_uuid
+AFTER INSERT ON subscription
+WHEN NEW.uuid IS NULL
+BEGIN
+  UPDATE subscription SET uuid = lower(hex(randomblob(16))) WHERE id = NEW.id;
+  UPDATE change_log SET row_uuid = (SELECT uuid FROM subscription WHERE id = NEW.id)
+  WHERE tbl = 'subscription' AND row_id = NEW.id AND row_uuid IS NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_payment_uuid
+AFTER INSERT ON payment
+WHEN NEW.uuid IS NULL
+BEGIN
+  UPDATE payment SET uuid = lower(hex(randomblob(16))) WHERE id = NEW.id;
+  UPDATE change_log SET row_uuid = (SELECT uuid FROM payment WHERE id = NEW.id)
+  WHERE tbl = 'payment' AND row_id = NEW.id AND row_uuid IS NULL;
+END;
+
 -- Индекс ускоряет выборки «что оплатить ближайшее»
 CREATE INDEX IF NOT EXISTS ix_subscription_next_due ON subscription(next_due);
 
+-- Покрывающий индекс для снимка таблиц и напоминаний: все отображаемые колонки
+-- читаются из индекса, длинный текст notes со страниц таблицы не загружается
+CREATE INDEX IF NOT EXISTS ix_subscription_list
+    ON subscription(is_active DESC, next_due, name, cost, period, notes_preview);
+
+-- Ключ постраничной выборки истории оплат (keyset pagination без OFFSET)
+CREATE INDEX IF NOT EXISTS ix_payment_sub_date ON payment(subscription_id, date_paid, id);
+
+-- Выборки оплат по дате (статистика за период, перенос старых оплат в архив)
+CREATE INDEX IF NOT EXISTS ix_payment_date ON payment(date_paid);
+
+-- Категории (теги) подписок: связь многие-ко-многим
+CREATE TABLE IF NOT EXISTS tag (
+    id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    name  TEXT    NOT NULL,
+    key   TEXT    NOT NULL UNIQUE                 -- name.casefold(): NOCASE не знает кириллицу
+);
+
+CREATE TABLE IF NOT EXISTS subscription_tag (
+    subscription_id INTEGER NOT NULL
+        REFERENCES subscription(id) ON DELETE CASCADE,
+    tag_id          INTEGER NOT NULL
+        REFERENCES tag(id) ON DELETE CASCADE,
+    PRIMARY KEY (subscription_id, tag_id)             -- теги подписки, траты по категориям
+) WITHOUT ROWID;
+
+-- Подписки категории (фильтр главного окна)
+CREATE INDEX IF NOT EXISTS ix_subscription_tag_tag ON subscription_tag(tag_id, subscription_id);
+
+-- Индекс похожих названий (src/duplicates.py): нормализованное название,
+-- его триграммы и очередь подписок, чьи записи нужно пересчитать
+CREATE TABLE IF NOT EXISTS name_index (
+    subscription_id INTEGER PRIMARY KEY
+        REFERENCES subscription(id) ON DELETE CASCADE,
+    norm            TEXT    NOT NULL,
+    grams           INTEGER NOT NULL                -- число триграмм (фильтр по длине)
+);
+
+CREATE TABLE IF NOT EXISTS name_trigram (
+    trigram         INTEGER NOT NULL,               -- три символа по 21 бит
+    subscription_id INTEGER NOT NULL
+        REFERENCES subscription(id) ON DELETE CASCADE,
+    PRIMARY KEY (trigram, subscription_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS ix_name_trigram_sub ON name_trigram(subscription_id);
+
+CREATE TABLE IF NOT EXISTS name_index_dirty (
+    subscription_id INTEGER PRIMARY KEY
+);
+
+-- Без OR IGNORE: в теле триггера его перекрывает конфликт-клауза внешней
+-- команды, и UPSERT при синхронизации падал бы на уже стоящем в очереди id
+
+CREATE TRIGGER IF NOT EXISTS trg_name_index_ins
+AFTER INSERT ON subscription
+BEGIN
+  INSERT INTO name_index_dirty (subscription_id)
+  SELECT NEW.id WHERE NOT EXISTS (SELECT 1 FROM name_index_dirty WHERE subscription_id = NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_name_index_upd
+AFTER UPDATE OF name ON subscription
+BEGIN
+  INSERT INTO name_index_dirty (subscription_id)
+  SELECT NEW.id WHERE NOT EXISTS (SELECT 1 FROM name_index_dirty WHERE subscription_id = NEW.id);
+END;
+
+-- История цен: версия стоимости действует в [valid_from, valid_to),
+-- valid_to NULL — действует по сей день. Первая версия открыта с '0001-01-01'.
+CREATE TABLE IF NOT EXISTS price_history (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    subscription_id INTEGER NOT NULL
+        REFERENCES subscription(id) ON DELETE CASCADE,
+    valid_from      DATE    NOT NULL,
+    valid_to        DATE,
+    cost            REAL    NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_price_history_sub ON price_history(subscription_id, valid_from);
+
+-- Индекс интервалов R*Tree для запросов «цена на дату»: прямоугольник
+-- (id подписки) × (дни действия версии, включительно, как date.toordinal()).
+-- Поддерживается триггерами price_history, стоимость хранится рядом (+cost).
+CREATE VIRTUAL TABLE IF NOT EXISTS price_range USING rtree_i32(
+    id, sub_lo, sub_hi, day_lo, day_hi, +cost
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_price_range_ins
+AFTER INSERT ON price_history
+BEGIN
+  INSERT INTO price_range (id, sub_lo, sub_hi, day_lo, day_hi, cost)
+  VALUES (
+    NEW.id, NEW.subscription_id, NEW.subscription_id,
+    CAST(julianday(NEW.valid_from) - 1721424.5 AS INTEGER),
+    COALESCE(CAST(julianday(NEW.valid_to) - 1721424.5 AS INTEGER) - 1, 2147483647),
+    NEW.cost
+  );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_price_range_upd
+AFTER UPDATE ON price_history
+BEGIN
+  UPDATE price_range
+  SET day_lo = CAST(julianday(NEW.valid_from) - 1721424.5 AS INTEGER),
+      day_hi = COALESCE(CAST(julianday(NEW.valid_to) - 1721424.5 AS INTEGER) - 1, 2147483647),
+      cost = NEW.cost
+  WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_price_range_del
+AFTER DELETE ON price_history
+BEGIN
+  DELETE FROM price_range WHERE id = OLD.id;
+END;
+
+-- Первая версия цены новой подписки
+CREATE TRIGGER IF NOT EXISTS trg_price_history_ins
+AFTER INSERT ON subscription
+BEGIN
+  INSERT INTO price_history (subscription_id, valid_from, cost)
+  VALUES (NEW.id, '0001-01-01', NEW.cost);
+END;
+
+-- Цена изменена напрямую (например, дельтой синхронизации): новая версия с сегодняшнего
+-- (локального) дня. Database.set_cost сначала пишет открытую версию с новой ценой сам,
+-- и тогда условие WHEN ложно — без сравнения дат, поэтому около полуночи триггер
+-- не перезапишет версию, датированную приложением.
+DROP TRIGGER IF EXISTS trg_price_history_upd;
+CREATE TRIGGER trg_price_history_upd
+AFTER UPDATE OF cost ON subscription
+WHEN OLD.cost IS NOT NEW.cost AND NOT EXISTS (
+    SELECT 1 FROM price_history
+    WHERE subscription_id = NEW.id AND valid_to IS NULL AND cost = NEW.cost
+)
+BEGIN
+  DELETE FROM price_history
+  WHERE subscription_id = NEW.id AND valid_from >= DATE('now', 'localtime');
+  UPDATE price_history SET valid_to = DATE('now', 'localtime')
+  WHERE subscription_id = NEW.id
+    AND (valid_to IS NULL OR valid_to > DATE('now', 'localtime'));
+  INSERT INTO price_history (subscription_id, valid_from, cost)
+  VALUES (NEW.id, DATE('now', 'localtime'), NEW.cost);
+END;
+
+-- Служебные настройки приложения (путь к архивному файлу, граница архива и т.п.)
+CREATE TABLE IF NOT EXISTS app_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Журнал обслуживания базы в простое (src/maintenance.py)
+CREATE TABLE IF NOT EXISTS maintenance_log (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    job         TEXT    NOT NULL,
+    finished_at TEXT    NOT NULL,
+    duration_ms REAL    NOT NULL,                   -- чистое время работы без пауз
+    steps       INTEGER NOT NULL,
+    status      TEXT    NOT NULL CHECK (status IN ('ok','error')),
+    detail      TEXT
+);
+
+-- Пока в app_meta есть ключ 'sync_apply' (применение дельты синхронизации,
+-- перенос оплат в архивный файл), триггеры ниже не срабатывают:
+-- next_due и журнал изменений приходят вместе с самой дельтой.
+-- Сводку оплат (payment_summary) глушит только ключ 'archive_move':
+-- оплаты из дельты в неё попадают, а перенос в архив её не меняет.
+
 -- После вставки оплаты переносим дату next_due вперёд
-CREATE TRIGGER IF NOT EXISTS trg_after_payment
+DROP TRIGGER IF EXISTS trg_after_payment;
+CREATE TRIGGER trg_after_payment
 AFTER INSERT ON payment
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_apply')
 BEGIN
   UPDATE subscription
   SET next_due = CASE (SELECT period FROM subscription WHERE id = NEW.subscription_id)
@@ -35,3 +235,165 @@ BEGIN
   END
   WHERE id = NEW.subscription_id;
 END;
+
+-- Сводка оплат подписки для колонок главной таблицы: дата последней оплаты,
+-- сумма и число оплат за всё время (включая перенесённые в архивный файл).
+-- Строку заводит триггер вставки подписки, пересчитывают триггеры оплат;
+-- базы старых версий заполняются Database.rebuild_payment_summary.
+CREATE TABLE IF NOT EXISTS payment_summary (
+    subscription_id INTEGER PRIMARY KEY
+        REFERENCES subscription(id) ON DELETE CASCADE,
+    last_paid       DATE,
+    paid_total      REAL    NOT NULL DEFAULT 0,
+    paid_count      INTEGER NOT NULL DEFAULT 0,
+    archived_last   DATE                            -- последняя оплата в архивном файле
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_payment_summary_sub
+AFTER INSERT ON subscription
+BEGIN
+  INSERT INTO payment_summary (subscription_id)
+  SELECT NEW.id WHERE NOT EXISTS (SELECT 1 FROM payment_summary WHERE subscription_id = NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_payment_summary_ins
+AFTER INSERT ON payment
+BEGIN
+  UPDATE payment_summary
+  SET paid_count = paid_count + 1,
+      paid_total = paid_total + NEW.amount,
+      last_paid  = CASE WHEN last_paid IS NULL OR NEW.date_paid > last_paid
+                        THEN NEW.date_paid ELSE last_paid END
+  WHERE subscription_id = NEW.subscription_id;
+END;
+
+-- Последняя дата пересчитывается по ix_payment_sub_date, только если удалили
+-- самую позднюю оплату; архивный файл триггеру недоступен, поэтому его
+-- последнюю дату хранит archived_last (заполняется при переносе в архив)
+CREATE TRIGGER IF NOT EXISTS trg_payment_summary_del
+AFTER DELETE ON payment
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'archive_move')
+BEGIN
+  UPDATE payment_summary
+  SET paid_count = paid_count - 1,
+      paid_total = paid_total - OLD.amount,
+      last_paid  = CASE WHEN OLD.date_paid < last_paid THEN last_paid
+                        ELSE NULLIF(MAX(COALESCE((SELECT MAX(date_paid) FROM payment
+                                                  WHERE subscription_id = OLD.subscription_id), ''),
+                                        COALESCE(archived_last, '')), '') END
+  WHERE subscription_id = OLD.subscription_id;
+END;
+
+-- Правка оплаты: снимаем старое значение, затем учитываем новое
+-- (в том числе при переносе оплаты на другую подписку)
+CREATE TRIGGER IF NOT EXISTS trg_payment_summary_upd
+AFTER UPDATE OF subscription_id, date_paid, amount ON payment
+BEGIN
+  UPDATE payment_summary
+  SET paid_count = paid_count - 1,
+      paid_total = paid_total - OLD.amount,
+      last_paid  = CASE WHEN OLD.date_paid < last_paid THEN last_paid
+                        ELSE NULLIF(MAX(COALESCE((SELECT MAX(date_paid) FROM payment
+                                                  WHERE subscription_id = OLD.subscription_id), ''),
+                                        COALESCE(archived_last, '')), '') END
+  WHERE subscription_id = OLD.subscription_id;
+  UPDATE payment_summary
+  SET paid_count = paid_count + 1,
+      paid_total = paid_total + NEW.amount,
+      last_paid  = CASE WHEN last_paid IS NULL OR NEW.date_paid > last_paid
+                        THEN NEW.date_paid ELSE last_paid END
+  WHERE subscription_id = NEW.subscription_id;
+END;
+
+
+-- Журнал изменений для инкрементальной синхронизации копий базы.
+-- seq монотонно растёт; changed_at — метка времени для разрешения
+-- конфликтов по принципу «побеждает последняя запись»; row_uuid — uuid строки
+-- (row_id — её локальный id, в других копиях он другой).
+CREATE TABLE IF NOT EXISTS change_log (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl         TEXT    NOT NULL CHECK (tbl IN ('subscription','payment')),
+    row_id      INTEGER NOT NULL,
+    op          TEXT    NOT NULL CHECK (op IN ('I','U','D')),
+    changed_at  TEXT    NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    row_uuid    TEXT
+);
+
+-- Последнее изменение конкретной строки (проверка конфликтов при применении дельты)
+CREATE INDEX IF NOT EXISTS ix_change_log_row ON change_log(tbl, row_id, seq);
+CREATE INDEX IF NOT EXISTS ix_change_log_uuid ON change_log(tbl, row_uuid, seq);
+
+DROP TRIGGER IF EXISTS trg_log_subscription_ins;
+CREATE TRIGGER trg_log_subscription_ins
+AFTER INSERT ON subscription
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_apply')
+BEGIN
+  INSERT INTO change_log (tbl, row_id, row_uuid, op) VALUES ('subscription', NEW.id, NEW.uuid, 'I');
+END;
+
+-- Изменение одного лишь notes_preview (производная колонка) в журнал не попадает.
+-- Смена цены записывается как изменение подписки: её история цен едет вместе с ней
+DROP TRIGGER IF EXISTS trg_log_subscription_upd;
+CREATE TRIGGER trg_log_subscription_upd
+AFTER UPDATE OF name, cost, period, next_due, notes, is_active ON subscription
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_apply')
+BEGIN
+  INSERT INTO change_log (tbl, row_id, row_uuid, op) VALUES ('subscription', NEW.id, NEW.uuid, 'U');
+END;
+
+DROP TRIGGER IF EXISTS trg_log_subscription_del;
+CREATE TRIGGER trg_log_subscription_del
+AFTER DELETE ON subscription
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_apply')
+BEGIN
+  INSERT INTO change_log (tbl, row_id, row_uuid, op) VALUES ('subscription', OLD.id, OLD.uuid, 'D');
+END;
+
+DROP TRIGGER IF EXISTS trg_log_payment_ins;
+CREATE TRIGGER trg_log_payment_ins
+AFTER INSERT ON payment
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_apply')
+BEGIN
+  INSERT INTO change_log (tbl, row_id, row_uuid, op) VALUES ('payment', NEW.id, NEW.uuid, 'I');
+END;
+
+-- Без колонки uuid: её заполнение триггером trg_payment_uuid — не изменение
+DROP TRIGGER IF EXISTS trg_log_payment_upd;
+CREATE TRIGGER trg_log_payment_upd
+AFTER UPDATE OF subscription_id, date_paid, amount, comment ON payment
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_apply')
+BEGIN
+  INSERT INTO change_log (tbl, row_id, row_uuid, op) VALUES ('payment', NEW.id, NEW.uuid, 'U');
+END;
+
+DROP TRIGGER IF EXISTS trg_log_payment_del;
+CREATE TRIGGER trg_log_payment_del
+AFTER DELETE ON payment
+WHEN NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_apply')
+BEGIN
+  INSERT INTO change_log (tbl, row_id, row_uuid, op) VALUES ('payment', OLD.id, OLD.uuid, 'D');
+END;
+
+-- Превью заметок: первые 60 символов, при обрезке с многоточием.
+-- Полный текст читается по запросу (Database.get_notes).
+CREATE TRIGGER IF NOT EXISTS trg_notes_preview_ins
+AFTER INSERT ON subscription
+WHEN NEW.notes_preview IS NOT (CASE WHEN length(NEW.notes) > 60
+                                    THEN substr(NEW.notes, 1, 60) || '…' ELSE NEW.notes END)
+BEGIN
+  UPDATE subscription
+  SET notes_preview = CASE WHEN length(NEW.notes) > 60
+                           THEN substr(NEW.notes, 1, 60) || '…' ELSE NEW.notes END
+  WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_notes_preview_upd
+AFTER UPDATE OF notes, notes_preview ON subscription
+WHEN NEW.notes_preview IS NOT (CASE WHEN length(NEW.notes) > 60
+                                    THEN substr(NEW.notes, 1, 60) || '…' ELSE NEW.notes END)
+BEGIN
+  UPDATE subscription
+  SET notes_preview = CASE WHEN length(NEW.notes) > 60
+                           THEN substr(NEW.notes, 1, 60) || '…' ELSE NEW.notes END
+  WHERE id = NEW.id;
+END;
@@ -0,0 +1,228 @@
+"""
+Инкрементальная синхронизация копий базы по журналу изменений change_log.
+
+    python -m src.sync export subscriptions.db delta.json.gz --since 120
+    python -m src.sync apply other.db delta.json.gz
+
+Дельта содержит только строки, изменённые после указанного seq, в их текущем
+состоянии (или отметку удаления). Строки сопоставляются по uuid, а не по id:
+AUTOINCREMENT-id независимых копий совпадают у разных строк. Оплата ссылается
+на подписку её uuid (subscription_uuid). Вместе с подпиской передаётся её
+история цен, чтобы версии сохранили даты начала действия, а не получили
+сегодняшнюю от триггера trg_price_history_upd.
+
+Категории (subscription_tag, tag) не синхронизируются: это локальная
+группировка каждой копии, а id тегов в копиях свои.
+
+Применение идемпотентно, конфликты решаются по времени изменения:
+побеждает более поздняя запись.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import pathlib
+import sqlite3
+
+from src.db import Database, connect
+
+DELTA_VERSION = 2
+# Порядок применения: подписки раньше оплат (внешний ключ),
+# удаления оплат раньше удалений подписок
+SYNC_TABLES = ("subscription", "payment")
+
+
+def _columns(cx: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in cx.execute(f"PRAGMA table_info({table})")]
+
+
+def _delta_columns(cx: sqlite3.Connection, table: str) -> list[str]:
+    """Колонки строки в дельте: без локального id, подписка оплаты — по uuid."""
+    return [
+        "subscription_uuid" if table == "payment" and col == "subscription_id" else col
+        for col in _columns(cx, table)
+        if col != "id"
+    ]
+
+
+def last_seq(db: Database) -> int:
+    """Последний номер в журнале изменений."""
+    row = db.connection().execute("SELECT MAX(seq) FROM change_log").fetchone()
+    return row[0] or 0
+
+
+def _prices(cx: sqlite3.Connection, sub_uuid: str) -> list[list]:  # type: ignore
+    """История цен подписки: [valid_from, valid_to, cost] по возрастанию даты."""
+    return [
+        list(row) for row in cx.execute(
+            """
+            SELECT h.valid_from, h.valid_to, h.cost
+            FROM price_history AS h JOIN subscription AS s ON s.id = h.subscription_id
+            WHERE s.uuid = ? ORDER BY h.valid_from
+            """,
+            (sub_uuid,),
+        )
+    ]
+
+
+def export_delta(db: Database, since: int = 0) -> dict:  # type: ignore
+    """
+    Собирает изменения с seq > since: для каждой затронутой строки берётся
+    последняя запись журнала и текущее содержимое строки (None — строка удалена).
+    Изменение — [таблица, uuid, changed_at, значения, история цен подписки].
+    """
+    cx = db.connection()
+    columns = {t: _delta_columns(cx, t) for t in SYNC_TABLES}
+    changes = []
+    for table in SYNC_TABLES:
+        # Оплаты — вместе с архивным файлом: перенесённая туда оплата не удалена
+        source = db.payments_source() if table == "payment" else table
+        cols = ", ".join(
+            "(SELECT s.uuid FROM subscription AS s WHERE s.id = r.subscription_id)"
+            if col == "subscription_uuid" else f"r.{col}"
+            for col in columns[table]
+        )
+        # Записи журнала берутся диапазоном seq (по первичному ключу): +tbl не даёт
+        # планировщику выбрать ix_change_log_uuid и обойти весь журнал таблицы.
+        # Голый столбец changed_at при MAX(seq) берётся из той же строки журнала
+        logged = cx.execute(
+            """
+            SELECT row_uuid, MAX(seq), changed_at
+            FROM (SELECT seq, row_uuid, changed_at FROM change_log WHERE seq > ? AND +tbl = ?)
+            GROUP BY row_uuid
+            ORDER BY MAX(seq)
+            """,
+            (since, table),
+        ).fetchall()
+        # Текущее содержимое — поиском по uuid (индексы ux_*_uuid), по строке на изменение
+        select = f"SELECT {cols} FROM {source} AS r WHERE r.uuid = ?"
+        for row_uuid, _, changed_at in logged:
+            values = cx.execute(select, (row_uuid,)).fetchone()
+            if values is None:
+                changes.append([table, row_uuid, changed_at, None, None])
+            elif table == "subscription":
+                changes.append([table, row_uuid, changed_at, list(values), _prices(cx, row_uuid)])
+            else:
+                changes.append([table, row_uuid, changed_at, list(values), None])
+    return {
+        "version": DELTA_VERSION,
+        "since": since,
+        "last_seq": last_seq(db),
+        "columns": columns,
+        "changes": changes,
+    }
+
+
+def write_delta(delta: dict, path: str | pathlib.Path) -> None:  # type: ignore
+    """Сохраняет дельту компактно: JSON без пробелов, сжатый gzip."""
+    payload = json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    pathlib.Path(path).write_bytes(gzip.compress(payload))
+
+
+def read_delta(path: str | pathlib.Path) -> dict:  # type: ignore
+    return json.loads(gzip.decompress(pathlib.Path(path).read_bytes()).decode("utf-8"))
+
+
+def _replace_prices(cx: sqlite3.Connection, sub_id: int, prices: list[list]) -> None:  # type: ignore
+    """Заменяет историю цен подписки версиями из дельты (с их датами начала действия)."""
+    cx.execute("DELETE FROM price_history WHERE subscription_id=?", (sub_id,))
+    cx.executemany(
+        "INSERT INTO price_history (subscription_id, valid_from, valid_to, cost) VALUES (?, ?, ?, ?)",
+        ((sub_id, *version) for version in prices),
+    )
+
+
+def apply_delta(db: Database, delta: dict) -> int:  # type: ignore
+    """
+    Применяет дельту в одной транзакции. Изменение пропускается, если локально
+    эта же строка менялась не раньше (last-writer-wins), поэтому повторное
+    применение той же дельты ничего не меняет. Возвращает число применённых изменений.
+    """
+    if delta.get("version") != DELTA_VERSION:
+        raise ValueError(f"неподдерживаемая версия дельты: {delta.get('version')}")
+    cx = db.connection()
+    local_cols = {t: set(_delta_columns(cx, t)) for t in SYNC_TABLES}
+    upserts = [c for c in delta["changes"] if c[3] is not None]
+    deletes = [c for c in delta["changes"] if c[3] is None]
+    # Подписки до оплат при вставке, оплаты до подписок при удалении
+    upserts.sort(key=lambda c: SYNC_TABLES.index(c[0]))
+    deletes.sort(key=lambda c: -SYNC_TABLES.index(c[0]))
+
+    applied = 0
+    with cx:
+        # Пока ключ есть, триггеры журнала и next_due молчат — журнал пишем сами
+        cx.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('sync_apply', '1')")
+        for table, row_uuid, changed_at, values, prices in upserts + deletes:
+            local = cx.execute(
+                "SELECT MAX(changed_at) FROM change_log WHERE tbl=? AND row_uuid=?",
+                (table, row_uuid),
+            ).fetchone()[0]
+            if local is not None and local >= changed_at:
+                continue
+            if values is None:
+                row = cx.execute(
+                    f"DELETE FROM {table} WHERE uuid=? RETURNING id", (row_uuid,)
+                ).fetchone()
+                row_id, op = (row[0] if row else 0), "D"
+            else:
+                pairs = [
+                    (col, val) for col, val in zip(delta["columns"][table], values)
+                    if col in local_cols[table]
+                ]
+                if table == "payment":
+                    sub = cx.execute(
+                        "SELECT id FROM subscription WHERE uuid=?", (dict(pairs)["subscription_uuid"],)
+                    ).fetchone()
+                    if sub is None:
+                        # Оплата подписки, которую здесь удалили позже
+                        continue
+                    pairs = [
+                        ("subscription_id", sub[0]) if col == "subscription_uuid" else (col, val)
+                        for col, val in pairs
+                    ]
+                cols = ", ".join(col for col, _ in pairs)
+                marks = ", ".join("?" for _ in pairs)
+                updates = ", ".join(f"{col}=excluded.{col}" for col, _ in pairs if col != "uuid")
+                row_id = cx.execute(
+                    f"INSERT INTO {table} ({cols}) VALUES ({marks}) "
+                    f"ON CONFLICT(uuid) DO UPDATE SET {updates} RETURNING id",
+                    [val for _, val in pairs],
+                ).fetchone()[0]
+                if prices is not None:
+                    _replace_prices(cx, row_id, prices)
+                op = "U"
+            cx.execute(
+                "INSERT INTO change_log (tbl, row_id, row_uuid, op, changed_at) VALUES (?, ?, ?, ?, ?)",
+                (table, row_id, row_uuid, op, changed_at),
+            )
+            applied += 1
+        cx.execute("DELETE FROM app_meta WHERE key = 'sync_apply'")
+    db.invalidate_caches()
+    return applied
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Синхронизация копий базы подписок")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="выгрузить изменения после seq в файл дельты")
+    exp.add_argument("db")
+    exp.add_argument("delta")
+    exp.add_argument("--since", type=int, default=0)
+    app = sub.add_parser("apply", help="применить файл дельты к базе")
+    app.add_argument("db")
+    app.add_argument("delta")
+    args = parser.parse_args(argv)
+
+    with connect(args.db) as db:
+        if args.command == "export":
+            delta = export_delta(db, args.since)
+            write_delta(delta, args.delta)
+            print(f"изменений: {len(delta['changes'])}, last_seq={delta['last_seq']}")
+        else:
+            applied = apply_delta(db, read_delta(args.delta))
+            print(f"применено изменений: {applied}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import bisect
+import datetime as dt
+
+from PyQt6.QtCore import QLineF, QPointF, Qt
+from PyQt6.QtGui import QColor, QPainter, QPen
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QSizePolicy,
+    QVBoxLayout,
+    QWidget,
+)
+
+from src.db import Database
+from src.series import lttb
+
+# Подписи гранулярности и её код для Database.spend_series
+GRANULARITY_MAP = {
+    "по дням": "day",
+    "по неделям": "week",
+    "по месяцам": "month",
+    "по годам": "year",
+}
+
+
+class SpendChart(QWidget):
+    """
+    Линейный график трат с прокруткой (перетаскивание) и масштабом (колесо мыши).
+    При отрисовке берётся только видимый участок ряда и прореживается (LTTB)
+    до ширины виджета в пикселях, поэтому перерисовка не зависит от длины ряда.
+    """
+    MARGIN = 40
+
+    def __init__(self, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self.setObjectName("SpendChart")
+        self.setMinimumSize(480, 260)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self._xs: list[int] = []
+        self._ys: list[float] = []
+        self._view = (0.0, 1.0)  # видимый диапазон по X (порядковые номера дат)
+        self._drag_x: float | None = None
+
+    def set_series(self, xs, ys) -> None:  # type: ignore
+        """Задаёт ряд (xs — date.toordinal(), ys — суммы) и показывает его целиком."""
+        self._xs = list(xs)  # type: ignore
+        self._ys = list(ys)  # type: ignore
+        if self._xs:
+            lo, hi = self._xs[0], self._xs[-1]
+            self._view = (lo - 1.0, hi + 1.0)
+        self.update()
+
+    def _visible_points(self, width: int) -> tuple[list[int], list[float]]:
+        """Точки видимого диапазона (с соседями по краям), прореженные до width."""
+        lo = max(bisect.bisect_left(self._xs, self._view[0]) - 1, 0)
+        hi = min(bisect.bisect_right(self._xs, self._view[1]) + 1, len(self._xs))
+        xs, ys = self._xs[lo:hi], self._ys[lo:hi]
+        if len(xs) > width:
+            keep = lttb(xs, ys, max(width, 3))
+            xs, ys = [xs[i] for i in keep], [ys[i] for i in keep]
+        return xs, ys
+
+    def paintEvent(self, event):  # type: ignore
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        m = self.MARGIN
+        w, h = self.width() - 2 * m, self.height() - 2 * m
+        painter.setPen(QPen(QColor("#888888")))
+        painter.drawRect(m, m, w, h)
+        if not self._xs or w <= 0 or h <= 0:
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Нет оплат")
+            return
+
+        xs, ys = self._visible_points(w)
+        x0, x1 = self._view
+        y_max = max(ys) if ys else 0.0
+        y_max = y_max or 1.0
+        sx = w / (x1 - x0)
+        sy = h / y_max
+        pts = [QPointF(m + (x - x0) * sx, m + h - y * sy) for x, y in zip(xs, ys)]
+        painter.setClipRect(m, m, w + 1, h + 1)
+        pen = QPen(QColor("#3b82f6"), 1.5)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        # Отдельные отрезки рисуются на порядок быстрее одной ломаной:
+        # для drawPolyline Qt строит и заливает контур всего пути целиком
+        painter.drawLines([QLineF(a, b) for a, b in zip(pts, pts[1:])])
+        painter.setClipping(False)
+
+        # Подписи осей: границы видимого диапазона дат и максимум трат
+        painter.setPen(QPen(QColor("#555555")))
+        fmt = "%d.%m.%Y"
+        left = dt.date.fromordinal(max(int(x0), 1)).strftime(fmt)
+        right = dt.date.fromordinal(max(int(x1), 1)).strftime(fmt)
+        painter.drawText(m, self.height() - 12, left)
+        painter.drawText(m + w - 70, self.height() - 12, right)
+        painter.drawText(m, m - 8, f"{y_max:.2f} руб.")
+
+    def wheelEvent(self, event):  # type: ignore
+        """Масштабирование колесом мыши относительно позиции курсора."""
+        m, w = self.MARGIN, self.width() - 2 * self.MARGIN
+        if w <= 0:
+            return
+        x0, x1 = self._view
+        frac = min(max((event.position().x() - m) / w, 0.0), 1.0)  # type: ignore
+        anchor = x0 + (x1 - x0) * frac
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25  # type: ignore
+        span = max((x1 - x0) * factor, 7.0)  # не уже недели
+        self._view = (anchor - span * frac, anchor + span * (1 - frac))
+        self.update()
+        event.accept()  # type: ignore
+
+    def mousePressEvent(self, event):  # type: ignore
+        if event.button() == Qt.MouseButton.LeftButton:  # type: ignore
+            self._drag_x = event.position().x()  # type: ignore
+            event.accept()  # type: ignore
+
+    def mouseMoveEvent(self, event):  # type: ignore
+        """Прокрутка графика перетаскиванием."""
+        if self._drag_x is None:
+            return
+        w = self.width() - 2 * self.MARGIN
+        x0, x1 = self._view
+        shift = (self._drag_x - event.position().x()) * (x1 - x0) / max(w, 1)  # type: ignore
+        self._view = (x0 + shift, x1 + shift)
+        self._drag_x = event.position().x()  # type: ignore
+        self.update()
+        event.accept()  # type: ignore
+
+    def mouseReleaseEvent(self, event):  # type: ignore
+        self._drag_x = None
+        event.accept()  # type: ignore
+
+
+class ChartDialog(QDialog):
+    """Диалог с графиком трат по всем подпискам или по одной, с выбором гранулярности."""
+    def __init__(self, db: Database, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self.setObjectName("ChartDialog")
+        self.setWindowTitle("График трат")
+        self.resize(720, 420)
+        self.db = db
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        controls = QHBoxLayout()
+
+        # Выбор подписки: все или одна конкретная
+        self.sub_combo = QComboBox(self)
+        self.sub_combo.addItem("Все подписки", None)
+        snap = db.snapshot()
+        for i in range(len(snap)):
+            self.sub_combo.addItem(snap.names[i], snap.ids[i])
+        controls.addWidget(QLabel("Подписка:"))
+        controls.addWidget(self.sub_combo, stretch=1)
+
+        # Выбор гранулярности корзин
+        self.gran_combo = QComboBox(self)
+        self.gran_combo.addItems(list(GRANULARITY_MAP.keys()))  # type: ignore
+        self.gran_combo.setCurrentText("по месяцам")
+        controls.addWidget(QLabel("Группировка:"))
+        controls.addWidget(self.gran_combo)
+        layout.addLayout(controls)
+
+        self.chart = SpendChart(self)
+        layout.addWidget(self.chart, stretch=1)
+
+        self.sub_combo.currentIndexChanged.connect(self._reload)  # type: ignore
+        self.gran_combo.currentIndexChanged.connect(self._reload)  # type: ignore
+        self._reload()
+
+    def _reload(self) -> None:
+        """Берёт ряд из кэша Database (или агрегирует в SQL) и передаёт графику."""
+        gran = GRANULARITY_MAP[self.gran_combo.currentText()]
+        xs, ys = self.db.spend_series(gran, self.sub_combo.currentData())
+        self.chart.set_series(xs, ys)
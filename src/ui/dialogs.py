@@ -1,7 +1,7 @@
 from __future__ import annotations
 import datetime as dt
 
-from PyQt6.QtCore import QDate, Qt
+from PyQt6.QtCore import QDate, Qt, QTimer
 from PyQt6.QtGui import QRegion, QPainterPath
 from PyQt6.QtWidgets import (
     QDialog,
@@ -17,6 +17,8 @@ from PyQt6.QtWidgets import (
     QLabel
 )
 
+from src.duplicates import SUGGEST_MAX_PENDING, find_similar
+
 # Сопоставление русской надписи периода и кода в базе
 PERIOD_MAP = {
     "ежедневно": "daily",
@@ -24,14 +26,27 @@ PERIOD_MAP = {
     "ежемесячно": "monthly",
     "ежегодно": "yearly",
 }
+# Пауза после ввода названия перед поиском похожих подписок, мс
+SUGGEST_DELAY_MS = 250
+
+
+def split_tags(text: str) -> list[str]:
+    """Разбирает строку категорий через запятую."""
+    return [t.strip() for t in text.split(",") if t.strip()]
+
 
 class SubscriptionDialog(QDialog):
-    """Диалог создания или редактирования подписки."""
-    def __init__(self, parent=None):  # type: ignore
+    """
+    Диалог создания или редактирования подписки.
+    Если передана база, под названием показываются похожие подписки
+    (возможные дубликаты) по мере ввода.
+    """
+    def __init__(self, parent=None, db=None):  # type: ignore
         super().__init__(parent)  # type: ignore
+        self.db = db
         self.setWindowTitle("Добавить подписку")  # Заголовок окна
         self.setModal(True)                         # Модальный диалог
-        self.setFixedSize(400, 400)                # Фиксированный размер
+        self.setFixedSize(400, 470)                # Фиксированный размер
         self.setObjectName("SubscriptionDialog")   # Имя для QSS
 
         # Центральный контейнер для стилизации
@@ -51,6 +66,19 @@ class SubscriptionDialog(QDialog):
         self.name_edit.setPlaceholderText("Введите название")
         form.addRow("Название:", self.name_edit)
 
+        # Похожие подписки: поиск по индексу триграмм после паузы в наборе
+        self.similar_label = QLabel(self)
+        self.similar_label.setObjectName("SimilarLabel")
+        self.similar_label.setWordWrap(True)
+        self.similar_label.hide()
+        form.addRow(self.similar_label)
+        self.suggest_timer = QTimer(self)
+        self.suggest_timer.setSingleShot(True)
+        self.suggest_timer.setInterval(SUGGEST_DELAY_MS)
+        self.suggest_timer.timeout.connect(self._show_similar)  # type: ignore
+        if db is not None:
+            self.name_edit.textChanged.connect(self.suggest_timer.start)  # type: ignore
+
         # Поле для стоимости (число с плавающей точкой)
         self.cost_spin = QDoubleSpinBox(self)
         self.cost_spin.setRange(0.0, 1_000_000.0)
@@ -75,6 +103,11 @@ class SubscriptionDialog(QDialog):
         self.notes_edit.setFixedHeight(48)
         form.addRow("Заметки:", self.notes_edit)
 
+        # Категории (теги) через запятую
+        self.tags_edit = QLineEdit(self)
+        self.tags_edit.setPlaceholderText("Через запятую, например: видео, работа")
+        form.addRow("Категории:", self.tags_edit)
+
         # Кнопки OK и Отмена
         btns = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok |
@@ -87,7 +120,16 @@ class SubscriptionDialog(QDialog):
         btns.button(QDialogButtonBox.StandardButton.Cancel).setText("Отмена")  # type: ignore
         form.addRow(btns)
 
-    def get_data(self) -> tuple[str, float, str, dt.date, str] | None:
+    def _show_similar(self) -> None:
+        """Показывает подписки с похожим названием (или прячет подсказку)."""
+        # Большую очередь индекса не разбираем в GUI-потоке — её строит фон главного окна
+        similar = find_similar(self.db, self.name_edit.text(), limit=3, max_pending=SUGGEST_MAX_PENDING)
+        if similar:
+            names = ", ".join(f"«{name}»" for _, name, _ in similar)
+            self.similar_label.setText(f"Похожие подписки: {names}")
+        self.similar_label.setVisible(bool(similar))
+
+    def get_data(self) -> tuple[str, float, str, dt.date, str, list[str]] | None:
         """Собирает введённые данные; возвращает None, если имя пустое."""
         name = self.name_edit.text().strip()
         if not name:
@@ -98,12 +140,64 @@ class SubscriptionDialog(QDialog):
         qdate = self.date_edit.date()
         next_due = dt.date(qdate.year(), qdate.month(), qdate.day())
         notes = self.notes_edit.toPlainText().strip()
-        return (name, cost, period_code, next_due, notes)
+        tags = split_tags(self.tags_edit.text())
+        return (name, cost, period_code, next_due, notes, tags)
+
+
+class PriceChangeDialog(QDialog):
+    """Диалог изменения цены подписки с даты начала действия (история сохраняется)."""
+    def __init__(self, name: str, cost: float, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self.setWindowTitle("Изменить цену")
+        self.setModal(True)
+        self.setObjectName("SubscriptionDialog")   # тот же стиль, что у диалога подписки
+
+        central = QWidget(self)
+        central.setObjectName("SubscriptionDialogWidget")
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(central)
+
+        form = QFormLayout(central)
+        form.setContentsMargins(26, 26, 26, 26)
+        form.setSpacing(15)
+        form.addRow("Подписка:", QLabel(name, self))
+
+        # Новая стоимость, по умолчанию — текущая
+        self.cost_spin = QDoubleSpinBox(self)
+        self.cost_spin.setRange(0.0, 1_000_000.0)
+        self.cost_spin.setSuffix(" ₽")
+        self.cost_spin.setDecimals(2)
+        self.cost_spin.setValue(cost)
+        form.addRow("Новая стоимость:", self.cost_spin)
+
+        # С какой даты действует (не позже сегодняшней)
+        self.date_edit = QDateEdit(self)
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDate(QDate.currentDate())
+        self.date_edit.setMaximumDate(QDate.currentDate())
+        form.addRow("Действует с:", self.date_edit)
+
+        btns = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel,
+            parent=self
+        )
+        btns.accepted.connect(self.accept)  # type: ignore
+        btns.rejected.connect(self.reject)  # type: ignore
+        btns.button(QDialogButtonBox.StandardButton.Ok).setText("Сохранить")  # type: ignore
+        btns.button(QDialogButtonBox.StandardButton.Cancel).setText("Отмена")  # type: ignore
+        form.addRow(btns)
+
+    def get_data(self) -> tuple[float, dt.date]:
+        """Новая стоимость и дата начала её действия."""
+        qdate = self.date_edit.date()
+        return float(self.cost_spin.value()), dt.date(qdate.year(), qdate.month(), qdate.day())
 
 
 class DeleteConfirmDialog(QDialog):
     """Диалог подтверждения удаления подписки (с кастомным стилем и перетаскиванием)."""
-    def __init__(self, parent=None):  # type: ignore
+    def __init__(self, parent=None, count: int = 1):  # type: ignore
         super().__init__(parent)  # type: ignore
         # Без стандартного заголовка ОС, чтобы стилизовать под себя
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
@@ -117,8 +211,9 @@ class DeleteConfirmDialog(QDialog):
         layout.setSpacing(18)
 
         # Текст предупреждения
+        question = "Удалить подписку?" if count == 1 else f"Удалить подписки ({count})?"
         label = QLabel(
-            "Удалить подписку?\nЭто действие нельзя отменить.", self
+            f"{question}\nЭто действие нельзя отменить.", self
         )
         label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         label.setStyleSheet("font-size: 16px;")
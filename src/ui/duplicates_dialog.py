@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QLabel,
+    QProgressBar,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+)
+
+from src.db import Database
+from src.duplicates import CLUSTER_STAGES, duplicate_clusters
+
+
+class DuplicatesRunner(QObject):
+    """
+    Ищет группы похожих подписок в фоновом потоке и пересылает
+    прогресс и результат в GUI-поток сигналами.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db: Database, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self._db = db
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        # In-memory база не видна другим соединениям — тогда считаем синхронно
+        if str(self._db.db_path) == ":memory:":
+            self._run(self._db)
+            return
+        self._thread = threading.Thread(target=self._run, name="duplicates", daemon=True)
+        self._thread.start()
+
+    def _run(self, db: Database | None = None) -> None:
+        # Отдельное соединение для записи: перед поиском дообновляется индекс названий
+        writer = db or self._db.open_writer()
+        try:
+            clusters = duplicate_clusters(writer, progress=self.progress.emit)
+        except Exception as exc:
+            self.failed.emit(str(exc))
+        else:
+            self.finished.emit(clusters)
+        finally:
+            if writer is not self._db:
+                writer.close()
+
+
+class DuplicatesDialog(QDialog):
+    """Группы подписок с похожими названиями (возможные дубликаты)."""
+    def __init__(self, db: Database, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self.setObjectName("DuplicatesDialog")
+        self.setWindowTitle("Возможные дубликаты")
+        self.resize(480, 420)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(12)
+
+        self.clusters: list[list[tuple[int, str]]] = []
+        self.status_label = QLabel("Поиск похожих подписок…", self)
+        layout.addWidget(self.status_label)
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setMaximum(CLUSTER_STAGES)
+        layout.addWidget(self.progress_bar)
+
+        self.tree = QTreeWidget(self)
+        self.tree.setHeaderLabels(["Подписка", "id"])  # type: ignore
+        layout.addWidget(self.tree)
+
+        btns = QDialogButtonBox(QDialogButtonBox.StandardButton.Close, parent=self)
+        btns.rejected.connect(self.reject)  # type: ignore
+        btns.button(QDialogButtonBox.StandardButton.Close).setText("Закрыть")  # type: ignore
+        layout.addWidget(btns)
+
+        self.runner = DuplicatesRunner(db)
+        self.runner.progress.connect(self._on_progress)  # type: ignore
+        self.runner.finished.connect(self._on_finished)  # type: ignore
+        self.runner.failed.connect(self._on_failed)  # type: ignore
+        self.runner.start()
+
+    def _on_progress(self, done: int, total: int) -> None:
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+
+    def _on_failed(self, error: str) -> None:
+        self.progress_bar.hide()
+        self.status_label.setText(f"Ошибка: {error}")
+
+    def _on_finished(self, clusters: list[list[tuple[int, str]]]) -> None:
+        """Заполняет дерево найденными группами."""
+        self.clusters = clusters
+        self.progress_bar.hide()
+        self.status_label.setText(
+            f"Групп похожих подписок: {len(clusters)}" if clusters else "Похожих подписок не найдено"
+        )
+        for cluster in clusters:
+            group = QTreeWidgetItem(self.tree, [f"{cluster[0][1]} и ещё {len(cluster) - 1}", ""])
+            for sid, name in cluster:
+                item = QTreeWidgetItem(group, [name, str(sid)])
+                item.setData(0, Qt.ItemDataRole.UserRole, sid)
+        self.tree.expandAll()
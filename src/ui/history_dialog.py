@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from PyQt6.QtCore import QObject, Qt, QThread, pyqtSignal, pyqtSlot
+from PyQt6.QtWidgets import (
+    QDialog,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from src.db import Database
+
+# Размер одной страницы истории оплат
+PAGE_SIZE = 200
+# За сколько строк до конца таблицы подгружать следующую страницу
+PREFETCH_ROWS = 50
+
+
+class _PageLoader(QObject):
+    """
+    Загружает страницы истории оплат в отдельном потоке
+    через собственное соединение только для чтения.
+    """
+    page_loaded = pyqtSignal(list)
+
+    def __init__(self, db: Database, sub_id: int):
+        super().__init__()
+        self._db = db
+        self._sub_id = sub_id
+        self._reader: Database | None = None
+
+    @pyqtSlot(object)
+    def load(self, after):  # type: ignore
+        """Читает страницу после ключа after и отдаёт её сигналом page_loaded."""
+        if self._reader is None:
+            self._reader = self._db.open_reader()
+        rows = self._reader.payments_page(self._sub_id, after, PAGE_SIZE)
+        self.page_loaded.emit([tuple(r) for r in rows])
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+class PaymentHistoryDialog(QDialog):
+    """
+    Диалог истории оплат выбранной подписки.
+    Строки подгружаются постранично (keyset pagination) по мере прокрутки,
+    следующая страница читается в фоновом потоке.
+    """
+    _request_page = pyqtSignal(object)
+
+    def __init__(self, db: Database, sub_id: int, title: str, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self.setObjectName("PaymentHistoryDialog")
+        self.setWindowTitle(f"История оплат: {title}")
+        self.resize(520, 420)
+
+        self._db = db
+        self._sub_id = sub_id
+        self._last_key: tuple[str, int] | None = None  # ключ последней загруженной строки
+        self._loading = False
+        self._exhausted = False
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(12)
+
+        # Таблица оплат: дата, сумма, комментарий
+        self.table = QTableWidget(0, 3, self)
+        self.table.setHorizontalHeaderLabels(["Дата оплаты", "Сумма (руб.)", "Комментарий"])  # type: ignore
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)  # type: ignore
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalScrollBar().valueChanged.connect(self._maybe_fetch)  # type: ignore
+        layout.addWidget(self.table)
+
+        # Строка состояния загрузки
+        self.status_label = QLabel("", self)
+        layout.addWidget(self.status_label)
+
+        close_btn = QPushButton("Закрыть", self)
+        close_btn.clicked.connect(self.accept)  # type: ignore
+        layout.addWidget(close_btn, alignment=Qt.AlignmentFlag.AlignRight)
+
+        # In-memory база не видна другим соединениям — тогда читаем синхронно
+        self._thread: QThread | None = None
+        self._loader: _PageLoader | None = None
+        if str(db.db_path) != ":memory:":
+            self._thread = QThread(self)
+            self._loader = _PageLoader(db, sub_id)
+            self._loader.moveToThread(self._thread)
+            self._request_page.connect(self._loader.load)  # type: ignore
+            self._loader.page_loaded.connect(self._append_page)  # type: ignore
+            self._thread.start()
+
+        self._fetch_next()
+
+    def _fetch_next(self) -> None:
+        """Запрашивает следующую страницу, если она есть и ещё не загружается."""
+        if self._loading or self._exhausted:
+            return
+        self._loading = True
+        self.status_label.setText("Загрузка…")
+        if self._loader is not None:
+            self._request_page.emit(self._last_key)
+        else:
+            rows = self._db.payments_page(self._sub_id, self._last_key, PAGE_SIZE)
+            self._append_page([tuple(r) for r in rows])
+
+    def _maybe_fetch(self, value: int) -> None:
+        """При прокрутке близко к концу таблицы подгружает следующую страницу."""
+        bar = self.table.verticalScrollBar()
+        if value >= bar.maximum() - PREFETCH_ROWS:  # type: ignore
+            self._fetch_next()
+
+    def _append_page(self, rows: list) -> None:  # type: ignore
+        """Добавляет загруженную страницу в конец таблицы."""
+        self._loading = False
+        if len(rows) < PAGE_SIZE:  # type: ignore
+            self._exhausted = True
+        start = self.table.rowCount()
+        self.table.setRowCount(start + len(rows))  # type: ignore
+        for i, (pid, date_paid, amount, comment) in enumerate(rows, start):  # type: ignore
+            try:
+                ds = dt.date.fromisoformat(date_paid).strftime("%d.%m.%Y")  # type: ignore
+            except ValueError:
+                ds = date_paid  # type: ignore
+            for col, text in enumerate((ds, f"{amount:.2f}", comment or "")):  # type: ignore
+                item = QTableWidgetItem(text)  # type: ignore
+                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                self.table.setItem(i, col, item)
+            self._last_key = (date_paid, pid)  # type: ignore
+        total = self.table.rowCount()
+        self.status_label.setText(
+            f"Оплат: {total}" if self._exhausted else f"Загружено оплат: {total}"
+        )
+        # Если страница не заполнила видимую область, прокрутки не будет — грузим дальше
+        if not self._exhausted and self.table.verticalScrollBar().maximum() == 0:  # type: ignore
+            self._fetch_next()
+
+    def done(self, result: int) -> None:  # type: ignore
+        """Останавливает фоновый поток и закрывает соединение загрузчика."""
+        if self._thread is not None:
+            self._thread.quit()
+            self._thread.wait()
+            self._loader.close()  # type: ignore
+            self._thread = None
+        super().done(result)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import Callable
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QTableWidgetItem
+
+
+class NumericItem(QTableWidgetItem):
+    """
+    QTableWidgetItem для числовых значений.
+    Переопределяет сравнение, чтобы сортировка работала по числовому значению, а не по строке.
+    """
+    def __lt__(self, other):  # type: ignore
+        try:
+            return float(self.text()) < float(other.text())
+        except Exception:
+            return super().__lt__(other)
+
+class DateItem(QTableWidgetItem):
+    """
+    QTableWidgetItem для дат в формате dd.mm.yyyy.
+    Переопределяет сравнение, чтобы сортировка шла по дате.
+    """
+    def __lt__(self, other):  # type: ignore
+        try:
+            d1 = dt.datetime.strptime(self.text(), "%d.%m.%Y").date()
+            d2 = dt.datetime.strptime(other.text(), "%d.%m.%Y").date()
+            return d1 < d2
+        except Exception:
+            return super().__lt__(other)
+
+
+class NotesItem(QTableWidgetItem):
+    """
+    Ячейка заметок: показывает превью, а полный текст загружает через loader
+    только при первом показе подсказки (наведении мыши) и запоминает его.
+    """
+    def __init__(self, preview: str, loader: Callable[[], str] | None = None):
+        super().__init__(preview)
+        # Превью без многоточия на конце уже содержит весь текст
+        self._loader = loader if preview.endswith("…") else None
+        self._full: str | None = None
+
+    def data(self, role):  # type: ignore
+        if role == Qt.ItemDataRole.ToolTipRole and self.text():
+            if self._full is None:
+                self._full = self._loader() if self._loader else self.text()
+            return self._full
+        return super().data(role)
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
-import calendar
 import datetime as dt
+import sqlite3
+from functools import partial
 
-from PyQt6.QtCore import Qt, QMimeData, QSettings, QUrl
+from PyQt6.QtCore import Qt, QMimeData, QObject, QSettings, QThread, pyqtSignal, pyqtSlot
 from PyQt6.QtGui import QAction, QDrag, QIcon
 from PyQt6.QtWidgets import (
     QApplication,
+    QComboBox,
     QDockWidget,
+    QFileDialog,
     QHeaderView,
+    QInputDialog,
+    QLabel,
     QMainWindow,
+    QMessageBox,
     QSplitter,
     QStyle,
     QTableWidget,
@@ -18,12 +24,26 @@ from PyQt6.QtWidgets import (
     QSizePolicy,
 )
 from PyQt6.QtSql import QSqlDatabase
-from PyQt6.QtMultimedia import QSoundEffect
 
-from src.config import ICON_PATH, SOUND_PATH
-from src.db import Database
+from src.backup import BackupManager
+from src.config import ICON_PATH
+from src.db import Database, add_period
+from src.duplicates import NameIndexBuilder
 from src.logic import Reminder
-from src.ui.dialogs import SubscriptionDialog, DeleteConfirmDialog
+from src.maintenance import MaintenanceScheduler, status_details, status_text
+from src.memory import MemoryProfiler, profiling_enabled
+from src.profiles import ProfileRegistry
+from src.ui.dialogs import (
+    DeleteConfirmDialog,
+    PriceChangeDialog,
+    SubscriptionDialog,
+    split_tags,
+)
+from src.ui.chart_dialog import ChartDialog
+from src.ui.duplicates_dialog import DuplicatesDialog
+from src.ui.items import DateItem, NotesItem, NumericItem
+from src.ui.history_dialog import PaymentHistoryDialog
+from src.ui.reports_dialog import ReportsDialog
 from src.ui.stats_dialog import StatsDialog
 
 # Словарь для отображения периодов на русском при наполнении таблицы
@@ -34,29 +54,35 @@ PERIOD_RU = {
     "yearly": "ежегодно",
 }
 
-class NumericItem(QTableWidgetItem):
-    """
-    QTableWidgetItem для числовых значений.
-    Переопределяет сравнение, чтобы сортировка работала по числовому значению, а не по строке.
-    """
-    def __lt__(self, other):  # type: ignore
-        try:
-            return float(self.text()) < float(other.text())
-        except Exception:
-            return super().__lt__(other)
+# Пункт переключателя профилей для сводного просмотра
+ALL_PROFILES = "Все профили"
+ALL_CATEGORIES = "Все категории"
 
-class DateItem(QTableWidgetItem):
+class _ArchiveWorker(QObject):
     """
-    QTableWidgetItem для дат в формате dd.mm.yyyy.
-    Переопределяет сравнение, чтобы сортировка шла по дате.
+    Переносит старые оплаты в архивный файл в отдельном потоке
+    через собственное соединение для записи.
     """
-    def __lt__(self, other):  # type: ignore
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db: Database, cutoff: dt.date):
+        super().__init__()
+        self._db = db
+        self._cutoff = cutoff
+
+    @pyqtSlot()
+    def run(self) -> None:
+        writer = self._db.open_writer()
         try:
-            d1 = dt.datetime.strptime(self.text(), "%d.%m.%Y").date()
-            d2 = dt.datetime.strptime(other.text(), "%d.%m.%Y").date()
-            return d1 < d2
-        except Exception:
-            return super().__lt__(other)
+            moved = writer.archive_payments(self._cutoff)
+        except sqlite3.Error as exc:
+            self.failed.emit(str(exc))
+            return
+        finally:
+            writer.close()
+        self.finished.emit(moved)
+
 
 class DraggableTableWidget(QTableWidget):
     """
@@ -64,13 +90,16 @@ class DraggableTableWidget(QTableWidget):
     При перетаскивании переносит запись между активными и архивными.
     """
     def __init__(self, parent=None):  # type: ignore
-        super().__init__(0, 5, parent)  # type: ignore # создаём таблицу с 5 колонками
+        super().__init__(0, 8, parent)  # type: ignore # создаём таблицу с 8 колонками
         # Устанавливаем заголовки колонок
         self.setHorizontalHeaderLabels([  # type: ignore
             "Название",
             "Сумма (руб.)",
             "Период",
             "Дата след. платежа",
+            "Последняя оплата",
+            "Оплачено (руб.)",
+            "Оплат",
             "Заметки",
         ])
         # Авто-растяжение колонок и строк
@@ -84,15 +113,28 @@ class DraggableTableWidget(QTableWidget):
         self.setDragEnabled(True)
         self.setAcceptDrops(True)
         self.setDragDropMode(QTableWidget.DragDropMode.InternalMove)
+        # Выделение целыми строками, несколько строк через Ctrl/Shift
+        self.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.setSelectionMode(QTableWidget.SelectionMode.ExtendedSelection)
+
+    def selected_ids(self) -> list[int]:
+        """Возвращает id подписок во всех выделенных строках."""
+        rows = sorted({idx.row() for idx in self.selectedIndexes()})
+        return [
+            int(self.item(row, 0).data(Qt.ItemDataRole.UserRole))  # type: ignore
+            for row in rows
+        ]
 
     def startDrag(self, supportedActions):  # type: ignore
-        """При начале перетаскивания: передаём id подписки через MimeData."""
-        row = self.currentRow()
-        if row < 0:
+        """При начале перетаскивания: передаём id выделенных подписок через MimeData."""
+        sub_ids = self.selected_ids()
+        if not sub_ids:
             return
-        sub_id = int(self.item(row, 0).data(Qt.ItemDataRole.UserRole))  # type: ignore
         md = QMimeData()
-        md.setData("application/x-subscription-id", str(sub_id).encode())
+        md.setData(
+            "application/x-subscription-id",
+            ",".join(map(str, sub_ids)).encode(),
+        )
         drag = QDrag(self)
         drag.setMimeData(md)
         drag.exec(Qt.DropAction.MoveAction)
@@ -101,13 +143,30 @@ class MainWindow(QMainWindow):
     """
     Главное окно приложения:
     - Две таблицы: активных и архивных подписок
-    - Панель инструментов (добавить, отметить оплату, удалить, статистика, показать/скрыть архив)
-    - Drag & Drop между таблицами
+    - Панель инструментов (добавить, отметить оплату, изменить цену, удалить,
+      в архив/восстановить, категории, история оплат, статистика, график трат,
+      отчёты, перенос старых оплат в архивный файл, показать/скрыть архив)
+    - Фильтр таблиц по категории
+    - Множественное выделение и Drag & Drop между таблицами
+    - Переключение профилей (отдельных баз) и сводный просмотр всех профилей
     - Звуковое оповещение и напоминания
+    - Обслуживание базы в простое (статус в строке состояния)
+    - Режим профилирования памяти по подсистемам
     """
-    def __init__(self, db: Database):
+    def __init__(
+        self,
+        db: Database,
+        backups: BackupManager | None = None,
+        registry: ProfileRegistry | None = None,
+    ):
         super().__init__()
         self.db = db
+        self.backups = backups
+        self.registry = registry
+        self._combined = False  # режим «Все профили» (только просмотр)
+        # Фоновый перенос старых оплат в архив (идёт, пока поток не None)
+        self._archive_thread: QThread | None = None
+        self._archive_worker: _ArchiveWorker | None = None
         # Настраиваем окно
         self.setWindowTitle("Трекер подписок")
         self.setWindowIcon(QIcon(ICON_PATH))  # иконка приложения
@@ -141,20 +200,42 @@ class MainWindow(QMainWindow):
         icons = {
             "Добавить": QStyle.StandardPixmap.SP_FileDialogNewFolder,
             "Отметить оплату": QStyle.StandardPixmap.SP_DialogApplyButton,
+            "Цена": QStyle.StandardPixmap.SP_DialogResetButton,
             "Удалить": QStyle.StandardPixmap.SP_TrashIcon,
+            "В архив": QStyle.StandardPixmap.SP_ArrowRight,
+            "Восстановить": QStyle.StandardPixmap.SP_ArrowLeft,
+            "Категории": QStyle.StandardPixmap.SP_DirLinkIcon,
+            "Дубликаты": QStyle.StandardPixmap.SP_FileDialogToParent,
+            "История": QStyle.StandardPixmap.SP_FileDialogDetailedView,
             "Статистика": QStyle.StandardPixmap.SP_FileDialogContentsView,
+            "График": QStyle.StandardPixmap.SP_FileDialogInfoView,
+            "Отчёты": QStyle.StandardPixmap.SP_FileDialogListView,
+            "Старые оплаты": QStyle.StandardPixmap.SP_DriveHDIcon,
             "Архив": QStyle.StandardPixmap.SP_DirIcon,
         }
         slots = {
             "Добавить": self.add_subscription,
             "Отметить оплату": self.mark_paid,
+            "Цена": self.change_price,
             "Удалить": self.delete_subscription,
+            "В архив": self.archive_selected,
+            "Восстановить": self.restore_selected,
+            "Категории": self.edit_tags,
+            "Дубликаты": self._show_duplicates,
+            "История": self._show_history,
             "Статистика": self._show_stats,
+            "График": self._show_chart,
+            "Отчёты": self._show_reports,
+            "Старые оплаты": self.archive_old_payments,
         }
+        # Действия, доступные только для одного профиля (в сводном режиме отключаются)
+        self._profile_actions: list[QAction] = []
         # Добавляем кнопки на панель
         for text, pix in icons.items():
             icon = style.standardIcon(pix)  # type: ignore
             action = QAction(icon, text, self)  # type: ignore
+            if text != "Статистика" and text in slots:
+                self._profile_actions.append(action)
             if text in slots:
                 action.triggered.connect(slots[text])  # type: ignore
             else:
@@ -163,18 +244,54 @@ class MainWindow(QMainWindow):
                 action.setChecked(True)
                 action.toggled.connect(self._toggle_archive)  # type: ignore
             tb.addAction(action)  # type: ignore
+        # Восстановление из резервной копии (если резервное копирование включено)
+        if backups is not None:
+            action = QAction(
+                style.standardIcon(QStyle.StandardPixmap.SP_BrowserReload),  # type: ignore
+                "Из копии",
+                self,
+            )
+            action.triggered.connect(self.restore_backup)  # type: ignore
+            tb.addAction(action)  # type: ignore
+            self._profile_actions.append(action)
+        # Фильтр по категории: выборка идёт запросом по индексу subscription_tag
+        self.category_combo = QComboBox(self)
+        self.category_combo.currentIndexChanged.connect(self.refresh_tables)  # type: ignore
+        tb.addSeparator()
+        tb.addWidget(self.category_combo)
+        self._reload_categories()
+        # Переключатель профилей (если баз несколько) и сводный просмотр всех профилей
+        if registry is not None and len(registry) > 1:
+            self.profile_combo = QComboBox(self)
+            self.profile_combo.addItems(registry.names() + [ALL_PROFILES])  # type: ignore
+            self.profile_combo.currentTextChanged.connect(self._switch_profile)  # type: ignore
+            tb.addSeparator()
+            tb.addWidget(self.profile_combo)
 
         # Док виджет для архива (отдельное окно-справа)
         self.archiveDock = QDockWidget("Архив", self)
         self.archiveDock.setWidget(self.archive_table)
         self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.archiveDock)
 
-        # Напоминания (запускается проверка и таймер) и стартовый звук
+        # Напоминания (запускается проверка и таймер); стартовый звук играет main()
         self.reminder = Reminder(db, self)
-        sound = QSoundEffect(self)
-        sound.setSource(QUrl.fromLocalFile(SOUND_PATH))
-        sound.setVolume(0.5)
-        sound.play()
+
+        # Обслуживание базы в простое; итог последнего запуска — в строке состояния
+        self.maintenance_label = QLabel(self)
+        self.statusBar().addPermanentWidget(self.maintenance_label)  # type: ignore
+        self.maintenance = MaintenanceScheduler(db, self)
+        self.maintenance.status_changed.connect(self._show_maintenance_status)  # type: ignore
+        self._show_maintenance_status(status_text(db))
+
+        # Индекс похожих названий для подсказок: большую очередь разбирает фоновый поток
+        self.name_index = NameIndexBuilder(db)
+        self.name_index.start()
+
+        # Режим профилирования памяти (SUBTRACKER_MEMORY_PROFILE): замеры после
+        # обновления таблиц и открытия диалогов, превышение бюджетов — в лог
+        self.memory: MemoryProfiler | None = None
+        if profiling_enabled():
+            self.memory = MemoryProfiler(db, (self.active_table, self.archive_table), parent=self)
 
         # Восстановление геометрии и состояния окна из QSettings
         self._restore_settings()
@@ -185,9 +302,74 @@ class MainWindow(QMainWindow):
         """Показать или скрыть окно архива."""
         self.archiveDock.setVisible(visible)
 
+    def _show_maintenance_status(self, text: str):
+        """Строка состояния: итог обслуживания, в подсказке — по каждой задаче."""
+        self.maintenance_label.setText(text)
+        self.maintenance_label.setToolTip(status_details(self.maintenance.db))
+
     def _show_stats(self):
-        """Открыть модальный диалог со статистикой."""
-        StatsDialog(self.db, self).exec()
+        """Открыть модальный диалог со статистикой (в сводном режиме — по всем профилям)."""
+        StatsDialog(self.db, self, registry=self.registry if self._combined else None).exec()
+
+    def _switch_profile(self, name: str):
+        """
+        Переключает окно на базу выбранного профиля
+        или на сводный просмотр всех профилей (без редактирования).
+        """
+        self._combined = name == ALL_PROFILES
+        if not self._combined:
+            self.db = self.registry.database(name)  # type: ignore
+            self.reminder.db = self.db
+            self.maintenance.set_database(self.db)
+            self.name_index.stop()
+            self.name_index = NameIndexBuilder(self.db)
+            self.name_index.start()
+            if self.memory is not None:
+                self.memory.set_database(self.db)
+            if self.backups is not None:
+                self.backups = BackupManager(self.db.db_path)
+        for action in self._profile_actions:
+            action.setEnabled(not self._combined)
+        for tbl in (self.active_table, self.archive_table):
+            tbl.setDragEnabled(not self._combined)
+        # Категории у каждой базы свои; в сводном режиме фильтра нет
+        self.category_combo.setEnabled(not self._combined)
+        self._reload_categories()
+        self.refresh_tables()
+
+    def _reload_categories(self):
+        """Перезаполняет фильтр категорий, сохраняя выбранную, если она осталась."""
+        current = self.category_combo.currentText()
+        self.category_combo.blockSignals(True)
+        self.category_combo.clear()
+        self.category_combo.addItem(ALL_CATEGORIES, None)
+        if not self._combined:
+            for row in self.db.tags():
+                self.category_combo.addItem(row["name"], row["id"])
+        index = self.category_combo.findText(current)
+        self.category_combo.setCurrentIndex(max(index, 0))
+        self.category_combo.blockSignals(False)
+
+    def _show_chart(self):
+        """Открыть график трат."""
+        ChartDialog(self.db, self).exec()
+
+    def _show_reports(self):
+        """Открыть отчёты по истории оплат (считаются в пуле процессов)."""
+        ReportsDialog(self.db, self).exec()
+
+    def _show_duplicates(self):
+        """Открыть группы подписок с похожими названиями."""
+        DuplicatesDialog(self.db, self).exec()
+
+    def _show_history(self):
+        """Открыть историю оплат первой выделенной подписки."""
+        sub_ids = self.active_table.selected_ids() or self.archive_table.selected_ids()
+        if not sub_ids:
+            return
+        rec = self.db.get_subscription(sub_ids[0])
+        if rec:
+            PaymentHistoryDialog(self.db, rec["id"], rec["name"], self).exec()
 
     def refresh_tables(self):
         """
@@ -196,47 +378,60 @@ class MainWindow(QMainWindow):
         """
         self.active_table.setSortingEnabled(False)
         self.archive_table.setSortingEnabled(False)
-        active = self.db.list_subscriptions(active_only=True)
-        all_subs = self.db.list_subscriptions(active_only=False)
+        # Один колоночный снимок на обе таблицы (в сводном режиме — по всем профилям)
+        if self._combined:
+            snap = self.registry.combined_snapshot()  # type: ignore
+        else:
+            snap = self.db.snapshot(tag_id=self.category_combo.currentData())
 
-        def fill(table, rows):  # type: ignore
-            table.setRowCount(len(rows))  # type: ignore
-            for i, row in enumerate(rows):  # type: ignore
-                sid = row["id"]  # unique id подписки   # type: ignore
+        def fill(table, indices):  # type: ignore
+            table.setRowCount(len(indices))  # type: ignore
+            for i, idx in enumerate(indices):  # type: ignore
+                sid = snap.ids[idx]  # unique id подписки
                 # Название подписки
-                name_item = QTableWidgetItem(row["name"])  # type: ignore
+                name_item = QTableWidgetItem(snap.names[idx])
                 name_item.setData(Qt.ItemDataRole.UserRole, sid)
                 name_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
                 table.setItem(i, 0, name_item)  # type: ignore
                 # Сумма к оплате
-                cost = NumericItem(f"{row['cost']:.2f}")
+                cost = NumericItem(f"{snap.costs[idx]:.2f}")
                 cost.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
                 table.setItem(i, 1, cost)  # type: ignore
                 # Период платежа на русском
-                pr = QTableWidgetItem(PERIOD_RU.get(row["period"], row["period"]))  # type: ignore
+                period = snap.periods[idx]
+                pr = QTableWidgetItem(PERIOD_RU.get(period, period))
                 pr.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
                 table.setItem(i, 2, pr)  # type: ignore
                 # Дата следующего платежа
-                try:
-                    d = dt.datetime.strptime(row["next_due"], "%Y-%m-%d").date()  # type: ignore
-                    ds = d.strftime("%d.%m.%Y")
-                except Exception:
-                    ds = row["next_due"]  # type: ignore
-                date_item = DateItem(ds)  # type: ignore
+                d = snap.next_due(idx)
+                date_item = DateItem(d.strftime("%d.%m.%Y") if d else "")
                 date_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
                 table.setItem(i, 3, date_item)  # type: ignore
-                # Заметки
-                notes = row["notes"] or ""  # type: ignore
-                notes_item = QTableWidgetItem(notes)  # type: ignore
+                # Сводка оплат — готовые колонки снимка (payment_summary), без запросов на строку
+                last = snap.last_paid_date(idx)
+                summary = [
+                    DateItem(last.strftime("%d.%m.%Y") if last else ""),
+                    NumericItem(f"{snap.paid_total[idx]:.2f}"),
+                    NumericItem(str(snap.paid_count[idx])),
+                ]
+                for col, item in enumerate(summary, start=4):
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                    table.setItem(i, col, item)  # type: ignore
+                # Заметки: превью, полный текст — в подсказке по запросу
+                # (в сводном режиме id разных профилей пересекаются, там только превью)
+                loader = None if self._combined else partial(self.db.get_notes, sid)
+                notes_item = NotesItem(snap.notes.get(idx, ""), loader)
                 notes_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                table.setItem(i, 4, notes_item)  # type: ignore
+                table.setItem(i, 7, notes_item)  # type: ignore
 
         # Заполняем активные и включаем сортировку
-        fill(self.active_table, active)
+        fill(self.active_table, snap.indices(active=True))
         self.active_table.setSortingEnabled(True)
         # Заполняем архивные (is_active=False) и включаем сортировку
-        fill(self.archive_table, [r for r in all_subs if not r["is_active"]])
+        fill(self.archive_table, snap.indices(active=False))
         self.archive_table.setSortingEnabled(True)
+        if self.memory is not None:
+            self.memory.sample("refresh_tables")
 
     def _dragEnterEvent(self, e):  # type: ignore
         """Разрешает заход дропа, если формат mime соответствует подписке."""
@@ -254,18 +449,17 @@ class MainWindow(QMainWindow):
 
     def _dropEvent(self, e):  # type: ignore
         """
-        Обработка drop: смена флага is_active в БД и обновление таблиц.
+        Обработка drop: смена флага is_active у всех перенесённых подписок
+        одним запросом и однократное обновление таблиц.
         """
         raw = e.mimeData().data("application/x-subscription-id")  # type: ignore
         try:
-            sid = int(bytes(raw).decode())  # type: ignore
+            sub_ids = [int(x) for x in bytes(raw).decode().split(",")]  # type: ignore
         except Exception:
             return e.ignore()  # type: ignore
         # новая активность: 0 — из активных в архив, 1 — наоборот
-        new_state = 0 if e.source() is self.active_table else 1  # type: ignore
-        conn = self.db.connection()
-        conn.execute("UPDATE subscription SET is_active=? WHERE id=?", (new_state, sid))
-        conn.commit()
+        new_state = e.source() is not self.active_table  # type: ignore
+        self.db.set_active_many(sub_ids, active=new_state)
         self.refresh_tables()
         e.acceptProposedAction()  # type: ignore
 
@@ -275,68 +469,169 @@ class MainWindow(QMainWindow):
         Возвращает строку ISO (YYYY-MM-DD).
         """
         cur = dt.datetime.strptime(current, "%Y-%m-%d").date()
-        if period == "daily":
-            nd = cur + dt.timedelta(days=1)
-        elif period == "weekly":
-            nd = cur + dt.timedelta(weeks=1)
-        elif period == "monthly":
-            # Учёт конца месяца
-            y = cur.year + (cur.month // 12)
-            m = cur.month % 12 + 1
-            d = min(cur.day, calendar.monthrange(y, m)[1])
-            nd = dt.date(y, m, d)
-        elif period == "yearly":
-            try:
-                nd = dt.date(cur.year + 1, cur.month, cur.day)
-            except ValueError:
-                # Переход через 29 февраля
-                nd = dt.date(cur.year + 1, 2, 28)
-        else:
-            nd = cur
-        return nd.isoformat()
+        # Учёт конца месяца и 29 февраля — в add_period
+        return add_period(cur, period).isoformat()
 
     def mark_paid(self):
         """
         Обработчик кнопки "Отметить оплату".
-        Добавляет запись в payment, обновляет next_due.
+        Для всех выделенных активных подписок добавляет записи в payment
+        и сдвигает next_due — одной транзакцией.
         """
-        row = self.active_table.currentRow()
-        if row < 0:
+        sub_ids = self.active_table.selected_ids()
+        if not sub_ids:
             return
-        sid = int(self.active_table.item(row, 0).data(Qt.ItemDataRole.UserRole))  # type: ignore
-        rec = self.db.get_subscription(sid)
-        if rec:
-            # сохраняем платеж
-            self.db.add_payment(sid, dt.date.today(), rec["cost"])
-            # вычисляем новую дату
-            new_due = self._compute_next_due(rec["next_due"], rec["period"])
-            conn = self.db.connection()
-            conn.execute("UPDATE subscription SET next_due=? WHERE id=?", (new_due, sid))
-            conn.commit()
+        snap = self.db.snapshot()
+        today = dt.date.today()
+        dues = [
+            (sid, idx, snap.next_due(idx) or today)
+            for sid, idx in snap.positions(sub_ids).items()
+        ]
+        # Оплачивается платёж за дату next_due — по цене, действовавшей на неё
+        costs = self.db.costs_as_of((sid, due) for sid, _, due in dues)
+        entries = []
+        for (sid, idx, due), cost in zip(dues, costs):
+            new_due = self._compute_next_due(due.isoformat(), snap.periods[idx])
+            entries.append((sid, snap.costs[idx] if cost is None else cost, new_due))
+        if entries:
+            self.db.mark_paid_many(entries, today)
+            self.refresh_tables()
+
+    def change_price(self):
+        """Меняет цену первой выделенной подписки с выбранной даты (старые цены сохраняются)."""
+        sub_ids = self.active_table.selected_ids() or self.archive_table.selected_ids()
+        if not sub_ids:
+            return
+        rec = self.db.get_subscription(sub_ids[0], columns=("id", "name", "cost"))
+        if rec is None:
+            return
+        dlg = PriceChangeDialog(rec["name"], rec["cost"], self)
+        if dlg.exec():
+            cost, effective = dlg.get_data()
+            self.db.set_cost(rec["id"], cost, effective)
+            self.refresh_tables()
+
+    def archive_selected(self):
+        """Переносит выделенные активные подписки в архив."""
+        if sub_ids := self.active_table.selected_ids():
+            self.db.set_active_many(sub_ids, active=False)
+            self.refresh_tables()
+
+    def restore_selected(self):
+        """Восстанавливает выделенные подписки из архива."""
+        if sub_ids := self.archive_table.selected_ids():
+            self.db.set_active_many(sub_ids, active=True)
             self.refresh_tables()
 
     def add_subscription(self):
         """
         Открывает SubscriptionDialog, получает данные и сохраняет подписку.
         """
-        dlg = SubscriptionDialog(self)
+        dlg = SubscriptionDialog(self, db=self.db)
         if dlg.exec() and (data := dlg.get_data()) and data[0]:
             self.db.add_subscription(*data)
+            if data[5]:
+                self._reload_categories()
+            self.refresh_tables()
+
+    def edit_tags(self):
+        """Задаёт категории всем выделенным подпискам (через запятую)."""
+        sub_ids = self.active_table.selected_ids() + self.archive_table.selected_ids()
+        if not sub_ids:
+            return
+        text, ok = QInputDialog.getText(
+            self,
+            "Категории",
+            "Категории через запятую:",
+            text=", ".join(self.db.tags_of(sub_ids[0])),
+        )
+        if ok:
+            self.db.set_tags(sub_ids, split_tags(text))
+            self._reload_categories()
             self.refresh_tables()
 
     def delete_subscription(self):
         """
-        Открывает DeleteConfirmDialog, по подтверждению удаляет подписку из БД.
+        Открывает DeleteConfirmDialog, по подтверждению удаляет
+        все выделенные подписки (активные и архивные) из БД.
         """
-        row = self.active_table.currentRow()
-        if row < 0:
+        sub_ids = self.active_table.selected_ids() + self.archive_table.selected_ids()
+        if not sub_ids:
             return
-        sid = int(self.active_table.item(row, 0).data(Qt.ItemDataRole.UserRole))  # type: ignore
-        dlg = DeleteConfirmDialog(self)
+        dlg = DeleteConfirmDialog(self, count=len(sub_ids))
         if dlg.exec():
-            conn = self.db.connection()
-            conn.execute("DELETE FROM subscription WHERE id=?", (sid,))
-            conn.commit()
+            self.db.delete_subscriptions(sub_ids)
+            self.refresh_tables()
+
+    def archive_old_payments(self):
+        """
+        Переносит оплаты старше года в архивный файл рядом с базой.
+        Основной файл остаётся небольшим, а статистика за всё время
+        по-прежнему учитывает архив. Перенос идёт пакетами в фоновом потоке,
+        окно остаётся отзывчивым.
+        """
+        if self._archive_thread is not None:
+            return
+        cutoff = dt.date.today() - dt.timedelta(days=365)
+        answer = QMessageBox.question(
+            self,
+            "Архив оплат",
+            f"Перенести оплаты до {cutoff.strftime('%d.%m.%Y')} в архивный файл?",
+        )
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        # In-memory база не видна другим соединениям — тогда переносим синхронно
+        if str(self.db.db_path) == ":memory:":
+            self._archive_finished(self.db.archive_payments(cutoff))
+            return
+        self._archive_thread = QThread(self)
+        self._archive_worker = _ArchiveWorker(self.db, cutoff)
+        self._archive_worker.moveToThread(self._archive_thread)
+        self._archive_thread.started.connect(self._archive_worker.run)  # type: ignore
+        self._archive_worker.finished.connect(self._archive_finished)  # type: ignore
+        self._archive_worker.failed.connect(self._archive_failed)  # type: ignore
+        self._archive_thread.start()
+        self.statusBar().showMessage("Перенос оплат в архив…")  # type: ignore
+
+    def _stop_archive_thread(self) -> None:
+        """Дожидается окончания фонового переноса и освобождает поток."""
+        if self._archive_thread is None:
+            return
+        self._archive_thread.quit()
+        self._archive_thread.wait()
+        self._archive_thread = None
+        self._archive_worker = None
+
+    def _archive_finished(self, moved: int) -> None:
+        self._stop_archive_thread()
+        self.statusBar().clearMessage()  # type: ignore
+        self.refresh_tables()
+        QMessageBox.information(self, "Архив оплат", f"Перенесено оплат: {moved}")
+
+    def _archive_failed(self, error: str) -> None:
+        self._stop_archive_thread()
+        self.statusBar().clearMessage()  # type: ignore
+        QMessageBox.warning(self, "Архив оплат", f"Не удалось перенести оплаты: {error}")
+
+    def restore_backup(self):
+        """Восстанавливает базу из выбранной резервной копии и обновляет таблицы."""
+        if self.backups is None:
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Восстановить из копии",
+            str(self.backups.backup_dir),
+            "SQLite (*.db)",
+        )
+        if not path:
+            return
+        answer = QMessageBox.question(
+            self,
+            "Восстановление",
+            "Текущие данные будут заменены содержимым копии. Продолжить?",
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.backups.restore(path, self.db)
             self.refresh_tables()
 
     def _restore_settings(self):
@@ -353,6 +648,8 @@ class MainWindow(QMainWindow):
         """
         Сохраняет положение и состояние окна при закрытии.
         """
+        self._stop_archive_thread()
+        self.name_index.stop()
         st = QSettings("MyCompany", "SubscriptionTracker")
         st.setValue("geometry", self.saveGeometry())
         st.setValue("windowState", self.saveState())
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import datetime as dt
+import threading
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtWidgets import (
+    QDialog,
+    QHeaderView,
+    QLabel,
+    QProgressBar,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from src.db import Database
+from src.reports import Report, ReportCancelled, run_report
+from src.ui.items import NumericItem
+
+
+class ReportRunner(QObject):
+    """
+    Запускает run_report в фоновом потоке (сам отчёт считается в пуле процессов)
+    и пересылает прогресс и результат в GUI-поток сигналами.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, db: Database, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self._db = db
+        self._cancel = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="report-runner", daemon=True)
+        self._thread.start()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def _run(self) -> None:
+        # Отдельное соединение: основное принадлежит GUI-потоку
+        reader = self._db.open_reader()
+        try:
+            report = run_report(reader, progress=self.progress.emit, cancel=self._cancel)
+        except ReportCancelled:
+            self.cancelled.emit()
+        except Exception as exc:
+            self.failed.emit(str(exc))
+        else:
+            self.finished.emit(report)
+        finally:
+            reader.close()
+
+
+class ReportsDialog(QDialog):
+    """Диалог отчётов: траты год к году, повышения цен, регулярность и пропуски оплат."""
+    def __init__(self, db: Database, parent=None):  # type: ignore
+        super().__init__(parent)  # type: ignore
+        self.setObjectName("ReportsDialog")
+        self.setWindowTitle("Отчёты по оплатам")
+        self.resize(900, 460)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(12)
+
+        self.status_label = QLabel("Подготовка отчёта…", self)
+        layout.addWidget(self.status_label)
+        self.progress_bar = QProgressBar(self)
+        layout.addWidget(self.progress_bar)
+
+        year = dt.date.today().year
+        self.table = QTableWidget(0, 8, self)
+        self.table.setHorizontalHeaderLabels([  # type: ignore
+            "Подписка",
+            f"Траты {year - 1}",
+            f"Траты {year}",
+            "Изменение, %",
+            "Повышений цены",
+            "Пропусков",
+            "Пропущено на сумму",
+            "Разброс интервала, дн.",
+        ])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)  # type: ignore
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.button = QPushButton("Отменить", self)
+        self.button.clicked.connect(self._on_button)  # type: ignore
+        layout.addWidget(self.button, alignment=Qt.AlignmentFlag.AlignRight)
+
+        self._running = True
+        self.runner = ReportRunner(db)
+        self.runner.progress.connect(self._on_progress)  # type: ignore
+        self.runner.finished.connect(self._on_finished)  # type: ignore
+        self.runner.cancelled.connect(lambda: self._stop("Отчёт отменён"))  # type: ignore
+        self.runner.failed.connect(lambda msg: self._stop(f"Ошибка: {msg}"))  # type: ignore
+        self.runner.start()
+
+    def _on_button(self) -> None:
+        """Пока отчёт считается — отмена, после — закрытие."""
+        if self._running:
+            self.status_label.setText("Отмена…")
+            self.runner.cancel()
+        else:
+            self.accept()
+
+    def _on_progress(self, done: int, total: int) -> None:
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+        self.status_label.setText(f"Обработано частей: {done} из {total}")
+
+    def _stop(self, text: str) -> None:
+        self._running = False
+        self.status_label.setText(text)
+        self.button.setText("Закрыть")
+
+    def _on_finished(self, report: Report) -> None:
+        """Заполняет таблицу результатами отчёта."""
+        self._stop(f"Подписок в отчёте: {len(report.subscriptions)}")
+        year = dt.date.today().year
+        reps = sorted(report.subscriptions.values(), key=lambda r: r.name.lower())
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(reps))
+        for i, rep in enumerate(reps):
+            prev = rep.spend_by_year.get(year - 1, 0.0)
+            cur = rep.spend_by_year.get(year, 0.0)
+            change = f"{(cur - prev) / prev * 100:.1f}" if prev else ""
+            stdev = f"{rep.gap_stdev:.1f}" if rep.gap_stdev is not None else ""
+            cells = [
+                QTableWidgetItem(rep.name),
+                NumericItem(f"{prev:.2f}"),
+                NumericItem(f"{cur:.2f}"),
+                NumericItem(change),
+                NumericItem(str(len(rep.price_increases))),
+                NumericItem(str(rep.missed)),
+                NumericItem(f"{rep.missed_cost:.2f}"),
+                NumericItem(stdev),
+            ]
+            for col, item in enumerate(cells):
+                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                self.table.setItem(i, col, item)
+        self.table.setSortingEnabled(True)
+
+    def done(self, result: int) -> None:  # type: ignore
+        """При закрытии во время расчёта отменяем отчёт."""
+        self.runner.cancel()
+        super().done(result)
@@ -1,4 +1,5 @@
 import datetime as dt
+import html
 
 from PyQt6.QtWidgets import (
     QDialog,
@@ -11,20 +12,25 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtGui import QRegion, QPainterPath
 from PyQt6.QtCore import Qt
 
+from src.db import FORECAST_DAYS
+
+# Сколько категорий с наибольшими тратами показывать
+CATEGORY_ROWS = 5
+
 
 class StatsDialog(QDialog):
     """
     Модальный беззаголовочный диалог для отображения статистики по подпискам.
     Поддерживает перетаскивание за любую область и скруглённые углы.
     """
-    def __init__(self, db, parent=None):  # type: ignore
+    def __init__(self, db, parent=None, registry=None):  # type: ignore
         super().__init__(parent)  # type: ignore
         # Уникальный идентификатор для QSS стилизации
         self.setObjectName("StatsDialog")
         # Скрыть стандартный заголовок ОС
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         self.setModal(True)  # Сделать окно модальным
-        self.setFixedSize(420, 300)  # Фиксированный размер
+        self.setFixedSize(420, 330)  # Фиксированный размер
 
         # Центральный виджет для применения отступов и скруглений
         central = QWidget(self)
@@ -51,16 +57,18 @@ class StatsDialog(QDialog):
         vbox.addLayout(header_layout)
 
         # ===== Сбор метрик =====
-        # Количество активных подписок
-        n_subs = self._count_active_subs(db)  # type: ignore
-        # Количество архивных подписок
-        archived = self._count_archived_subs(db)  # type: ignore
-        # Общие траты за всё время
-        total = self._total_spent(db)  # type: ignore
-        # Траты за последний год
-        year = self._year_spent(db)  # type: ignore
-        # Траты за текущий месяц
-        month = self._month_spent(db)  # type: ignore
+        # По всем профилям — параллельно по файлам, иначе по текущей базе
+        if registry is not None and len(registry) > 1:
+            header.setText("Статистика (все профили)")
+            summary = registry.aggregate_stats()  # type: ignore
+        else:
+            summary = db.stats_summary()  # type: ignore
+        n_subs = summary.active  # type: ignore
+        archived = summary.archived  # type: ignore
+        total = summary.total  # type: ignore
+        year = summary.year  # type: ignore
+        month = summary.month  # type: ignore
+        forecast = summary.forecast  # type: ignore
 
         # Формируем HTML-текст с данными
         stats_label = QLabel(
@@ -68,12 +76,32 @@ class StatsDialog(QDialog):
             f"<b>В архиве:</b> {archived}<br>"
             f"<b>Трат всего:</b> {total:.2f} руб.<br>"
             f"<b>Трат за год:</b> {year:.2f} руб.<br>"
-            f"<b>Трат за месяц:</b> {month:.2f} руб."
+            f"<b>Трат за месяц:</b> {month:.2f} руб.<br>"
+            f"<b>Прогноз на {FORECAST_DAYS} дней:</b> {forecast:.2f} руб."
         )
         stats_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         stats_label.setStyleSheet("font-size: 16px;")
         vbox.addWidget(stats_label)
 
+        # Траты по категориям за год (категории у каждой базы свои — только для одного профиля)
+        categories = []
+        if registry is None or len(registry) <= 1:
+            today = dt.date.today()
+            categories = db.category_spend(today - dt.timedelta(days=365), today + dt.timedelta(days=1))  # type: ignore
+        if categories:
+            top = categories[:CATEGORY_ROWS]
+            # Метка в rich text: названия категорий вводит пользователь, их экранируем
+            cat_label = QLabel(
+                "<b>По категориям за год:</b><br>"
+                + "<br>".join(
+                    f"{html.escape(name) if name else 'Без категории'}: {spent:.2f} руб." for name, spent in top
+                )
+            )
+            cat_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            cat_label.setStyleSheet("font-size: 14px;")
+            vbox.addWidget(cat_label)
+            self.setFixedSize(420, 360 + 20 * len(top))
+
         # Кнопка подтверждения (OK)
         ok_btn = QPushButton("OK")
         ok_btn.setObjectName("StatsOkBtn")
@@ -81,41 +109,6 @@ class StatsDialog(QDialog):
         ok_btn.clicked.connect(self.accept)  # Завершить диалог  # type: ignore
         vbox.addWidget(ok_btn, alignment=Qt.AlignmentFlag.AlignHCenter)
 
-    def _count_active_subs(self, db):  # type: ignore
-        """Возвращает число подписок с is_active=True."""
-        rows = db.list_subscriptions(active_only=True)  # type: ignore
-        return len(rows) if rows else 0  # type: ignore
-
-    def _count_archived_subs(self, db):  # type: ignore
-        """Возвращает число подписок с is_active=False."""
-        rows = db.list_subscriptions(active_only=False)  # type: ignore
-        return len([r for r in rows if not r["is_active"]]) if rows else 0  # type: ignore
-
-    def _total_spent(self, db):  # type: ignore
-        """Сумма всех платежей за всё время."""
-        cur = db.connection().execute("SELECT SUM(amount) FROM payment")  # type: ignore
-        val = cur.fetchone()[0]  # type: ignore
-        return val if val else 0  # type: ignore
-
-    def _year_spent(self, db):  # type: ignore
-        """Сумма платежей за последние 365 дней."""
-        start = (dt.date.today() - dt.timedelta(days=365)).isoformat()
-        cur = db.connection().execute( # type: ignore
-            "SELECT SUM(amount) FROM payment WHERE date_paid >= ?", (start,)
-        )
-        val = cur.fetchone()[0]  # type: ignore
-        return val if val else 0  # type: ignore
-
-    def _month_spent(self, db):  # type: ignore
-        """Сумма платежей с начала текущего месяца."""
-        today = dt.date.today()
-        start = today.replace(day=1).isoformat()
-        cur = db.connection().execute( # type: ignore
-            "SELECT SUM(amount) FROM payment WHERE date_paid >= ?", (start,)
-        )
-        val = cur.fetchone()[0]  # type: ignore
-        return val if val else 0  # type: ignore
-
     def resizeEvent(self, event):  # type: ignore
         """
         При изменении размера обновляем маску для скругления углов.
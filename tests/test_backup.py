@@ -0,0 +1,100 @@
+import datetime as dt
+import sqlite3
+import threading
+
+from src.backup import BackupManager
+from src.db import connect
+
+
+def test_backup_prune_and_restore(tmp_path):  # type: ignore
+    """
+    Проверяет снимки, правила хранения и восстановление.
+    Шаги:
+    1. Создаём базу с подпиской и делаем снимки за несколько дней.
+    2. Проверяем, что остались только последние и по одному за день.
+    3. Меняем данные и восстанавливаем их из последнего снимка.
+    """
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        db.add_subscription("Keep", 100, "monthly", dt.date.today())
+        mgr = BackupManager(db.db_path, tmp_path / "bk", pages_per_step=1,
+                            step_sleep=0, keep_last=2, keep_daily=3)
+        start = dt.datetime(2025, 1, 1, 12, 0, 0)
+        for day in range(5):
+            for hour in range(3):
+                mgr.backup(now=start + dt.timedelta(days=day, hours=hour))
+
+        names = [p.name for p in mgr.snapshots()]
+        # 2 последних снимка + последний снимок за 3 последних дня
+        assert names == [
+            "subs-20250103-140000.db",
+            "subs-20250104-140000.db",
+            "subs-20250105-130000.db",
+            "subs-20250105-140000.db",
+        ]
+
+        db.delete_subscriptions([r["id"] for r in db.list_subscriptions()])
+        assert len(db.snapshot()) == 0
+        mgr.restore(mgr.snapshots()[-1], db)
+        assert [db.snapshot().names[i] for i in range(len(db.snapshot()))] == ["Keep"]
+
+
+def test_backup_does_not_block_writes(tmp_path):  # type: ignore
+    """
+    Проверяет, что запись в базу идёт во время пошагового копирования.
+    Шаги:
+    1. Наполняем базу, запускаем копирование маленькими шагами в потоке.
+    2. Параллельно добавляем оплаты через основное соединение.
+    3. Все записи проходят без ошибок блокировки, снимок целостен.
+    """
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        sid = db.add_subscription("Busy", 1, "daily", dt.date.today())
+        conn = db.connection()
+        conn.executemany(
+            "INSERT INTO payment (subscription_id, date_paid, amount, comment) VALUES (?, ?, ?, ?)",
+            [(sid, "2024-01-01", 1, "x" * 200)] * 5000,
+        )
+        conn.commit()
+        mgr = BackupManager(db.db_path, tmp_path / "bk", pages_per_step=8, step_sleep=0.001)
+        result = []
+        worker = threading.Thread(target=lambda: result.append(mgr.backup()))
+        worker.start()
+        for _ in range(50):
+            db.add_payment(sid, dt.date.today(), 1)
+        worker.join()
+
+        snap = sqlite3.connect(result[0])
+        assert snap.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert snap.execute("SELECT COUNT(*) FROM payment").fetchone()[0] >= 5000
+        snap.close()
+
+
+def test_backup_completes_under_constant_writes(tmp_path, monkeypatch):  # type: ignore
+    """
+    Запись после каждого шага копирования не перезапускает копию:
+    она завершается за число шагов по размеру базы и содержит данные на момент начала.
+    """
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        sid = db.add_subscription("Busy", 1, "daily", dt.date.today())
+        conn = db.connection()
+        conn.executemany(
+            "INSERT INTO payment (subscription_id, date_paid, amount, comment) VALUES (?, ?, ?, ?)",
+            [(sid, "2024-01-01", 1, "x" * 200)] * 5000,
+        )
+        conn.commit()
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        mgr = BackupManager(db.db_path, tmp_path / "bk", pages_per_step=8, step_sleep=0)
+        steps = []
+
+        def write_each_step(status, remaining, total):  # type: ignore
+            steps.append(remaining)
+            assert len(steps) <= pages, "копирование перезапускается"
+            db.add_payment(sid, dt.date.today(), 1)
+
+        monkeypatch.setattr(mgr, "_pause", write_each_step)
+        path = mgr.backup()
+        assert steps[-1] == 0
+
+        snap = sqlite3.connect(path)
+        assert snap.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert snap.execute("SELECT COUNT(*) FROM payment").fetchone()[0] == 5000
+        snap.close()
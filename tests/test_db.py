@@ -1,4 +1,8 @@
 import datetime as dt  # модуль для работы с датами
+import sqlite3
+
+import pytest
+
 from src.db import connect  # контекстный менеджер для подключения к БД
 
 
@@ -24,3 +28,451 @@ def test_add_subscription_to_db(tmp_path):  # type: ignore
         assert sub["name"] == "Test"
         assert sub["cost"] == 100
         assert sub["period"] == "monthly"
+
+
+def test_snapshot_columns_and_cache(db, today):  # type: ignore
+    """
+    Проверяет колоночный снимок подписок.
+    Шаги:
+    1. Добавляем активную подписку и архивную подписку.
+    2. Строим снимок и проверяем колонки и счётчики.
+    3. Повторный вызов без изменений возвращает тот же объект,
+       а после изменения данных снимок перестраивается.
+    """
+    a = db.add_subscription("Active", 100, "monthly", today, "note")
+    b = db.add_subscription("Archived", 50.5, "yearly", today + dt.timedelta(days=10))
+    conn = db.connection()
+    conn.execute("UPDATE subscription SET is_active=0 WHERE id=?", (b,))
+    conn.commit()
+
+    snap = db.snapshot()
+    assert len(snap) == 2
+    assert snap.count(active=True) == 1 and snap.count(active=False) == 1
+    (i,) = snap.indices(active=True)
+    assert snap.ids[i] == a and snap.names[i] == "Active"
+    assert snap.next_due(i) == today
+    assert snap.notes == {i: "note"}
+    assert snap.due_within(3, today=today) == [i]
+    assert snap.positions([b])[b] == snap.indices(active=False)[0]
+
+    assert db.snapshot() is snap
+    db.add_subscription("New", 1, "daily", today)
+    assert len(db.snapshot()) == 3
+
+
+def test_projection_and_notes_preview(tmp_path, today):  # type: ignore
+    """
+    Проверяет выборки без полного текста заметок.
+    Шаги:
+    1. Добавляем подписку с длинной заметкой: в таблицах хранится только превью.
+    2. Полный текст читается отдельно через get_notes(), журнал не засоряется.
+    3. Снимок и напоминания читаются из покрывающего индекса.
+    4. База старой версии без колонки превью мигрирует при подключении.
+    """
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        long_note = "заметка " * 50
+        sid = db.add_subscription("Long", 10, "monthly", today, long_note)
+        row = db.get_subscription(sid)
+        assert "notes" not in row.keys()
+        assert row["notes_preview"] == long_note[:60] + "…"
+        assert db.get_notes(sid) == long_note
+        assert db.get_subscription(sid, columns=("notes",))["notes"] == long_note
+        with pytest.raises(ValueError):
+            db.list_subscriptions(columns=("id", "notes; DROP TABLE payment"))
+        assert db.connection().execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 1
+
+        plan = " ".join(r[3] for r in db.connection().execute(
+            "EXPLAIN QUERY PLAN SELECT id, name, cost, period, next_due, is_active, notes_preview "
+            "FROM subscription ORDER BY is_active DESC, next_due"
+        ))
+        assert "COVERING INDEX ix_subscription_list" in plan
+        assert db.snapshot().notes == {0: long_note[:60] + "…"}
+
+    old = tmp_path / "old.db"
+    cx = sqlite3.connect(old)
+    cx.executescript(
+        """
+        CREATE TABLE subscription (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+            cost REAL NOT NULL, period TEXT NOT NULL, next_due DATE NOT NULL, notes TEXT,
+            is_active INTEGER NOT NULL DEFAULT 1);
+        INSERT INTO subscription (name, cost, period, next_due, notes)
+            VALUES ('Old', 1, 'daily', '2024-01-01', 'старая заметка');
+        """
+    )
+    cx.close()
+    with connect(old) as db:  # type: ignore
+        assert db.list_subscriptions()[0]["notes_preview"] == "старая заметка"
+
+
+def test_price_history_as_of(db, today):  # type: ignore
+    """
+    Проверяет историю цен и выборку «цена на дату».
+    Шаги:
+    1. Меняем цену с прошлой даты через set_cost() и напрямую через UPDATE.
+    2. Пакетно запрашиваем цены на разные даты — ответ по действовавшей версии.
+    3. Прогноз учитывает просроченный платёж по старой цене.
+    4. Удаление подписки удаляет и версии цен, и их индекс.
+    """
+    sid = db.add_subscription("Price", 100, "monthly", today)
+    db.set_cost(sid, 150, today - dt.timedelta(days=30))
+    assert [r["cost"] for r in db.price_history(sid)] == [100, 150]
+    assert db.get_subscription(sid)["cost"] == 150
+    conn = db.connection()
+    conn.execute("UPDATE subscription SET cost=200 WHERE id=?", (sid,))
+    conn.commit()
+    assert db.costs_as_of([
+        (sid, today - dt.timedelta(days=31)),
+        (sid, today - dt.timedelta(days=30)),
+        (sid, today - dt.timedelta(days=1)),
+        (sid, today),
+        (sid + 1, today),
+    ]) == [100, 150, 150, 200, None]
+    with pytest.raises(ValueError):
+        db.set_cost(sid, 300, today + dt.timedelta(days=1))
+
+    plan = " ".join(r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN WITH q(k, sid, day) AS (SELECT key, value ->> 0, value ->> 1 "
+        "FROM json_each('[]')) SELECT q.k, r.cost FROM q CROSS JOIN price_range AS r "
+        "ON r.sub_lo <= q.sid AND r.sub_hi >= q.sid AND r.day_lo <= q.day AND r.day_hi >= q.day"
+    ))
+    assert "INDEX 2:B0D1B2D3" in plan  # поиск по индексу R*Tree по всем четырём границам
+
+    overdue = db.add_subscription("Overdue", 10, "monthly", today - dt.timedelta(days=40))
+    db.set_cost(overdue, 20, today - dt.timedelta(days=20))
+    db.set_active_many([sid], active=False)
+    assert db.forecast(today, today) == 10 + 20
+
+    db.delete_subscriptions([sid, overdue])
+    assert conn.execute("SELECT COUNT(*) FROM price_range").fetchone()[0] == 0
+
+
+def test_set_cost_date_source_and_backfill(tmp_path, monkeypatch):  # type: ignore
+    """
+    Проверяет, что set_cost и триггер истории цен не спорят о дате:
+    версия, датированная приложением (здесь — «завтра» относительно часов SQLite,
+    как бывает около полуночи), не перезаписывается триггером.
+    Досоздание истории для старых баз выполняется один раз.
+    """
+    import types
+    import src.db
+
+    real_today = dt.date.today()
+
+    class _Tomorrow(dt.date):
+        @classmethod
+        def today(cls):  # type: ignore
+            return real_today + dt.timedelta(days=1)
+
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        sid = db.add_subscription("Price", 100, "monthly", real_today)
+        monkeypatch.setattr(src.db, "dt", types.SimpleNamespace(
+            date=_Tomorrow, timedelta=dt.timedelta, datetime=dt.datetime,
+        ))
+        db.set_cost(sid, 150)
+        monkeypatch.undo()
+        rows = db.price_history(sid)
+        assert [(r["valid_from"], r["cost"]) for r in rows] == [
+            ("0001-01-01", 100),
+            ((real_today + dt.timedelta(days=1)).isoformat(), 150),
+        ]
+
+        conn = db.connection()
+        with conn:
+            conn.execute("DELETE FROM price_history WHERE subscription_id=?", (sid,))
+    # Флаг уже стоит — при подключении подписки не просматриваются
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        assert db.price_history(sid) == []
+        db.connection().execute("DELETE FROM app_meta WHERE key='price_history_built'")
+        db.connection().commit()
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        assert [r["cost"] for r in db.price_history(sid)] == [150]
+
+
+def test_tags_and_category_spend(db, today):  # type: ignore
+    """
+    Проверяет категории подписок.
+    Шаги:
+    1. Добавляем подписки с тегами (регистр не важен, в том числе для кириллицы).
+    2. Траты по категориям за период считаются одним GROUP BY по индексам.
+    3. Снимок категории содержит только её подписки; лишние теги удаляются.
+    """
+    a = db.add_subscription("A", 1, "monthly", today, tags=["Видео", "Музыка"])
+    b = db.add_subscription("B", 2, "monthly", today, tags=["видео"])
+    c = db.add_subscription("C", 3, "monthly", today)
+    for sid, amount in ((a, 10), (b, 20), (c, 30)):
+        db.add_payment(sid, today, amount)
+    db.add_payment(a, today - dt.timedelta(days=400), 99)  # вне периода
+
+    assert [r["name"] for r in db.tags()] == ["Видео", "Музыка"]
+    assert db.tags_of(b) == ["Видео"]
+    spend = db.category_spend(today - dt.timedelta(days=30), today + dt.timedelta(days=1))
+    assert spend == [(None, 30), ("Видео", 30), ("Музыка", 10)]
+    plan = " ".join(r[3] for r in db.connection().execute(
+        "EXPLAIN QUERY PLAN SELECT st.tag_id, SUM(p.amount) FROM payment AS p "
+        "LEFT JOIN subscription_tag AS st ON st.subscription_id = p.subscription_id "
+        "WHERE p.date_paid >= '2020-01-01' AND p.date_paid < '2030-01-01' GROUP BY st.tag_id"
+    ))
+    assert "USING INDEX ix_payment_date" in plan and "st USING PRIMARY KEY" in plan
+
+    video = db.tags()[0]["id"]
+    assert sorted(db.snapshot(tag_id=video).names) == ["A", "B"]
+    db.set_tags([a, b], ["Кино"])
+    assert [r["name"] for r in db.tags()] == ["Кино"]
+    assert len(db.snapshot(tag_id=video)) == 0
+
+
+def test_bulk_operations_single_transaction(db, today):  # type: ignore
+    """
+    Проверяет массовые операции: архивирование, оплату и удаление.
+    Шаги:
+    1. Добавляем три подписки.
+    2. Архивируем две из них одним вызовом и восстанавливаем одну.
+    3. Отмечаем оплату двух подписок и проверяем payment и next_due.
+    4. Удаляем две подписки и проверяем, что осталась одна.
+    """
+    ids = [db.add_subscription(f"S{i}", 10 * (i + 1), "monthly", today) for i in range(3)]
+    assert db.set_active_many(ids[:2], active=False) == 2
+    db.set_active_many(ids[:1], active=True)
+    assert db.snapshot().count(active=False) == 1
+
+    new_due = (today + dt.timedelta(days=30)).isoformat()
+    db.mark_paid_many([(ids[0], 10.0, new_due), (ids[2], 30.0, new_due)], today)
+    conn = db.connection()
+    assert conn.execute("SELECT COUNT(*), SUM(amount) FROM payment").fetchone()[:] == (2, 40.0)
+    assert db.get_subscription(ids[2])["next_due"] == new_due
+
+    assert db.delete_subscriptions(ids[:2]) == 2
+    assert [r["id"] for r in db.list_subscriptions(active_only=False)] == [ids[2]]
+
+
+def test_payments_keyset_pagination(db, today):  # type: ignore
+    """
+    Проверяет постраничную выборку истории оплат по ключу (date_paid, id).
+    Шаги:
+    1. Добавляем подписку и 25 оплат (по несколько в один день).
+    2. Читаем страницы по 10 строк, передавая ключ последней строки.
+    3. Проверяем, что страницы не пересекаются и идут от новых к старым.
+    4. Проверяем, что запрос использует индекс без сортировки во временном B-дереве.
+    """
+    sid = db.add_subscription("Pages", 10, "daily", today)
+    for i in range(25):
+        db.add_payment(sid, today - dt.timedelta(days=i // 3), 10)
+
+    seen, after = [], None
+    while page := db.payments_page(sid, after, limit=10):
+        seen.extend((r["date_paid"], r["id"]) for r in page)
+        after = seen[-1]
+    assert len(seen) == 25 and len(set(seen)) == 25
+    assert seen == sorted(seen, reverse=True)
+
+    plan = db.connection().execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM payment WHERE subscription_id=? "
+        "AND (date_paid, id) < (?, ?) ORDER BY date_paid DESC, id DESC LIMIT 10",
+        (sid, today.isoformat(), 0),
+    ).fetchall()
+    details = " ".join(r[3] for r in plan)
+    assert "ix_payment_sub_date" in details and "TEMP B-TREE" not in details
+
+
+def test_archive_old_payments(tmp_path, today):  # type: ignore
+    """
+    Проверяет перенос старых оплат в архивный файл.
+    Шаги:
+    1. Добавляем 30 старых и 5 свежих оплат.
+    2. Переносим оплаты старше года пакетами по 7 строк.
+    3. В основном файле остаются только свежие оплаты,
+       но сумма за всё время и история учитывают архив.
+    4. После переподключения сумма за месяц считается без подключения архива.
+    """
+    with connect(tmp_path / "hot.db") as db:  # type: ignore
+        sid = db.add_subscription("Cold", 10, "monthly", today)
+        for i in range(30):
+            db.add_payment(sid, today - dt.timedelta(days=400 + i), 1)
+        for i in range(5):
+            db.add_payment(sid, today - dt.timedelta(days=i), 10)
+
+        moved = db.archive_payments(today - dt.timedelta(days=365), batch_size=7)
+        assert moved == 30
+        assert (tmp_path / "hot-archive.db").exists()
+        conn = db.connection()
+        assert conn.execute("SELECT COUNT(*) FROM main.payment").fetchone()[0] == 5
+
+        assert db.spent_since(today - dt.timedelta(days=30)) == 50
+        assert db.spent_since(None) == 80
+        assert len(db.payments_page(sid, limit=100)) == 35
+
+        # Повторный запуск ничего не переносит
+        assert db.archive_payments(today - dt.timedelta(days=365)) == 0
+
+    with connect(tmp_path / "hot.db") as db:  # type: ignore
+        assert db.spent_since(today - dt.timedelta(days=30)) == 50
+        assert not db._archive_attached
+        assert db.spent_since(None) == 80
+
+
+def _summary(db, sid):  # type: ignore
+    row = db.connection().execute(
+        "SELECT last_paid, paid_total, paid_count FROM payment_summary WHERE subscription_id=?",
+        (sid,),
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def test_payment_summary_triggers(tmp_path, today):  # type: ignore
+    """
+    Проверяет сводку оплат, которую поддерживают триггеры.
+    Шаги:
+    1. Вставка, правка и удаление оплат меняют last_paid, paid_total и paid_count.
+    2. Перенос старых оплат в архивный файл сводку не меняет.
+    3. Сводка попадает в снимок; база без сводки заполняется при подключении.
+    """
+    day = lambda n: (today - dt.timedelta(days=n)).isoformat()  # noqa: E731
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        sid = db.add_subscription("Music", 100, "monthly", today)
+        other = db.add_subscription("Cloud", 50, "monthly", today)
+        assert _summary(db, sid) == (None, 0, 0)
+
+        for n in (400, 30, 0):
+            db.add_payment(sid, today - dt.timedelta(days=n), 100)
+        assert _summary(db, sid) == (day(0), 300, 3)
+
+        conn = db.connection()
+        with conn:
+            conn.execute("UPDATE payment SET amount=120 WHERE date_paid=?", (day(30),))
+            # Последнюю оплату переносим на другую подписку
+            conn.execute("UPDATE payment SET subscription_id=? WHERE date_paid=?", (other, day(0)))
+        assert _summary(db, sid) == (day(30), 220, 2)
+        assert _summary(db, other) == (day(0), 100, 1)
+
+        db.archive_payments(today - dt.timedelta(days=365))
+        assert _summary(db, sid) == (day(30), 220, 2)
+        with conn:
+            conn.execute("DELETE FROM payment WHERE subscription_id=? AND date_paid=?", (sid, day(30)))
+        assert _summary(db, sid) == (day(400), 100, 1)  # последняя осталась в архиве
+
+        snap = db.snapshot()
+        i = snap.positions([other])[other]
+        assert snap.last_paid_date(i) == today
+        assert (snap.paid_total[i], snap.paid_count[i]) == (100, 1)
+
+        # База старой версии: сводки нет — пересчёт при подключении (с учётом архива)
+        with conn:
+            conn.execute("DELETE FROM payment_summary")
+            conn.execute("DELETE FROM app_meta WHERE key='payment_summary_built'")
+
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        assert _summary(db, sid) == (day(400), 100, 1)
+        assert _summary(db, other) == (day(0), 100, 1)
+        db.delete_subscriptions([other])
+        assert _summary(db, other) is None
+
+
+def test_profiles_aggregate_concurrently(tmp_path, today):  # type: ignore
+    """
+    Проверяет реестр профилей и сводку по нескольким файлам.
+    Шаги:
+    1. Создаём три базы с разным числом подписок и оплат.
+    2. Загружаем реестр из profiles.json и открываем все базы.
+    3. Сводка по всем профилям равна сумме сводок отдельных баз,
+       общий снимок содержит подписки всех профилей с меткой профиля.
+    """
+    import json
+    from src.profiles import ProfileRegistry
+
+    for n in range(1, 4):
+        with connect(tmp_path / f"team{n}.db") as db:  # type: ignore
+            for i in range(n):
+                sid = db.add_subscription(f"S{i}", 10, "monthly", today)
+                db.add_payment(sid, today, 10 * n)
+    (tmp_path / "profiles.json").write_text(
+        json.dumps({f"Команда {n}": f"team{n}.db" for n in range(1, 4)}), encoding="utf-8"
+    )
+
+    registry = ProfileRegistry.load(tmp_path / "profiles.json")
+    try:
+        assert set(registry.open_all()) == {"Команда 1", "Команда 2", "Команда 3"}
+        summary = registry.aggregate_stats()
+        assert summary.active == 6
+        assert summary.total == 10 * 1 + 20 * 2 + 30 * 3
+        assert summary.month == summary.total
+
+        snap = registry.combined_snapshot()
+        assert len(snap) == 6
+        assert sum(name.startswith("Команда 3: ") for name in snap.names) == 3
+    finally:
+        registry.close()
+
+
+def test_profiles_reread_only_changed(tmp_path, today, monkeypatch):  # type: ignore
+    """
+    Проверяет кэш частей в сводном режиме: повторное обновление не перечитывает
+    базы профилей, а после записи в одну базу (своим или чужим соединением)
+    перечитывается только она.
+    """
+    import json
+    from src import profiles
+    from src.profiles import ProfileRegistry
+
+    for n in range(1, 3):
+        with connect(tmp_path / f"team{n}.db") as db:  # type: ignore
+            db.add_subscription(f"S{n}", 10, "monthly", today)
+    (tmp_path / "profiles.json").write_text(
+        json.dumps({f"Команда {n}": f"team{n}.db" for n in range(1, 3)}), encoding="utf-8"
+    )
+    reads = []
+    original = profiles._profile_part
+    monkeypatch.setattr(
+        profiles, "_profile_part", lambda p, db: reads.append(p.name) or original(p, db)
+    )
+
+    registry = ProfileRegistry.load(tmp_path / "profiles.json")
+    try:
+        assert len(registry.combined_snapshot()) == 2
+        assert registry.aggregate_stats().active == 2
+        assert sorted(reads) == ["Команда 1", "Команда 2"]
+
+        reads.clear()
+        registry.database("Команда 1").add_subscription("Новая", 5, "monthly", today)
+        assert len(registry.combined_snapshot()) == 3
+        assert reads == ["Команда 1"]
+
+        reads.clear()
+        with connect(tmp_path / "team2.db") as other:  # type: ignore
+            other.add_subscription("Извне", 5, "monthly", today)
+        assert registry.aggregate_stats().active == 4
+        assert reads == ["Команда 2"]
+    finally:
+        registry.close()
+
+
+def test_archive_interrupted_between_transactions(tmp_path, today):  # type: ignore
+    """
+    Перенос пакета — две транзакции (копия в архив, затем удаление из основного файла).
+    Если сбой случился между ними, оплата не учитывается дважды, а повторный
+    запуск доводит перенос до конца.
+    """
+    from src.db import PAYMENT_COLUMNS
+
+    with connect(tmp_path / "hot.db") as db:  # type: ignore
+        sid = db.add_subscription("Cold", 10, "monthly", today)
+        for i in range(3):
+            db.add_payment(sid, today - dt.timedelta(days=400 + i), 1)
+        db.add_payment(sid, today, 10)
+        cutoff = today - dt.timedelta(days=365)
+        db.archive_payments(cutoff)
+        db.add_payment(sid, today - dt.timedelta(days=500), 5)
+
+        # Имитация сбоя: копия зафиксирована в архиве, удаления из main не было
+        cx = db.connection()
+        with cx:
+            cx.execute(
+                f"INSERT INTO cold.payment ({PAYMENT_COLUMNS}) "
+                f"SELECT {PAYMENT_COLUMNS} FROM main.payment WHERE date_paid < ?",
+                (cutoff.isoformat(),),
+            )
+        assert db.spent_since(None) == 18
+        assert len(db.payments_page(sid, limit=100)) == 5
+
+        assert db.archive_payments(cutoff) == 1
+        assert db.spent_since(None) == 18
+        assert cx.execute("SELECT COUNT(*) FROM cold.payment").fetchone()[0] == 4
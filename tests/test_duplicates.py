@@ -0,0 +1,144 @@
+import time
+
+from src import duplicates
+from src.db import connect
+from src.duplicates import (
+    NameIndexBuilder,
+    duplicate_clusters,
+    find_similar,
+    normalize_name,
+    pending_names,
+    trigrams,
+)
+
+NAMES = [
+    "Netflix",
+    "NETFLIX Premium",
+    "netflix ",
+    "Spotify",
+    "Spotify Family",
+    "Яндекс Плюс",
+    "яндекс.плюс",
+    "YouTube",
+    "Облако Mail",
+]
+
+
+def _fill(db, today):  # type: ignore
+    return {name: db.add_subscription(name, 100, "monthly", today) for name in NAMES}
+
+
+def test_normalize_and_trigrams():
+    assert normalize_name("  NETFLIX  Premium! ") == "netflix premium"
+    assert normalize_name("яндекс.плюс") == "яндекс плюс"
+    # «  ab», « ab», «ab » — по три триграммы на двухбуквенное слово
+    assert len(trigrams("ab")) == 3
+    assert trigrams("") == set()
+
+
+def test_find_similar(db, today):  # type: ignore
+    """
+    Проверяет поиск похожих названий по индексу триграмм:
+    находятся варианты написания, а несвязанные подписки — нет.
+    """
+    ids = _fill(db, today)
+    found = [sid for sid, _, _ in find_similar(db, "Netflix")]
+    assert set(found) == {ids["Netflix"], ids["netflix "], ids["NETFLIX Premium"]}
+    assert find_similar(db, "Netflix")[0][2] == 1.0
+    assert find_similar(db, "Netflix", exclude=ids["Netflix"])[0][0] == ids["netflix "]
+    assert find_similar(db, "Дзен") == []
+    assert find_similar(db, "!!!") == []
+
+
+def test_duplicate_clusters(db, today):  # type: ignore
+    """Проверяет группы возможных дубликатов по всей базе."""
+    ids = _fill(db, today)
+    clusters = [[sid for sid, _ in cluster] for cluster in duplicate_clusters(db)]
+    assert clusters == [
+        sorted([ids["Netflix"], ids["NETFLIX Premium"], ids["netflix "]]),
+        sorted([ids["Spotify"], ids["Spotify Family"]]),
+        sorted([ids["Яндекс Плюс"], ids["яндекс.плюс"]]),
+    ]
+
+
+def test_index_follows_renames_and_deletes(db, today):  # type: ignore
+    """
+    Проверяет, что индекс триграмм дообновляется после правок в обход приложения:
+    переименование попадает в очередь триггером, удаление каскадом чистит индекс.
+    """
+    ids = _fill(db, today)
+    assert find_similar(db, "YouTube")
+    cx = db.connection()
+    with cx:
+        cx.execute("UPDATE subscription SET name = 'Кинопоиск' WHERE id = ?", (ids["YouTube"],))
+    assert find_similar(db, "YouTube") == []
+    assert [sid for sid, _, _ in find_similar(db, "кинопоиск")] == [ids["YouTube"]]
+
+    db.delete_subscriptions([ids["Spotify"]])
+    assert [sid for sid, _, _ in find_similar(db, "Spotify")] == [ids["Spotify Family"]]
+    assert cx.execute(
+        "SELECT COUNT(*) FROM name_trigram WHERE subscription_id = ?", (ids["Spotify"],)
+    ).fetchone()[0] == 0
+
+
+def test_clusters_match_pairwise_similarity(db, today):  # type: ignore
+    """
+    Группы из SQL-соединения по префиксам совпадают с полным перебором пар:
+    фильтры отсекают только заведомо непохожие названия.
+    """
+    words = ["netflix", "spotify", "family", "premium", "плюс", "яндекс", "кино", "music", "hd", "tv"]
+    names = [f"{words[i % 10]} {words[i * 7 % 10]} {words[i * 3 % 10][: 2 + i % 5]}" for i in range(60)]
+    for name in names:
+        db.add_subscription(name, 100, "monthly", today)
+    rows = db.connection().execute("SELECT id, name FROM subscription").fetchall()
+    grams = {sid: trigrams(normalize_name(name)) for sid, name in rows}
+    parent = {sid: sid for sid in grams}
+
+    def find(i):  # type: ignore
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for a in grams:
+        for b in grams:
+            if a < b and duplicates.jaccard(grams[a], grams[b]) >= duplicates.CLUSTER_THRESHOLD:
+                parent[find(a)] = find(b)
+    expected = {}
+    for sid in grams:
+        expected.setdefault(find(sid), []).append(sid)
+    expected = sorted(sorted(ids) for ids in expected.values() if len(ids) > 1)
+
+    stages = []
+    clusters = duplicate_clusters(db, progress=lambda done, total: stages.append(done))
+    assert sorted([sid for sid, _ in cluster] for cluster in clusters) == expected
+    assert stages == list(range(1, duplicates.CLUSTER_STAGES + 1))
+    # Промежуточные временные таблицы удалены
+    assert db.connection().execute(
+        "SELECT COUNT(*) FROM temp.sqlite_master WHERE name LIKE 'dup_%'"
+    ).fetchone()[0] == 0
+
+
+def test_suggestions_leave_large_queue_to_background(tmp_path, today, monkeypatch):  # type: ignore
+    """
+    Подсказки не строят индекс на большой очереди в GUI-потоке — его строит
+    NameIndexBuilder в фоне через своё соединение, после чего поиск находит пары.
+    """
+    monkeypatch.setattr(duplicates, "SUGGEST_MAX_PENDING", 3)
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        ids = _fill(db, today)
+        db.connection().execute("DELETE FROM app_meta WHERE key = 'name_index_built'")
+        db.connection().commit()
+        assert pending_names(db, 3) > 3
+        assert find_similar(db, "Netflix", max_pending=3) == []
+        assert db.get_meta("name_index_built") is None
+
+        builder = NameIndexBuilder(db)
+        assert builder.start()
+        deadline = time.monotonic() + 10
+        while builder.running() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        builder.stop()
+        assert pending_names(db, 3) == 0
+        assert find_similar(db, "Netflix", max_pending=3)[0][0] == ids["Netflix"]
+        # Очередь пуста — второй раз поток не нужен
+        assert not NameIndexBuilder(db).start()
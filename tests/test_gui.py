@@ -36,6 +36,10 @@ def test_mark_paid_adds_payment(qtbot, tmp_path):  # type: ignore
         )
         count = cur.fetchone()[0]
         assert count == 1
+        # Сводка оплат в таблице обновилась вместе с оплатой
+        assert main.active_table.item(0, 4).text() == dt.date.today().strftime("%d.%m.%Y")
+        assert main.active_table.item(0, 5).text() == "500.00"
+        assert main.active_table.item(0, 6).text() == "1"
 
 
 
@@ -114,3 +118,202 @@ def test_stats_dialog_works(qtbot, tmp_path):  # type: ignore
         assert any(
             "Активных подписок" in lbl.text() for lbl in labels
         )
+
+
+
+def test_stats_dialog_escapes_category_names(qtbot, tmp_path):  # type: ignore
+    """Названия категорий в окне статистики выводятся как текст, а не как разметка."""
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        sid = db.add_subscription("Music", 100, "monthly", dt.date.today(), tags=["<b", "a&b"])
+        db.add_payment(sid, dt.date.today(), 100)
+        from src.ui.stats_dialog import StatsDialog
+        dlg = StatsDialog(db)
+        qtbot.addWidget(dlg)  # type: ignore
+
+        (label,) = [lbl for lbl in dlg.findChildren(QLabel) if "По категориям" in lbl.text()]
+        assert "&lt;b: 100.00" in label.text() and "a&amp;b: 100.00" in label.text()
+
+
+def test_bulk_archive_selected(qtbot, tmp_path):  # type: ignore
+    """
+    Проверяет массовое архивирование выделенных строк.
+    Шаги:
+    1. Создаём три подписки и открываем MainWindow.
+    2. Выделяем все строки активной таблицы и вызываем archive_selected().
+    3. Ожидаем пустую активную таблицу и три строки в архиве.
+    """
+    db_file = tmp_path / "subs.db"  # type: ignore
+    with connect(db_file) as db:  # type: ignore
+        for name in ("A", "B", "C"):
+            db.add_subscription(name, 100, "monthly", dt.date.today())
+        main = MainWindow(db)
+        qtbot.addWidget(main)  # type: ignore
+        main.active_table.selectAll()
+        main.archive_selected()
+
+        assert main.active_table.rowCount() == 0
+        assert main.archive_table.rowCount() == 3
+
+
+
+def test_notes_tooltip_loads_full_text(qtbot, tmp_path):  # type: ignore
+    """
+    Проверяет, что таблица показывает превью заметки,
+    а полный текст появляется только в подсказке ячейки.
+    """
+    from PyQt6.QtCore import Qt
+
+    db_file = tmp_path / "subs.db"  # type: ignore
+    with connect(db_file) as db:  # type: ignore
+        note = "очень длинная заметка " * 10
+        db.add_subscription("Notes", 100, "monthly", dt.date.today(), note)
+        main = MainWindow(db)
+        qtbot.addWidget(main)  # type: ignore
+        item = main.active_table.item(0, 7)
+        assert item.text() == note[:60] + "…"
+        assert item.data(Qt.ItemDataRole.ToolTipRole) == note
+
+
+
+def test_category_filter(qtbot, tmp_path):  # type: ignore
+    """
+    Проверяет фильтр главного окна по категории:
+    при выборе категории в таблице остаются только её подписки.
+    """
+    db_file = tmp_path / "subs.db"  # type: ignore
+    with connect(db_file) as db:  # type: ignore
+        db.add_subscription("Music", 100, "monthly", dt.date.today(), tags=["музыка"])
+        db.add_subscription("Cloud", 200, "monthly", dt.date.today(), tags=["работа"])
+        main = MainWindow(db)
+        qtbot.addWidget(main)  # type: ignore
+        assert main.active_table.rowCount() == 2
+
+        main.category_combo.setCurrentIndex(main.category_combo.findText("работа"))
+        assert main.active_table.rowCount() == 1
+        assert main.active_table.item(0, 0).text() == "Cloud"
+
+
+
+def test_payment_history_pages(qtbot, tmp_path):  # type: ignore
+    """
+    Проверяет, что диалог истории оплат загружает первую страницу в фоне.
+    Шаги:
+    1. Создаём подписку и 250 оплат.
+    2. Открываем PaymentHistoryDialog.
+    3. Ждём, пока в таблице появятся строки первой страницы.
+    """
+    from src.ui.history_dialog import PAGE_SIZE, PaymentHistoryDialog
+
+    db_file = tmp_path / "subs.db"  # type: ignore
+    with connect(db_file) as db:  # type: ignore
+        sid = db.add_subscription("History", 100, "daily", dt.date.today())
+        for i in range(250):
+            db.add_payment(sid, dt.date.today() - dt.timedelta(days=i), 100)
+        dlg = PaymentHistoryDialog(db, sid, "History")
+        qtbot.addWidget(dlg)  # type: ignore
+        qtbot.waitUntil(lambda: dlg.table.rowCount() >= PAGE_SIZE)  # type: ignore
+        assert dlg.table.item(0, 1).text() == "100.00"
+        dlg.accept()
+
+
+
+def test_notification_sound_coalesces_bursts(qtbot):  # type: ignore
+    """
+    Проверяет, что серия запросов звука проигрывается одним звуком
+    и не чаще заданного интервала.
+    """
+    from src.audio import NotificationSound
+
+    class FakeEffect:
+        plays = 0
+
+        def play(self):  # type: ignore
+            FakeEffect.plays += 1
+
+    sound = NotificationSound(min_interval_ms=200)
+    sound._effect = FakeEffect()  # type: ignore
+    for _ in range(10):
+        sound.play()
+    qtbot.waitUntil(lambda: FakeEffect.plays == 1)  # type: ignore
+    sound.play()
+    qtbot.wait(50)  # type: ignore
+    assert FakeEffect.plays == 1  # интервал ещё не прошёл
+    qtbot.waitUntil(lambda: FakeEffect.plays == 2)  # type: ignore
+
+
+def test_subscription_dialog_suggests_duplicates(qtbot, tmp_path):  # type: ignore
+    """
+    Проверяет подсказку о похожих подписках в диалоге добавления:
+    после ввода названия появляется список возможных дубликатов.
+    """
+    from src.ui.dialogs import SubscriptionDialog
+
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        db.add_subscription("Netflix", 500, "monthly", dt.date.today())
+        dlg = SubscriptionDialog(db=db)
+        qtbot.addWidget(dlg)  # type: ignore
+        dlg.name_edit.setText("NETFLIX Premium")
+        qtbot.waitUntil(lambda: "Netflix" in dlg.similar_label.text())  # type: ignore
+
+        dlg.name_edit.setText("Дзен")
+        qtbot.waitUntil(lambda: dlg.similar_label.isHidden())  # type: ignore
+
+
+def test_duplicates_dialog_searches_in_background(qtbot, tmp_path, monkeypatch):  # type: ignore
+    """
+    Диалог дубликатов ищет группы в фоновом потоке через своё соединение
+    и заполняет дерево по окончании.
+    """
+    import threading
+
+    from src.ui import duplicates_dialog
+    from src.ui.duplicates_dialog import DuplicatesDialog
+
+    threads = []
+    search = duplicates_dialog.duplicate_clusters
+
+    def spy(db, **kwargs):  # type: ignore
+        threads.append(threading.current_thread())
+        return search(db, **kwargs)
+
+    monkeypatch.setattr(duplicates_dialog, "duplicate_clusters", spy)
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        for name in ("Netflix", "netflix ", "YouTube"):
+            db.add_subscription(name, 500, "monthly", dt.date.today())
+        dlg = DuplicatesDialog(db)
+        qtbot.addWidget(dlg)  # type: ignore
+        qtbot.waitUntil(lambda: dlg.tree.topLevelItemCount() == 1)  # type: ignore
+        assert threads and threads[0] is not threading.main_thread()
+        assert dlg.status_label.text() == "Групп похожих подписок: 1"
+        assert dlg.tree.topLevelItem(0).childCount() == 2  # type: ignore
+
+
+def test_archive_old_payments_in_background(qtbot, tmp_path, monkeypatch):  # type: ignore
+    """
+    Перенос старых оплат из главного окна идёт в фоновом потоке:
+    по окончании окно показывает итог, а таблицы учитывают архив.
+    """
+    from PyQt6.QtWidgets import QMessageBox
+
+    today = dt.date.today()
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        sid = db.add_subscription("Cold", 10, "monthly", today)
+        for i in range(20):
+            db.add_payment(sid, today - dt.timedelta(days=400 + i), 1)
+        db.add_payment(sid, today, 10)
+        main = MainWindow(db)
+        qtbot.addWidget(main)  # type: ignore
+        shown = []
+        monkeypatch.setattr(
+            QMessageBox, "question", lambda *a, **k: QMessageBox.StandardButton.Yes
+        )
+        monkeypatch.setattr(QMessageBox, "information", lambda _p, _t, text: shown.append(text))
+
+        main.archive_old_payments()
+        assert main._archive_thread is not None  # type: ignore
+        qtbot.waitUntil(lambda: bool(shown), timeout=5000)  # type: ignore
+        assert shown == ["Перенесено оплат: 20"]
+        assert main._archive_thread is None  # type: ignore
+        assert db.connection().execute("SELECT COUNT(*) FROM main.payment").fetchone()[0] == 1
+        assert db.spent_since(None) == 30
+        assert main.active_table.item(0, 6).text() == "21"
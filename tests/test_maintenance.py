@@ -0,0 +1,146 @@
+import datetime as dt
+
+from src import maintenance
+from src.db import connect
+from src.maintenance import JOBS, MaintenanceScheduler, due_jobs, last_runs
+
+
+def _fragment(db):  # type: ignore
+    """Создаёт и удаляет подписки с длинными заметками, оставляя свободные страницы."""
+    ids = [
+        db.add_subscription(f"S{i}", 1, "daily", dt.date.today(), "x" * 4000)
+        for i in range(300)
+    ]
+    db.delete_subscriptions(ids)
+    return db.connection().execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def test_maintenance_runs_when_idle(qtbot, tmp_path):  # type: ignore
+    """
+    Проверяет обслуживание в простое.
+    Шаги:
+    1. Оставляем в базе свободные страницы после удаления подписок.
+    2. Запускаем планировщик с нулевым порогом простоя.
+    3. Ждём записи о всех задачах в maintenance_log; свободных страниц не остаётся,
+       а до истечения интервалов задачи повторно не планируются.
+    """
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        assert _fragment(db) > 0
+        sched = MaintenanceScheduler(db, idle_seconds=0, check_ms=10)
+        statuses = []
+        sched.status_changed.connect(statuses.append)  # type: ignore
+        qtbot.waitUntil(lambda: len(last_runs(db)) == len(JOBS), timeout=5000)  # type: ignore
+
+        runs = last_runs(db)
+        assert all(run["status"] == "ok" for run in runs.values())
+        assert runs["incremental_vacuum"]["steps"] > 1
+        assert db.connection().execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert due_jobs(db) == []
+        qtbot.waitUntil(lambda: statuses[-1].startswith("Обслуживание БД: "))  # type: ignore
+
+
+def test_maintenance_pauses_on_input(qtbot, tmp_path, monkeypatch):  # type: ignore
+    """
+    Проверяет, что ввод пользователя приостанавливает задачу,
+    а в следующий простой она продолжается с того же места.
+    """
+    monkeypatch.setattr(maintenance, "VACUUM_PAGES_PER_STEP", 1)  # много мелких порций
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        _fragment(db)
+        sched = MaintenanceScheduler(db, idle_seconds=0.3, budget_ms=0, check_ms=10)
+        sched.notify_activity()
+        sched._queue = ["incremental_vacuum"]  # type: ignore
+        qtbot.waitUntil(lambda: sched._steps > 0, timeout=3000)  # type: ignore
+        sched.notify_activity()
+        qtbot.waitUntil(lambda: not sched._running)  # type: ignore
+        assert sched._current is not None and "incremental_vacuum" not in last_runs(db)  # type: ignore
+
+        qtbot.waitUntil(lambda: "incremental_vacuum" in last_runs(db), timeout=5000)  # type: ignore
+        assert db.connection().execute("PRAGMA freelist_count").fetchone()[0] == 0
+
+
+def test_old_database_converted_to_incremental_vacuum(qtbot, tmp_path, monkeypatch):  # type: ignore
+    """
+    Проверяет однократный перевод базы без auto_vacuum на инкрементальный режим:
+    в простое выполняется VACUUM (в рабочем потоке, не в GUI), файл уменьшается,
+    а факт перевода пишется в app_meta.
+    """
+    import sqlite3
+    import threading
+
+    threads = []
+    convert = maintenance._convert_auto_vacuum
+    monkeypatch.setattr(
+        maintenance, "_convert_auto_vacuum",
+        lambda *args: threads.append(threading.current_thread()) or convert(*args),
+    )
+
+    path = tmp_path / "old.db"
+    raw = sqlite3.connect(path)
+    raw.execute("CREATE TABLE legacy (x)")  # таблица до схемы фиксирует auto_vacuum=NONE
+    raw.close()
+    with connect(path) as db:  # type: ignore
+        assert db.connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        assert _fragment(db) > 0
+        size_before = db.connection().execute("PRAGMA page_count").fetchone()[0]
+        sched = MaintenanceScheduler(db, idle_seconds=0, check_ms=10)
+        qtbot.waitUntil(lambda: "incremental_vacuum" in last_runs(db), timeout=5000)  # type: ignore
+
+        run = last_runs(db)["incremental_vacuum"]
+        assert run["status"] == "ok" and "VACUUM" in run["detail"]
+        cx = db.connection()
+        assert cx.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert cx.execute("PRAGMA page_count").fetchone()[0] < size_before
+        assert db.get_meta("auto_vacuum_converted") is not None
+        assert len(threads) == 1 and threads[0] is not threading.main_thread()
+
+
+def test_vacuum_waits_for_open_transaction(tmp_path):  # type: ignore
+    """Шаг очистки не фиксирует чужую незавершённую транзакцию на общем соединении."""
+    from src.maintenance import _vacuum
+
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        _fragment(db)
+        cx = db.connection()
+        cx.execute("INSERT INTO app_meta (key, value) VALUES ('draft', '1')")
+        assert cx.in_transaction
+        job = _vacuum(cx)
+        for _ in range(3):
+            next(job)
+        assert cx.in_transaction
+        cx.rollback()
+        assert db.get_meta("draft") is None
+        for _ in job:
+            pass
+        assert cx.execute("PRAGMA freelist_count").fetchone()[0] == 0
+
+
+def test_input_watched_on_windows_only(qtbot, tmp_path, monkeypatch):  # type: ignore
+    """
+    Фильтр ввода стоит на окнах верхнего уровня, а не на всём приложении:
+    событие обычного объекта до него не доходит, ввод в окно — доходит.
+    """
+    from PyQt6.QtCore import QCoreApplication, QEvent, QObject, Qt
+    from PyQt6.QtTest import QTest
+    from PyQt6.QtWidgets import QWidget
+
+    seen = []
+    filter_events = MaintenanceScheduler.eventFilter
+    monkeypatch.setattr(
+        MaintenanceScheduler, "eventFilter",
+        lambda self, obj, event: seen.append(event.type()) or filter_events(self, obj, event),
+    )
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        sched = MaintenanceScheduler(db, idle_seconds=60, check_ms=60000)
+        QCoreApplication.sendEvent(QObject(), QEvent(QEvent.Type.User))
+        assert QEvent.Type.User not in seen
+
+        widget = QWidget()
+        qtbot.addWidget(widget)  # type: ignore
+        widget.show()
+        qtbot.waitExposed(widget)  # type: ignore
+        qtbot.waitUntil(lambda: QCoreApplication.instance().focusWindow() is not None)  # type: ignore
+        sched._last_input = 0.0  # type: ignore
+        QTest.keyClick(widget.windowHandle(), Qt.Key.Key_A)
+        assert QEvent.Type.KeyPress in seen
+        assert sched._last_input > 0  # type: ignore
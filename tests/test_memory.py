@@ -0,0 +1,107 @@
+import datetime as dt
+import logging
+import tracemalloc
+
+import pytest
+from PyQt6.QtWidgets import QDialog, QTableWidget
+
+from src import memory
+from src.db import connect
+from src.memory import MemoryProfiler, measure, parse_budgets
+
+# Пик памяти Python на одну подписку, байт: колоночный снимок и список sqlite3.Row
+SNAPSHOT_BYTES_PER_ROW = 400
+ROWS_BYTES_PER_ROW = 800
+
+
+@pytest.fixture
+def traced():  # type: ignore
+    """tracemalloc на время теста (профилировщик сам его не останавливает)."""
+    yield
+    tracemalloc.stop()
+
+
+def _fill(db, n):  # type: ignore
+    cx = db.connection()
+    with cx:
+        cx.executemany(
+            "INSERT INTO subscription (name, cost, period, next_due, notes) VALUES (?, ?, ?, ?, ?)",
+            (
+                (f"Подписка {i}", i % 100, "monthly", "2025-01-01", "x" * 100 if i % 3 == 0 else "")
+                for i in range(n)
+            ),
+        )
+
+
+@pytest.mark.parametrize("n", [1_000, 20_000])
+def test_peak_memory_at_fixed_sizes(tmp_path, traced, n):  # type: ignore
+    """
+    Отслеживает пик памяти Python при загрузке n подписок:
+    снимок для таблиц и полная выборка sqlite3.Row укладываются в бюджет на строку.
+    """
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        _fill(db, n)
+        tracemalloc.start()
+        snap = db.snapshot()
+        assert len(snap) == n
+        assert tracemalloc.get_traced_memory()[1] <= n * SNAPSHOT_BYTES_PER_ROW
+
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        rows = db.list_subscriptions()
+        assert len(rows) == n
+        assert tracemalloc.get_traced_memory()[1] - base <= n * ROWS_BYTES_PER_ROW
+
+
+def test_parse_budgets():
+    budgets = parse_budgets("db=8, sqlite=1.5")
+    assert budgets["db"] == 8 and budgets["sqlite"] == 1.5
+    assert budgets["ui"] == memory.DEFAULT_BUDGETS_MB["ui"]
+    with pytest.raises(ValueError):
+        parse_budgets("cache=1")
+
+
+def test_profiler_samples_and_budgets(qtbot, db, today, traced, caplog):  # type: ignore
+    """
+    Проверяет замеры по подсистемам и предупреждения о превышении бюджета.
+    Шаги:
+    1. Замер учитывает ячейки таблицы и кучу SQLite.
+    2. При бюджете меньше фактического расхода пишется предупреждение.
+    3. Показ диалога тоже даёт замер.
+    """
+    db.add_subscription("Music", 100, "monthly", today)
+    table = QTableWidget(10, 4)
+    qtbot.addWidget(table)  # type: ignore
+    report = measure("тест", db, [table])
+    assert report.items == 40
+    assert report.usage["table_items"] == 40 * memory.ITEM_BYTES
+    assert report.cache_limit > 0
+
+    budgets = dict(memory.DEFAULT_BUDGETS_MB, table_items=0.001)
+    prof = MemoryProfiler(db, [table], budgets=budgets)
+    with caplog.at_level(logging.INFO, logger="src.memory"):
+        prof.sample("refresh_tables")
+    warnings = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert warnings and "table_items" in warnings[0]
+
+    dlg = QDialog()
+    dlg.setObjectName("ProbeDialog")
+    qtbot.addWidget(dlg)  # type: ignore
+    dlg.show()
+    qtbot.waitUntil(lambda: prof.reports[-1].label == "диалог ProbeDialog")  # type: ignore
+
+
+def test_main_window_profiling_mode(qtbot, tmp_path, traced, monkeypatch):  # type: ignore
+    """В режиме профилирования главное окно делает замер после каждого refresh_tables."""
+    from src.ui.main_window import MainWindow
+
+    monkeypatch.setenv(memory.ENV_PROFILE, "1")
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        db.add_subscription("Music", 100, "monthly", dt.date.today())
+        main = MainWindow(db)
+        qtbot.addWidget(main)  # type: ignore
+        assert main.memory is not None
+        report = main.memory.reports[-1]
+        assert report.label == "refresh_tables"
+        assert report.items == main.active_table.columnCount()
+
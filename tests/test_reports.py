@@ -0,0 +1,85 @@
+import datetime as dt
+import threading
+
+import pytest
+
+from src.db import connect
+from src.reports import ReportCancelled, run_report
+
+
+def _fill(db):  # type: ignore
+    """Три подписки: регулярная, с повышением цены и с пропусками."""
+    start = dt.date(2023, 1, 1)
+    regular = db.add_subscription("Regular", 100, "weekly", start)
+    raised = db.add_subscription("Raised", 100, "monthly", start)
+    gappy = db.add_subscription("Gappy", 50, "monthly", start)
+    rows = [(regular, (start + dt.timedelta(weeks=i)).isoformat(), 100) for i in range(60)]
+    rows += [(raised, f"2023-{m:02d}-05", 100 if m < 7 else 150) for m in range(1, 13)]
+    rows += [(gappy, f"2023-{m:02d}-10", 50) for m in (1, 2, 6, 7)]
+    db.set_cost(gappy, 80, dt.date(2023, 4, 15))
+    conn = db.connection()
+    conn.executemany(
+        "INSERT INTO payment (subscription_id, date_paid, amount) VALUES (?, ?, ?)", rows
+    )
+    conn.commit()
+    return regular, raised, gappy
+
+
+def test_report_in_process_pool(tmp_path):  # type: ignore
+    """
+    Проверяет отчёт, посчитанный частями в пуле процессов.
+    Шаги:
+    1. Наполняем базу тремя подписками с разной историей оплат.
+    2. Строим отчёт двумя процессами и проверяем прогресс.
+    3. Проверяем траты по годам, повышение цены и пропуски.
+    """
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        regular, raised, gappy = _fill(db)
+        calls = []
+        report = run_report(db, workers=2, progress=lambda d, t: calls.append((d, t)))
+
+    assert calls[0][0] == 0 and calls[-1][0] == calls[-1][1]
+    subs = report.subscriptions
+    assert set(subs) == {regular, raised, gappy}
+    assert subs[regular].missed == 0 and subs[regular].gap_stdev == 0
+    assert sum(subs[regular].spend_by_year.values()) == 6000
+    assert subs[raised].price_increases == [("2023-07-05", 100, 150)]
+    assert subs[gappy].missed == 3  # нет оплат за март, апрель и май
+    assert subs[gappy].missed_cost == 50 + 50 + 80  # по ценам на даты пропусков
+    assert report.spend_by_year()[2023] == 53 * 100 + 6 * 100 + 6 * 150 + 4 * 50
+
+
+def test_report_cancel(tmp_path):  # type: ignore
+    """Выставленный флаг отмены прерывает отчёт исключением ReportCancelled."""
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        _fill(db)
+        cancel = threading.Event()
+        cancel.set()
+        with pytest.raises(ReportCancelled):
+            run_report(db, workers=2, cancel=cancel)
+
+
+def test_report_includes_archive(tmp_path):  # type: ignore
+    """
+    Отчёт учитывает оплаты, перенесённые в архивный файл, и не считает дважды
+    оплату, оставшуюся в обоих файлах после прерванного переноса.
+    """
+    from src.db import PAYMENT_COLUMNS
+
+    with connect(tmp_path / "subs.db") as db:  # type: ignore
+        regular, _, _ = _fill(db)
+        db.archive_payments(dt.date(2023, 7, 1))
+        cx = db.connection()
+        assert cx.execute("SELECT COUNT(*) FROM cold.payment").fetchone()[0] > 0
+        # Имитация сбоя между транзакциями переноса: строка в обоих файлах
+        db.add_payment(regular, dt.date(2023, 6, 30), 0)
+        with cx:
+            cx.execute(
+                f"INSERT INTO cold.payment ({PAYMENT_COLUMNS}) "
+                f"SELECT {PAYMENT_COLUMNS} FROM main.payment WHERE date_paid = '2023-06-30'"
+            )
+
+        report = run_report(db, workers=1)
+        assert sum(report.subscriptions[regular].spend_by_year.values()) == 6000
+        assert report.subscriptions[regular].payments == 61
+        assert report.spend_by_year()[2023] == 53 * 100 + 6 * 100 + 6 * 150 + 4 * 50
@@ -0,0 +1,46 @@
+import datetime as dt
+
+from src.series import lttb
+
+
+def test_lttb_keeps_ends_and_peaks():
+    """
+    Проверяет прореживание LTTB.
+    Шаги:
+    1. Строим ряд из 1000 точек с одним выбросом.
+    2. Прореживаем до 50 точек.
+    3. Ожидаем 50 индексов по возрастанию, первую и последнюю точку и выброс.
+    """
+    xs = list(range(1000))
+    ys = [1.0] * 1000
+    ys[437] = 100.0
+    keep = lttb(xs, ys, 50)
+    assert len(keep) == 50
+    assert keep == sorted(keep)
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep
+    assert lttb(xs[:10], ys[:10], 50) == list(range(10))
+
+
+def test_spend_series_buckets(db):  # type: ignore
+    """
+    Проверяет агрегацию ряда трат в SQL и кэш по гранулярности.
+    Шаги:
+    1. Добавляем оплаты в разные дни двух месяцев.
+    2. Запрашиваем ряды по месяцам и неделям.
+    3. Проверяем границы корзин и суммы, а также повторное использование кэша.
+    """
+    sid = db.add_subscription("Series", 10, "daily", dt.date(2024, 1, 1))
+    for day, amount in ((dt.date(2024, 1, 3), 10), (dt.date(2024, 1, 31), 5),
+                        (dt.date(2024, 2, 4), 7)):
+        db.add_payment(sid, day, amount)
+
+    xs, ys = db.spend_series("month")
+    assert [dt.date.fromordinal(x) for x in xs] == [dt.date(2024, 1, 1), dt.date(2024, 2, 1)]
+    assert list(ys) == [15.0, 7.0]
+    assert db.spend_series("month") is db.spend_series("month")
+
+    xs, ys = db.spend_series("week", sid)
+    # 2024-01-03 — среда, её неделя начинается в понедельник 2024-01-01
+    assert dt.date.fromordinal(xs[0]) == dt.date(2024, 1, 1)
+    assert all(dt.date.fromordinal(x).weekday() == 0 for x in xs)
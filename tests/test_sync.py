@@ -0,0 +1,250 @@
+import datetime as dt
+import shutil
+import time
+
+from src.db import connect
+from src.sync import apply_delta, export_delta, last_seq, read_delta, write_delta
+
+
+def _rows(db, table):  # type: ignore
+    return [tuple(r) for r in db.connection().execute(f"SELECT * FROM {table} ORDER BY id")]
+
+
+def test_delta_sync_roundtrip(tmp_path):  # type: ignore
+    """
+    Проверяет выгрузку и применение дельты между двумя копиями базы.
+    Шаги:
+    1. Создаём базу A, копируем её в B и запоминаем последний seq.
+    2. Меняем A: новая оплата, новая цена, удаление подписки.
+    3. Выгружаем дельту после seq и применяем к B — таблицы совпадают.
+    4. Повторное применение той же дельты ничего не меняет.
+    """
+    a_path, b_path = tmp_path / "a.db", tmp_path / "b.db"
+    with connect(a_path) as a:  # type: ignore
+        keep = a.add_subscription("Keep", 100, "monthly", dt.date.today())
+        gone = a.add_subscription("Gone", 50, "yearly", dt.date.today())
+        a.add_payment(gone, dt.date.today(), 50)
+        a.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copy(a_path, b_path)
+        since = last_seq(a)
+
+        a.add_payment(keep, dt.date.today(), 100)
+        a.connection().execute("UPDATE subscription SET cost=120 WHERE id=?", (keep,))
+        a.connection().commit()
+        a.delete_subscriptions([gone])
+        write_delta(export_delta(a, since), tmp_path / "delta.json.gz")
+        expected = _rows(a, "subscription"), _rows(a, "payment")
+
+    delta = read_delta(tmp_path / "delta.json.gz")
+    with connect(b_path) as b:  # type: ignore
+        assert apply_delta(b, delta) > 0
+        assert (_rows(b, "subscription"), _rows(b, "payment")) == expected
+        assert apply_delta(b, delta) == 0
+
+
+def test_delta_sync_last_writer_wins(tmp_path):  # type: ignore
+    """
+    Проверяет разрешение конфликта: более позднее локальное изменение
+    не перезаписывается более старым изменением из дельты.
+    """
+    a_path, b_path = tmp_path / "a.db", tmp_path / "b.db"
+    with connect(a_path) as a:  # type: ignore
+        sid = a.add_subscription("Clash", 100, "monthly", dt.date.today())
+        a.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copy(a_path, b_path)
+        since = last_seq(a)
+        a.connection().execute("UPDATE subscription SET cost=200 WHERE id=?", (sid,))
+        a.connection().commit()
+        delta = export_delta(a, since)
+
+    time.sleep(0.01)
+    with connect(b_path) as b:  # type: ignore
+        b.connection().execute("UPDATE subscription SET cost=300 WHERE id=?", (sid,))
+        b.connection().commit()
+        assert apply_delta(b, delta) == 0
+        assert b.get_subscription(sid)["cost"] == 300
+
+
+def _sync(src, dst, since):  # type: ignore
+    """Переносит изменения src после since в dst, возвращает число применённых."""
+    return apply_delta(dst, export_delta(src, since))
+
+
+def test_delta_sync_independent_inserts(tmp_path):  # type: ignore
+    """
+    Проверяет, что строки, добавленные независимо в двух копиях, не затирают друг друга:
+    у обеих один и тот же локальный id, но разные uuid.
+    Шаги:
+    1. Копируем базу A в B, в каждой добавляем свою подписку с оплатой.
+    2. Синхронизируем A -> B, затем B -> A.
+    3. В обеих копиях обе подписки, оплаты привязаны к своим подпискам.
+    """
+    a_path, b_path = tmp_path / "a.db", tmp_path / "b.db"
+    today = dt.date.today()
+    with connect(a_path) as a:  # type: ignore
+        a.add_subscription("Shared", 100, "monthly", today)
+        a.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copy(a_path, b_path)
+        since = last_seq(a)
+        with connect(b_path) as b:  # type: ignore
+            sid_a = a.add_subscription("Netflix (A only)", 10, "monthly", today)
+            a.add_payment(sid_a, today, 10)
+            sid_b = b.add_subscription("Spotify (B only)", 20, "monthly", today)
+            b.add_payment(sid_b, today, 20)
+            assert sid_a == sid_b
+
+            assert _sync(a, b, since) == 2
+            # Строки A, применённые в B, попадают и в дельту B, но в A уже не новее
+            assert _sync(b, a, since) == 2
+            for db in (a, b):
+                rows = db.connection().execute(
+                    """
+                    SELECT s.name, p.amount FROM subscription AS s
+                    LEFT JOIN payment AS p ON p.subscription_id = s.id ORDER BY s.name
+                    """
+                ).fetchall()
+                assert [tuple(r) for r in rows] == [
+                    ("Netflix (A only)", 10), ("Shared", None), ("Spotify (B only)", 20),
+                ]
+
+
+def test_delta_sync_keeps_price_dates(tmp_path):  # type: ignore
+    """
+    Новая цена с прошедшей даты приходит в другую копию вместе с историей цен:
+    версия начинается с той же даты, а не с дня применения дельты.
+    """
+    a_path, b_path = tmp_path / "a.db", tmp_path / "b.db"
+    today = dt.date.today()
+    with connect(a_path) as a:  # type: ignore
+        sid = a.add_subscription("Music", 100, "monthly", today)
+        a.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copy(a_path, b_path)
+        since = last_seq(a)
+        a.set_cost(sid, 150, today - dt.timedelta(days=10))
+        delta = export_delta(a, since)
+        expected = [tuple(r) for r in a.price_history(sid)]
+
+    with connect(b_path) as b:  # type: ignore
+        assert apply_delta(b, delta) == 1
+        assert b.get_subscription(sid)["cost"] == 150
+        assert [tuple(r) for r in b.price_history(sid)] == expected
+        assert b.costs_as_of([(sid, today - dt.timedelta(days=5))]) == [150]
+        count, = b.connection().execute(
+            "SELECT COUNT(*) FROM price_range WHERE sub_lo = ?", (sid,)
+        ).fetchone()
+        assert count == len(expected)
+
+
+def test_sync_keys_for_old_database(tmp_path):  # type: ignore
+    """
+    База прежней версии без uuid: существующие строки получают ключ 'id-<id>',
+    новые — случайный uuid, и он же записывается в журнал изменений.
+    """
+    import sqlite3
+
+    path = tmp_path / "old.db"
+    with connect(path) as db:  # type: ignore
+        sid = db.add_subscription("Old", 100, "monthly", dt.date.today())
+        db.add_payment(sid, dt.date.today(), 100)
+    raw = sqlite3.connect(path)
+    triggers = [r[0] for r in raw.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND (name LIKE 'trg_log_%' OR name LIKE '%_uuid')"
+    )]
+    for name in triggers:
+        raw.execute(f"DROP TRIGGER {name}")
+    for index in ("ux_subscription_uuid", "ux_payment_uuid", "ix_change_log_uuid"):
+        raw.execute(f"DROP INDEX {index}")
+    for table, column in (("subscription", "uuid"), ("payment", "uuid"), ("change_log", "row_uuid")):
+        raw.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+    raw.commit()
+    raw.close()
+
+    with connect(path) as db:  # type: ignore
+        cx = db.connection()
+        assert cx.execute("SELECT uuid FROM subscription").fetchone()[0] == f"id-{sid}"
+        assert cx.execute("SELECT COUNT(*) FROM change_log WHERE row_uuid IS NULL").fetchone()[0] == 0
+        new = db.add_subscription("New", 10, "monthly", dt.date.today())
+        db.add_payment(new, dt.date.today(), 10)
+        key = cx.execute("SELECT uuid FROM subscription WHERE id=?", (new,)).fetchone()[0]
+        assert len(key) == 32
+        assert cx.execute("SELECT COUNT(*) FROM change_log WHERE row_uuid IS NULL").fetchone()[0] == 0
+        logged = cx.execute(
+            "SELECT row_uuid FROM change_log WHERE tbl='subscription' AND row_id=?", (new,)
+        ).fetchone()[0]
+        assert logged == key
+
+
+def test_delta_sync_sends_archived_payments(tmp_path):  # type: ignore
+    """
+    Оплата, перенесённая в архивный файл, сохраняет uuid и выгружается
+    со значениями, а не как удалённая: новая копия получает её.
+    """
+    with connect(tmp_path / "a.db") as a:  # type: ignore
+        sid = a.add_subscription("Old", 10, "monthly", dt.date.today())
+        a.add_payment(sid, dt.date(2020, 1, 1), 10)
+        key = a.connection().execute("SELECT uuid FROM payment").fetchone()[0]
+        assert a.archive_payments(dt.date(2021, 1, 1)) == 1
+        archived = a.connection().execute("SELECT uuid FROM cold.payment").fetchone()[0]
+        assert archived == key
+        delta = export_delta(a, 0)
+    payments = [c for c in delta["changes"] if c[0] == "payment"]
+    assert [(c[1], c[3] is not None) for c in payments] == [(key, True)]
+
+    with connect(tmp_path / "b.db") as b:  # type: ignore
+        assert apply_delta(b, delta) == 2
+        rows = b.connection().execute("SELECT date_paid, amount, uuid FROM payment").fetchall()
+        assert [tuple(r) for r in rows] == [("2020-01-01", 10, key)]
+
+
+def test_old_archive_gets_sync_keys(tmp_path):  # type: ignore
+    """Архивный файл прежней версии без uuid получает ключи 'id-<id>' при подключении."""
+    import sqlite3
+
+    with connect(tmp_path / "a.db") as a:  # type: ignore
+        sid = a.add_subscription("Old", 10, "monthly", dt.date.today())
+        pid = a.add_payment(sid, dt.date(2020, 1, 1), 10)
+        a.archive_payments(dt.date(2021, 1, 1))
+        a.connection().execute("DELETE FROM app_meta WHERE key = 'archive_uuid_built'")
+        a.connection().commit()
+    raw = sqlite3.connect(tmp_path / "a-archive.db")
+    raw.execute("DROP INDEX ux_payment_uuid")
+    raw.execute("ALTER TABLE payment DROP COLUMN uuid")
+    raw.commit()
+    raw.close()
+
+    with connect(tmp_path / "a.db") as a:  # type: ignore
+        reader = a.open_reader()
+        try:
+            assert reader.payments_source() == "payment_all"
+            key = reader.connection().execute("SELECT uuid FROM payment_all").fetchone()[0]
+            assert key == f"id-{pid}"
+        finally:
+            reader.close()
+
+
+def test_export_cost_follows_delta_size(tmp_path):  # type: ignore
+    """
+    Выгрузка после небольшой правки читает журнал диапазоном seq, а не весь:
+    число шагов VM почти не зависит от длины журнала.
+    """
+    def steps(db, since):  # type: ignore
+        calls = []
+        cx = db.connection()
+        cx.set_progress_handler(lambda: calls.append(1), 100)  # раз в 100 инструкций VM
+        try:
+            export_delta(db, since)
+        finally:
+            cx.set_progress_handler(None, 0)
+        return len(calls)
+
+    with connect(tmp_path / "a.db") as a:  # type: ignore
+        sid = a.add_subscription("Busy", 1, "daily", dt.date.today())
+        cx = a.connection()
+        cx.executemany(
+            "INSERT INTO payment (subscription_id, date_paid, amount) VALUES (?, ?, ?)",
+            [(sid, "2024-01-01", 1)] * 20000,
+        )
+        cx.commit()
+        since = last_seq(a)
+        a.add_payment(sid, dt.date.today(), 2)
+        assert steps(a, since) * 50 < steps(a, 0)
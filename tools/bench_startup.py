@@ -0,0 +1,65 @@
+"""
+Замер времени холодного старта приложения в разных вариантах сборки.
+
+    python tools/bench_startup.py                 # все найденные варианты, по 10 запусков
+    python tools/bench_startup.py --runs 20 --modes onedir onefile
+
+Каждый запуск идёт с переменной SUBTRACKER_STARTUP_BENCH=1: приложение
+показывает окно и выходит после первого цикла событий, так что замеряется
+полный путь от запуска процесса (включая распаковку one-file сборки)
+до показанного окна. Рабочий каталог — временная папка с пустой базой,
+первый запуск каждого варианта считается прогревом и в статистику не входит.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+EXE_SUFFIX = ".exe" if sys.platform == "win32" else ""
+
+# Вариант сборки -> команда запуска
+MODES = {
+    "source": [sys.executable, "-m", "src.main"],
+    "onedir": [str(ROOT / "dist" / "main" / f"main{EXE_SUFFIX}")],
+    "onefile": [str(ROOT / "dist" / f"main_onefile{EXE_SUFFIX}")],
+}
+
+
+def run_once(cmd: list[str], cwd: pathlib.Path) -> float:
+    """Время одного запуска до выхода процесса, в секундах."""
+    env = dict(os.environ, SUBTRACKER_STARTUP_BENCH="1")
+    if cmd[0] == sys.executable:
+        env["PYTHONPATH"] = str(ROOT)
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10, help="число замеров на вариант")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args(argv)
+
+    print(f"{'вариант':<10}{'медиана, с':>12}{'мин, с':>10}{'макс, с':>10}")
+    for mode in args.modes:
+        cmd = MODES[mode]
+        if mode != "source" and not pathlib.Path(cmd[0]).exists():
+            print(f"{mode:<10}  нет сборки: {cmd[0]}")
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            run_once(cmd, pathlib.Path(tmp))  # прогрев (кэш ОС, создание базы)
+            times = [run_once(cmd, pathlib.Path(tmp)) for _ in range(args.runs)]
+        print(f"{mode:<10}{statistics.median(times):>12.3f}{min(times):>10.3f}{max(times):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()